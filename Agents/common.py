@@ -52,6 +52,15 @@ def detect_department(text: str) -> Optional[str]:
     return None
 
 
+def resolve_department(text: str, service_type: Optional[str]) -> Optional[str]:
+    dept = detect_department(text)
+    if dept:
+        return dept
+    if service_type in ALLOWED_DEPARTMENTS:
+        return service_type
+    return None
+
+
 def detect_priority(text: str) -> str:
     t = text.lower()
     if any(k in t for k in ["critical", "sev1", "urgent", "immediately", "asap", "outage"]):
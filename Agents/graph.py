@@ -1,21 +1,27 @@
+import asyncio
 from typing import Any, Dict, Optional
 from uuid import uuid4
 
 from langgraph.graph import END, START, StateGraph
 from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableLambda
 
-from Database.checkpointer import get_checkpointer
+from Database.checkpointer import get_async_checkpointer, get_checkpointer
+from Middleware.cache import TURN_CACHE_ENABLED
+from Middleware.turn_cache import lookup_turn, store_turn, turn_ready
+from RAG.retrieve import served_version
 from State.state import AgentState
 from Agents.nodes.confirmation_handler import (
     confirmation_handler_node,
     route_after_confirmation_handler,
 )
 from Agents.nodes.intent_splitter import intent_splitter_node
+from Agents.nodes.prefetch import retrieval_prefetch_node
 from Agents.nodes.confirmation import confirmation_node, route_after_confirmation
 from Agents.nodes.router import router_node, route_after_router
-from Agents.nodes.policy import policy_node
+from Agents.nodes.policy import apolicy_node, policy_node
 from Agents.nodes.metadata import metadata_node
-from Agents.nodes.validation import validation_node
+from Agents.nodes.validation import avalidation_node, validation_node
 from Agents.nodes.decision import decision_node, route_after_decision
 from Agents.nodes.execution import execution_node
 from Agents.nodes.response import response_node
@@ -35,16 +41,19 @@ def route_after_response(state: Dict[str, Any]) -> str:
     return "task_progress"
 
 
-def build_agent():
+def build_agent(checkpointer: Optional[Any] = None):
+    """Compile the agent graph; defaults to the synchronous Postgres checkpointer."""
     builder = StateGraph(AgentState)
 
     builder.add_node("confirmation_handler", confirmation_handler_node)
     builder.add_node("intent_splitter", intent_splitter_node)
+    builder.add_node("retrieval_prefetch", retrieval_prefetch_node)
     builder.add_node("confirmation", confirmation_node)
     builder.add_node("router", router_node)
-    builder.add_node("policy", policy_node)
+    # Retrieval nodes carry native async variants used under ainvoke/astream.
+    builder.add_node("policy", RunnableLambda(policy_node, afunc=apolicy_node, name="policy"))
     builder.add_node("metadata", metadata_node)
-    builder.add_node("validation", validation_node)
+    builder.add_node("validation", RunnableLambda(validation_node, afunc=avalidation_node, name="validation"))
     builder.add_node("decision", decision_node)
     builder.add_node("execution", execution_node)
     builder.add_node("response", response_node)
@@ -56,7 +65,8 @@ def build_agent():
         route_after_confirmation_handler,
         {"intent_splitter": "intent_splitter", "router": "router", "response": "response"},
     )
-    builder.add_edge("intent_splitter", "confirmation")
+    builder.add_edge("intent_splitter", "retrieval_prefetch")
+    builder.add_edge("retrieval_prefetch", "confirmation")
     builder.add_conditional_edges(
         "confirmation",
         route_after_confirmation,
@@ -87,14 +97,25 @@ def build_agent():
         {"router": "router", "end": END},
     )
 
-    checkpointer = get_checkpointer()
+    if checkpointer is None:
+        checkpointer = get_checkpointer()
     return builder.compile(checkpointer=checkpointer)
 
 
 agent_graph = build_agent()
 
+_ASYNC_AGENT_GRAPH = None
 
-def invoke_agent(user_query: str, thread_id: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+
+async def get_async_agent():
+    """The agent graph compiled against the async checkpointer, built on first use."""
+    global _ASYNC_AGENT_GRAPH
+    if _ASYNC_AGENT_GRAPH is None:
+        _ASYNC_AGENT_GRAPH = build_agent(await get_async_checkpointer())
+    return _ASYNC_AGENT_GRAPH
+
+
+def _turn(user_query: str, thread_id: Optional[str], user_id: Optional[str]):
     tid = thread_id or f"thread_{uuid4()}"
     uid = user_id or "anonymous"
 
@@ -105,9 +126,64 @@ def invoke_agent(user_query: str, thread_id: Optional[str] = None, user_id: Opti
     }
 
     config = {"configurable": {"thread_id": tid, "user_id": uid}}
+    return turn_state, config
+
+
+def _state(snapshot: Any) -> Dict[str, Any]:
+    return dict(snapshot.values) if snapshot and snapshot.values else {}
+
+
+def invoke_agent(user_query: str, thread_id: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+    turn_state, config = _turn(user_query, thread_id, user_id)
+
+    before: Dict[str, Any] = {}
+    version, vector = None, None
+    if TURN_CACHE_ENABLED:
+        before = _state(agent_graph.get_state(config))
+        if turn_ready(before):
+            version = served_version()
+            delta, vector = lookup_turn(user_query, version)
+            if delta is not None:
+                # Record the cached turn as if task_progress had just finished it.
+                agent_graph.update_state(config, delta, as_node="task_progress")
+                return _state(agent_graph.get_state(config))
+
     # Drain stream fully so all checkpoints are written for this turn.
     for _ in agent_graph.stream(turn_state, config=config):
         pass
 
-    snapshot = agent_graph.get_state(config)
-    return dict(snapshot.values) if snapshot and snapshot.values else {}
+    values = _state(agent_graph.get_state(config))
+    if version is not None:
+        store_turn(user_query, version, before, values, vector, served=served_version())
+    return values
+
+
+async def ainvoke_agent(user_query: str, thread_id: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+    """invoke_agent() for async servers; retrieval and checkpoint I/O are awaited.
+
+    Nodes without an async variant run in LangGraph's thread pool. On Windows,
+    call Database.session.use_selector_event_loop() before starting the event
+    loop: psycopg 3 does not support the default ProactorEventLoop.
+    """
+    graph = await get_async_agent()
+    turn_state, config = _turn(user_query, thread_id, user_id)
+
+    before: Dict[str, Any] = {}
+    version, vector = None, None
+    if TURN_CACHE_ENABLED:
+        before = _state(await graph.aget_state(config))
+        if turn_ready(before):
+            version = await asyncio.to_thread(served_version)
+            delta, vector = await asyncio.to_thread(lookup_turn, user_query, version)
+            if delta is not None:
+                await graph.aupdate_state(config, delta, as_node="task_progress")
+                return _state(await graph.aget_state(config))
+
+    async for _ in graph.astream(turn_state, config=config):
+        pass
+
+    values = _state(await graph.aget_state(config))
+    if version is not None:
+        served = await asyncio.to_thread(served_version)
+        await asyncio.to_thread(store_turn, user_query, version, before, values, vector, served)
+    return values
@@ -5,6 +5,7 @@ from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
 
 from Config.model import get_model
+from Middleware.llm_cache import cache_model
 from Agents.common import latest_user_query
 
 
@@ -21,7 +22,7 @@ class SplitOutput(BaseModel):
     tasks: List[SplitTask] = Field(min_length=1)
 
 
-SPLITTER_MODEL = MODEL.with_structured_output(SplitOutput)
+SPLITTER_MODEL = cache_model(MODEL, SplitOutput)
 
 
 def intent_splitter_node(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
@@ -1,10 +1,9 @@
 from typing import Any, Dict
 from langchain_core.runnables import RunnableConfig
 from Agents.common import (
-    ALLOWED_DEPARTMENTS,
-    detect_department,
     detect_priority,
     required_fields_for_intent,
+    resolve_department,
 )
 
 
@@ -24,11 +23,9 @@ def metadata_node(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, An
             collected["priority"] = detect_priority(user_query)
 
         if not collected.get("department"):
-            dept = detect_department(user_query)
+            dept = resolve_department(user_query, service_type)
             if dept:
                 collected["department"] = dept
-            elif service_type in ALLOWED_DEPARTMENTS:
-                collected["department"] = service_type
 
         if "amount_context" in required and not collected.get("amount_context"):
             if any(tok in user_query.lower() for tok in ["$", "usd", "amount", "invoice", "reimburse"]):
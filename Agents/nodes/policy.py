@@ -1,40 +1,65 @@
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 from langchain_core.runnables import RunnableConfig
-from RAG.retrieve import search_knowledge_base
-from Agents.common import RAG_THRESHOLD
+from RAG.context import assemble_context
+from RAG.retrieve import asearch_knowledge_base, search_knowledge_base
+from Agents.common import ALLOWED_DEPARTMENTS, RAG_THRESHOLD
 
 
-def policy_node(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
-    try:
-        query = state.get("user_query", "")
-        results = search_knowledge_base(query, top_k=3)
-        if not results:
-            return {
-                "rag_context": "",
-                "rag_score": 0.0,
-                "rag_found": False,
-                "action": "ANSWER",
-                "status": "READY_FOR_DECISION",
-            }
-
-        top_score = max(float(r.get("score", 0.0)) for r in results)
-        rag_context = "\n\n---\n\n".join(
-            str(r.get("chunk_text", "")) for r in results if r.get("chunk_text")
-        )
+POLICY_TOP_K = 3
 
-        return {
-            "rag_context": rag_context,
-            "rag_score": top_score,
-            "rag_found": top_score >= RAG_THRESHOLD,
-            "action": "ANSWER",
-            "status": "READY_FOR_DECISION",
-        }
-    except Exception as e:
+
+def policy_search_request(user_query: str, service_type: Optional[str]) -> Tuple[str, Optional[str]]:
+    """(query, department) that policy_node retrieves for a routed task."""
+    department = service_type if service_type in ALLOWED_DEPARTMENTS else None
+    return user_query, department
+
+
+def _policy_update(results) -> Dict[str, Any]:
+    if not results:
         return {
             "rag_context": "",
             "rag_score": 0.0,
             "rag_found": False,
-            "action": "REJECT",
-            "status": "FAILED",
-            "error": f"policy_error: {e}",
+            "action": "ANSWER",
+            "status": "READY_FOR_DECISION",
         }
+
+    top_score = max(float(r.get("score", 0.0)) for r in results)
+    rag_context = assemble_context(results)
+
+    return {
+        "rag_context": rag_context,
+        "rag_score": top_score,
+        "rag_found": top_score >= RAG_THRESHOLD,
+        "action": "ANSWER",
+        "status": "READY_FOR_DECISION",
+    }
+
+
+def _policy_error(e: Exception) -> Dict[str, Any]:
+    return {
+        "rag_context": "",
+        "rag_score": 0.0,
+        "rag_found": False,
+        "action": "REJECT",
+        "status": "FAILED",
+        "error": f"policy_error: {e}",
+    }
+
+
+def policy_node(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+    try:
+        query, department = policy_search_request(state.get("user_query", ""), state.get("service_type"))
+        results = search_knowledge_base(query, top_k=POLICY_TOP_K, department=department)
+        return _policy_update(results)
+    except Exception as e:
+        return _policy_error(e)
+
+
+async def apolicy_node(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+    try:
+        query, department = policy_search_request(state.get("user_query", ""), state.get("service_type"))
+        results = await asearch_knowledge_base(query, top_k=POLICY_TOP_K, department=department)
+        return _policy_update(results)
+    except Exception as e:
+        return _policy_error(e)
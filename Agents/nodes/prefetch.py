@@ -0,0 +1,52 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.runnables import RunnableConfig
+
+from RAG.retrieve import prefetch_knowledge_base
+from Middleware.tracing import trace_warning
+from Agents.common import resolve_department
+from Agents.nodes.policy import POLICY_TOP_K, policy_search_request
+from Agents.nodes.validation import SERVICE_REQUEST_TOP_K, service_request_policy_query
+
+
+def retrieval_prefetch_node(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+    """Batch the policy retrieval of every pending task right after the split.
+
+    policy_node and validation_node later issue the same searches and are
+    served from the prefetched results. Best effort: failures only cost the
+    batching, never the turn.
+    """
+    # Tickets may still be declined; don't spend retrieval before the answer.
+    if state.get("awaiting_confirmation", False):
+        return {}
+    # Slot-filling replies keep the original tasks; nothing new to fetch.
+    if state.get("status") == "AWAITING_USER":
+        return {}
+
+    user_query = str(state.get("user_query", ""))
+    tasks = state.get("tasks", []) or []
+    idx = state.get("current_task_index", 0)
+
+    requests: List[Tuple[str, Optional[str], int]] = []
+    for task in tasks[idx:]:
+        if task.get("status") != "PENDING":
+            continue
+        if task.get("intent") == "POLICY_QUERY":
+            query, department = policy_search_request(user_query, task.get("service_type"))
+            requests.append((query, department, POLICY_TOP_K))
+        elif task.get("intent") == "SERVICE_REQUEST":
+            department = resolve_department(user_query, task.get("service_type"))
+            description = user_query.strip()
+            if department and description:
+                requests.append(
+                    (service_request_policy_query(department, description), department, SERVICE_REQUEST_TOP_K)
+                )
+
+    if not requests:
+        return {}
+
+    try:
+        prefetch_knowledge_base(requests)
+    except Exception as e:
+        trace_warning("rag.prefetch_error", e)
+    return {}
@@ -2,8 +2,9 @@ from typing import Any, Dict
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
 from Config.model import get_model
+from Middleware.llm_cache import cache_model
 
-MODEL = get_model()
+MODEL = cache_model(get_model())
 
 
 def response_node(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
@@ -61,7 +62,7 @@ def response_node(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, An
                         content=f"User query:\n{user_query}\n\nPolicy context:\n{rag_context}\n\nAnswer briefly."
                     ),
                 ]
-                llm_resp = MODEL.invoke(prompt, config=config)
+                llm_resp = MODEL.invoke(prompt, config=config, context=rag_context)
                 text = str(llm_resp.content).strip() if llm_resp else "I don't know"
 
         else:
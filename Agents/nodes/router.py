@@ -4,6 +4,7 @@ from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
 
 from Config.model import get_model
+from Middleware.llm_cache import cache_model
 from State.state import IntentType, ServiceType
 from Agents.common import get_current_task, latest_user_query
 
@@ -16,7 +17,7 @@ class RouterOutput(BaseModel):
     confidence: float = Field(ge=0.0, le=1.0)
 
 
-ROUTER_MODEL = MODEL.with_structured_output(RouterOutput)
+ROUTER_MODEL = cache_model(MODEL, RouterOutput)
 
 
 def router_node(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
@@ -1,44 +1,87 @@
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 from langchain_core.runnables import RunnableConfig
-from RAG.retrieve import search_knowledge_base
+from RAG.context import assemble_context
+from RAG.retrieve import asearch_knowledge_base, search_knowledge_base
 from Agents.common import ALLOWED_DEPARTMENTS, ALLOWED_PRIORITIES
 
 
+SERVICE_REQUEST_TOP_K = 1
+
+
+def service_request_policy_query(department: str, description: str) -> str:
+    return f"{department} request policy: {description}"
+
+
+def _check_fields(state: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """(final update, None) when validation ends early, else (None, policy query)."""
+    intent = state.get("intent", "GENERAL")
+    if intent not in ("INCIDENT", "SERVICE_REQUEST"):
+        return {"validation_passed": True, "status": "VALIDATED"}, None
+
+    if state.get("missing_fields"):
+        return {"validation_passed": False, "status": "AWAITING_USER"}, None
+
+    fields = state.get("collected_fields", {})
+    department = str(fields.get("department", "")).strip()
+    priority = str(fields.get("priority", "")).strip().lower()
+    description = str(fields.get("description", "")).strip()
+
+    if department not in ALLOWED_DEPARTMENTS:
+        return {"validation_passed": False, "status": "FAILED", "error": f"invalid_department: {department}"}, None
+    if priority not in ALLOWED_PRIORITIES:
+        return {"validation_passed": False, "status": "FAILED", "error": f"invalid_priority: {priority}"}, None
+    if not description:
+        return {"validation_passed": False, "status": "FAILED", "error": "invalid_description"}, None
+
+    if intent == "SERVICE_REQUEST":
+        return None, department
+    return {"validation_passed": True, "status": "VALIDATED"}, None
+
+
+def _policy_query(state: Dict[str, Any], department: str) -> str:
+    description = str(state.get("collected_fields", {}).get("description", "")).strip()
+    return service_request_policy_query(department, description)
+
+
+def _validated(state: Dict[str, Any], policy_results) -> Dict[str, Any]:
+    if policy_results:
+        best = float(policy_results[0].get("score", 0.0))
+        return {
+            "rag_context": assemble_context(policy_results[:1], prior=state.get("rag_context", "")),
+            "rag_score": max(state.get("rag_score", 0.0), best),
+            "validation_passed": True,
+            "status": "VALIDATED",
+        }
+    return {"validation_passed": True, "status": "VALIDATED"}
+
+
 def validation_node(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
     try:
-        intent = state.get("intent", "GENERAL")
-        if intent not in ("INCIDENT", "SERVICE_REQUEST"):
-            return {"validation_passed": True, "status": "VALIDATED"}
-
-        if state.get("missing_fields"):
-            return {"validation_passed": False, "status": "AWAITING_USER"}
-
-        fields = state.get("collected_fields", {})
-        department = str(fields.get("department", "")).strip()
-        priority = str(fields.get("priority", "")).strip().lower()
-        description = str(fields.get("description", "")).strip()
-
-        if department not in ALLOWED_DEPARTMENTS:
-            return {"validation_passed": False, "status": "FAILED", "error": f"invalid_department: {department}"}
-        if priority not in ALLOWED_PRIORITIES:
-            return {"validation_passed": False, "status": "FAILED", "error": f"invalid_priority: {priority}"}
-        if not description:
-            return {"validation_passed": False, "status": "FAILED", "error": "invalid_description"}
-
-        if intent == "SERVICE_REQUEST":
-            policy_results = search_knowledge_base(f"{department} request policy: {description}", top_k=1)
-            if policy_results:
-                best = float(policy_results[0].get("score", 0.0))
-                ctx = str(policy_results[0].get("chunk_text", ""))
-                merged = state.get("rag_context", "")
-                merged = f"{merged}\n\n{ctx}".strip() if merged else ctx
-                return {
-                    "rag_context": merged,
-                    "rag_score": max(state.get("rag_score", 0.0), best),
-                    "validation_passed": True,
-                    "status": "VALIDATED",
-                }
-
-        return {"validation_passed": True, "status": "VALIDATED"}
+        update, department = _check_fields(state)
+        if update is not None:
+            return update
+
+        policy_results = search_knowledge_base(
+            _policy_query(state, department),
+            top_k=SERVICE_REQUEST_TOP_K,
+            department=department,
+        )
+        return _validated(state, policy_results)
+    except Exception as e:
+        return {"validation_passed": False, "status": "FAILED", "error": f"validation_error: {e}"}
+
+
+async def avalidation_node(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+    try:
+        update, department = _check_fields(state)
+        if update is not None:
+            return update
+
+        policy_results = await asearch_knowledge_base(
+            _policy_query(state, department),
+            top_k=SERVICE_REQUEST_TOP_K,
+            department=department,
+        )
+        return _validated(state, policy_results)
     except Exception as e:
         return {"validation_passed": False, "status": "FAILED", "error": f"validation_error: {e}"}
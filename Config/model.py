@@ -1,9 +1,27 @@
 from langchain_mistralai import ChatMistralAI, MistralAIEmbeddings
+from langchain_core.embeddings import Embeddings
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Optional
+import asyncio
+import hashlib
 import os
 from dotenv import load_dotenv
+import psycopg2
+
+from Database.session import get_connection
+from Database.vector_codec import decode_vector, pack_vector
+from Middleware.tracing import span, trace_warning
 
 load_dotenv()
 
+EMBEDDING_MODEL_NAME = "mistral-embed"
+
+# In-process tier: max number of cached query embeddings per worker.
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+# Persistent tier: share embeddings across workers/restarts via embedding_cache.
+EMBEDDING_CACHE_PERSIST = os.getenv("EMBEDDING_CACHE_PERSIST", "false").strip().lower() in {"1", "true", "yes"}
+
 def get_model():
     return ChatMistralAI(
         model="mistral-large-latest",
@@ -11,7 +29,178 @@ def get_model():
         api_key=os.getenv("MISTRAL_API_KEY"),
     )
 
-def get_embeddings():
-    return MistralAIEmbeddings(
-        api_key=os.getenv("MISTRAL_API_KEY"),
-    )
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys: collapsed whitespace, case-folded."""
+    return " ".join(str(text).split()).casefold()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper with an in-process LRU and optional Postgres tier.
+
+    Entries are keyed by (embedding model, normalized text), so near-identical
+    strings coming from different nodes share a single remote call.
+    """
+
+    def __init__(self, inner: Embeddings, model_name: str, max_entries: int, persist: bool):
+        self.inner = inner
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.persist = persist
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = Lock()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\x00{normalize_text(text)}".encode()).hexdigest()
+
+    def _lru_get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+            return vector
+
+    def _lru_put(self, key: str, vector: List[float]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _db_get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        if not self.persist or not keys:
+            return {}
+        try:
+            conn = get_connection()
+            cur = conn.cursor()
+            try:
+                cur.execute("""
+                    SELECT text_hash, embedding_bin,
+                           CASE WHEN embedding_bin IS NULL THEN embedding END
+                    FROM embedding_cache
+                    WHERE model_name = %s AND text_hash = ANY(%s)
+                """, (self.model_name, keys))
+                return {
+                    text_hash: decode_vector(packed).tolist() if packed is not None else list(legacy)
+                    for text_hash, packed, legacy in cur.fetchall()
+                }
+            finally:
+                cur.close()
+                conn.close()
+        except Exception as e:
+            trace_warning("embedding_cache.lookup_error", e)
+            return {}
+
+    def _db_put_many(self, entries: Dict[str, List[float]]) -> None:
+        if not self.persist or not entries:
+            return
+        try:
+            conn = get_connection()
+            cur = conn.cursor()
+            try:
+                for key, vector in entries.items():
+                    cur.execute("""
+                        INSERT INTO embedding_cache (text_hash, model_name, embedding_bin)
+                        VALUES (%s, %s, %s)
+                        ON CONFLICT (text_hash, model_name) DO NOTHING
+                    """, (key, self.model_name, psycopg2.Binary(pack_vector(vector))))
+                conn.commit()
+            finally:
+                cur.close()
+                conn.close()
+        except Exception as e:
+            trace_warning("embedding_cache.store_error", e)
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        for key in keys:
+            vector = self._lru_get(key)
+            if vector is not None:
+                found[key] = vector
+        return found
+
+    def _missing(self, keys: List[str], texts: List[str], found: Dict[str, List[float]]) -> Dict[str, str]:
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        return missing
+
+    def _remember(self, entries: Dict[str, List[float]], found: Dict[str, List[float]]) -> None:
+        for key, vector in entries.items():
+            self._lru_put(key, vector)
+        found.update(entries)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(t) for t in texts]
+        found = self._lookup(keys)
+        self._remember(self._db_get_many([k for k in dict.fromkeys(keys) if k not in found]), found)
+
+        # One batched remote call for every distinct text still missing.
+        missing = self._missing(keys, texts, found)
+        if missing:
+            with span("embedding.remote", texts=len(missing), model=self.model_name):
+                vectors = self.inner.embed_documents(list(missing.values()))
+            fresh = {key: list(vector) for key, vector in zip(missing.keys(), vectors)}
+            self._remember(fresh, found)
+            self._db_put_many(fresh)
+
+        return [list(found[key]) for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """embed_documents() without blocking the event loop.
+
+        The remote call uses the client's native async API; the optional
+        Postgres tier runs in a worker thread.
+        """
+        keys = [self._key(t) for t in texts]
+        found = self._lookup(keys)
+        db_keys = [k for k in dict.fromkeys(keys) if k not in found]
+        if self.persist and db_keys:
+            self._remember(await asyncio.to_thread(self._db_get_many, db_keys), found)
+
+        missing = self._missing(keys, texts, found)
+        if missing:
+            with span("embedding.remote", texts=len(missing), model=self.model_name, mode="async"):
+                vectors = await self.inner.aembed_documents(list(missing.values()))
+            fresh = {key: list(vector) for key, vector in zip(missing.keys(), vectors)}
+            self._remember(fresh, found)
+            if self.persist:
+                await asyncio.to_thread(self._db_put_many, fresh)
+
+        return [list(found[key]) for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+_EMBEDDINGS_LOCK = Lock()
+_EMBEDDINGS: Optional[CachedEmbeddings] = None
+
+
+def get_embeddings(cached: bool = True) -> Embeddings:
+    """Return the process-wide cached embeddings client.
+
+    Pass cached=False for bulk document ingestion, which should not churn the
+    query cache.
+    """
+    global _EMBEDDINGS
+    if not cached:
+        return MistralAIEmbeddings(
+            model=EMBEDDING_MODEL_NAME,
+            api_key=os.getenv("MISTRAL_API_KEY"),
+        )
+    with _EMBEDDINGS_LOCK:
+        if _EMBEDDINGS is None:
+            _EMBEDDINGS = CachedEmbeddings(
+                get_embeddings(cached=False),
+                model_name=EMBEDDING_MODEL_NAME,
+                max_entries=EMBEDDING_CACHE_SIZE,
+                persist=EMBEDDING_CACHE_PERSIST,
+            )
+        return _EMBEDDINGS
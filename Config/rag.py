@@ -0,0 +1,87 @@
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+load_dotenv()
+
+# How often (seconds) a worker re-reads rag_corpus_version to decide whether
+# its in-memory retrieval index is stale.
+RAG_INDEX_REFRESH_SECONDS = float(os.getenv("RAG_INDEX_REFRESH_SECONDS", "5"))
+
+# Retrieval backend for search_knowledge_base:
+#   "memory"   - in-process matrix index loaded from rag_documents (default)
+#   "pgvector" - ANN search in Postgres over rag_documents.embedding_vec
+RAG_BACKEND = os.getenv("RAG_BACKEND", "memory").strip().lower()
+
+# HNSW candidate list size per query; higher trades latency for recall.
+RAG_HNSW_EF_SEARCH = int(os.getenv("RAG_HNSW_EF_SEARCH", "64"))
+
+# A department-filtered search whose best score falls below this value is
+# retried against the whole corpus.
+RAG_DEPARTMENT_FALLBACK_SCORE = float(os.getenv("RAG_DEPARTMENT_FALLBACK_SCORE", "0.6"))
+
+# Ranking strategy for search_knowledge_base:
+#   "vector"  - embedding similarity only (default)
+#   "hybrid"  - BM25 and embedding scores fused; decisive exact-reference
+#               matches (document IDs, department-scoped section numbers)
+#               skip the embedding call
+#   "lexical" - BM25 only, never calls the embedding API
+# Lexical-only answers are scored by IDF-weighted term coverage rather than
+# cosine similarity, so tune the score thresholds before enabling them.
+RAG_SEARCH_MODE = os.getenv("RAG_SEARCH_MODE", "vector").strip().lower()
+
+# Weight of the max-normalized BM25 score in the hybrid ranking (0..1).
+RAG_HYBRID_LEXICAL_WEIGHT = float(os.getenv("RAG_HYBRID_LEXICAL_WEIGHT", "0.3"))
+
+# Candidates drawn from each ranker before fusion.
+RAG_HYBRID_CANDIDATES = int(os.getenv("RAG_HYBRID_CANDIDATES", "20"))
+
+# A lexical hit is decisive when it beats the runner-up BM25 score by this factor.
+RAG_LEXICAL_DECISIVE_RATIO = float(os.getenv("RAG_LEXICAL_DECISIVE_RATIO", "1.5"))
+
+# Retrieval result cache: max entries per worker (0 disables) and how long an
+# entry stays servable. Entries are also scoped to the corpus version.
+RAG_RESULT_CACHE_SIZE = int(os.getenv("RAG_RESULT_CACHE_SIZE", "1024"))
+RAG_RESULT_CACHE_TTL_SECONDS = float(os.getenv("RAG_RESULT_CACHE_TTL_SECONDS", "600"))
+
+# Storage dtype of the in-memory index and of rag_documents.embedding_compact:
+# "float32" (default), "float16" (half the memory) or "int8" (a quarter, with
+# a per-row scale). Compact dtypes are re-ranked against exact float32 vectors.
+RAG_INDEX_DTYPE = os.getenv("RAG_INDEX_DTYPE", "float32").strip().lower()
+
+# With a compact dtype, top_k * this many candidates get an exact float32 re-score.
+RAG_RERANK_OVERSAMPLE = int(os.getenv("RAG_RERANK_OVERSAMPLE", "4"))
+
+# Directory of the memory-mapped index snapshot written by RAG/ingest.py and
+# shared by every worker on the host; "" disables snapshots. A relative path is
+# taken from the project root, not the working directory.
+_SNAPSHOT_DIR = os.getenv("RAG_INDEX_SNAPSHOT_DIR", "RAG/Index").strip()
+RAG_INDEX_SNAPSHOT_DIR = str(BASE_DIR / _SNAPSHOT_DIR) if _SNAPSHOT_DIR else ""
+
+# Approximate token budget for the rag_context handed to the answer prompt.
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1200"))
+
+# Ingestion pipeline: chunks per embed_documents call, embedding batches in
+# flight at once, retries per batch on transient API errors, and the file that
+# records finished batches so an interrupted run resumes instead of restarting
+# (relative to the project root like RAG_INDEX_SNAPSHOT_DIR; "" disables it).
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "4"))
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "5"))
+_CHECKPOINT_PATH = os.getenv("INGEST_CHECKPOINT_PATH", "RAG/.ingest_checkpoint").strip()
+INGEST_CHECKPOINT_PATH = str(BASE_DIR / _CHECKPOINT_PATH) if _CHECKPOINT_PATH else ""
+
+# Worker processes that read and split documents during ingest (1 = in-process),
+# and how many files each worker may have queued, which bounds ingest memory.
+INGEST_CHUNK_WORKERS = int(os.getenv("INGEST_CHUNK_WORKERS", str(os.cpu_count() or 1)))
+INGEST_FILES_PER_WORKER = int(os.getenv("INGEST_FILES_PER_WORKER", "2"))
+
+# Seconds between scans of RAG/Docs in `python -m RAG.ingest --watch`.
+INGEST_WATCH_INTERVAL_SECONDS = float(os.getenv("INGEST_WATCH_INTERVAL_SECONDS", "5"))
+
+# How RAG/ingest.py splits documents: "section" keeps numbered policy clauses
+# intact and records their section id (falling back to "recursive" for files
+# without numbered headings); "recursive" cuts fixed-size character windows.
+RAG_CHUNKER = os.getenv("RAG_CHUNKER", "section").strip().lower()
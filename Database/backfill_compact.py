@@ -0,0 +1,62 @@
+from Database.session import get_connection
+from Database.vector_codec import check_dtype, pack_vector
+from Config.rag import RAG_INDEX_DTYPE
+from RAG.corpus import bump_corpus_version
+from RAG.index import _normalize, _to_vector
+from Middleware.cache import SEMANTIC_CACHE_DTYPE
+import psycopg2
+
+BATCH_SIZE = 500
+
+# (table, key column, target dtype)
+TARGETS = [
+    ("rag_documents", "id", RAG_INDEX_DTYPE),
+    ("semantic_cache", "id", SEMANTIC_CACHE_DTYPE),
+]
+
+
+def backfill(table: str, key: str, dtype: str, rewrite: bool = False) -> int:
+    """Fill embedding_compact from the exact embedding; returns rows written.
+
+    With rewrite=True every row is re-packed, e.g. after changing the dtype.
+    """
+    dtype = check_dtype(dtype)
+    conn = get_connection()
+    cur = conn.cursor()
+    written = 0
+    try:
+        cur.execute(f"""
+            SELECT {key}, embedding_bin, CASE WHEN embedding_bin IS NULL THEN embedding END
+            FROM {table}
+            {"" if rewrite else "WHERE embedding_compact IS NULL"}
+        """)
+        rows = cur.fetchall()
+        for start in range(0, len(rows), BATCH_SIZE):
+            for row_id, packed, legacy in rows[start:start + BATCH_SIZE]:
+                vec = _to_vector(packed if packed is not None else legacy)
+                vec = _normalize(vec) if vec is not None else None
+                if vec is None:
+                    continue
+                cur.execute(f"""
+                    UPDATE {table} SET embedding_compact = %s WHERE {key} = %s
+                """, (psycopg2.Binary(pack_vector(vec, dtype)), row_id))
+                written += 1
+            conn.commit()
+
+        if table == "rag_documents" and written:
+            # Workers reload their index with the new codes.
+            bump_corpus_version(cur)
+            conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    return written
+
+
+if __name__ == "__main__":
+    import sys
+
+    rewrite = "--rewrite" in sys.argv
+    for table, key, dtype in TARGETS:
+        count = backfill(table, key, dtype, rewrite=rewrite)
+        print(f"{table}: packed {count} embeddings as {dtype}")
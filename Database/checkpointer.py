@@ -3,10 +3,12 @@ from __future__ import annotations
 from pathlib import Path
 from threading import Lock
 from typing import Any, Optional
+import asyncio
 import atexit
 
 from dotenv import dotenv_values
 from langgraph.checkpoint.postgres import PostgresSaver
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -20,6 +22,10 @@ _CHECKPOINTER: Optional[PostgresSaver] = None
 _CHECKPOINTER_CTX: Optional[Any] = None
 _SETUP_DONE = False
 
+_ASYNC_LOCK = asyncio.Lock()
+_ASYNC_CHECKPOINTER: Optional[AsyncPostgresSaver] = None
+_ASYNC_CHECKPOINTER_CTX: Optional[Any] = None
+
 
 def get_checkpointer() -> PostgresSaver:
     """Return a process-wide PostgresSaver singleton configured for LangGraph persistence."""
@@ -43,4 +49,29 @@ def _close_checkpointer() -> None:
             _CHECKPOINTER_CTX = None
 
 
+async def get_async_checkpointer() -> AsyncPostgresSaver:
+    """Return a process-wide AsyncPostgresSaver for graphs run with ainvoke/astream.
+
+    Its connection belongs to the event loop that first calls this; close it
+    from the same loop with close_async_checkpointer().
+    """
+    global _ASYNC_CHECKPOINTER, _ASYNC_CHECKPOINTER_CTX
+    async with _ASYNC_LOCK:
+        if _ASYNC_CHECKPOINTER is None:
+            ctx = AsyncPostgresSaver.from_conn_string(DATABASE_URL)
+            saver = await ctx.__aenter__()
+            await saver.setup()
+            _ASYNC_CHECKPOINTER_CTX, _ASYNC_CHECKPOINTER = ctx, saver
+        return _ASYNC_CHECKPOINTER
+
+
+async def close_async_checkpointer() -> None:
+    global _ASYNC_CHECKPOINTER, _ASYNC_CHECKPOINTER_CTX
+    async with _ASYNC_LOCK:
+        if _ASYNC_CHECKPOINTER_CTX is not None:
+            await _ASYNC_CHECKPOINTER_CTX.__aexit__(None, None, None)
+            _ASYNC_CHECKPOINTER_CTX = None
+            _ASYNC_CHECKPOINTER = None
+
+
 atexit.register(_close_checkpointer)
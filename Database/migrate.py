@@ -1,14 +1,23 @@
 from Database.session import get_connection
+from Config.rag import RAG_BACKEND
 import os
 
-def run_migrations():
+SCHEMA_FILES = [
+    "Database/schema_middleware.sql",
+    "Database/schema_rag.sql",
+]
+
+# Only applied when the pgvector backend is selected; needs the extension installed.
+PGVECTOR_SCHEMA_FILE = "Database/schema_pgvector.sql"
+
+def run_migrations(path: str = "Database/schema_middleware.sql"):
     conn = get_connection()
     cur = conn.cursor()
-    
-    with open("Database/schema_middleware.sql", "r") as f:
+
+    with open(path, "r") as f:
         sql = f.read()
     print("SQL BEING EXECUTED:\n", sql)
-    
+
     try:
         cur.execute(sql)
         conn.commit()
@@ -21,4 +30,7 @@ def run_migrations():
         conn.close()
 
 if __name__ == "__main__":
-    run_migrations()
+    for schema_file in SCHEMA_FILES:
+        run_migrations(schema_file)
+    if RAG_BACKEND == "pgvector":
+        run_migrations(PGVECTOR_SCHEMA_FILE)
@@ -0,0 +1,92 @@
+from typing import List, Sequence
+
+import psycopg2
+from psycopg2.extras import execute_batch
+
+from Database.session import get_connection
+from Database.vector_codec import decode_vector, pack_vector
+from Config.rag import RAG_BACKEND
+from RAG.corpus import bump_corpus_version
+from RAG.index import _to_vector
+
+BATCH_SIZE = 500
+
+# (table, key columns)
+TABLES = [
+    ("rag_documents", ["id"]),
+    ("semantic_cache", ["id"]),
+    ("embedding_cache", ["text_hash", "model_name"]),
+]
+
+
+def convert_table(table: str, keys: Sequence[str], drop_json: bool = False) -> int:
+    """Pack every JSONB-only row of table into embedding_bin; returns rows converted."""
+    key_list = ", ".join(keys)
+    key_match = " AND ".join(f"{k} = %s" for k in keys)
+    conn = get_connection()
+    cur = conn.cursor(name=f"migrate_{table}")  # server-side cursor: stream, don't load the table
+    write = conn.cursor()
+    converted = 0
+    try:
+        cur.itersize = BATCH_SIZE
+        cur.execute(f"""
+            SELECT {key_list}, embedding FROM {table}
+            WHERE embedding_bin IS NULL AND embedding IS NOT NULL
+        """)
+        batch: List[tuple] = []
+        for row in cur:
+            vec = _to_vector(row[-1])
+            if vec is None:
+                continue
+            batch.append((psycopg2.Binary(pack_vector(vec)), *row[:-1]))
+            if len(batch) >= BATCH_SIZE:
+                execute_batch(write, f"UPDATE {table} SET embedding_bin = %s WHERE {key_match}", batch)
+                converted += len(batch)
+                batch = []
+        if batch:
+            execute_batch(write, f"UPDATE {table} SET embedding_bin = %s WHERE {key_match}", batch)
+            converted += len(batch)
+
+        if drop_json:
+            write.execute(f"UPDATE {table} SET embedding = NULL WHERE embedding_bin IS NOT NULL")
+        if table == "rag_documents" and converted:
+            bump_corpus_version(write)
+        conn.commit()
+    finally:
+        cur.close()
+        write.close()
+        conn.close()
+    return converted
+
+
+def backfill_embedding_vec() -> int:
+    """Fill rag_documents.embedding_vec for rows stored only as embedding_bin."""
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT id, embedding_bin FROM rag_documents
+            WHERE embedding_vec IS NULL AND embedding_bin IS NOT NULL
+        """)
+        rows = [
+            (str(decode_vector(packed).tolist()), row_id)
+            for row_id, packed in cur.fetchall()
+        ]
+        execute_batch(cur, "UPDATE rag_documents SET embedding_vec = %s::vector WHERE id = %s", rows)
+        conn.commit()
+        return len(rows)
+    finally:
+        cur.close()
+        conn.close()
+
+
+# Run after `python -m Database.migrate` has added the embedding_bin columns.
+# --drop-json clears the converted JSONB payloads to reclaim table space.
+if __name__ == "__main__":
+    import sys
+
+    drop_json = "--drop-json" in sys.argv
+    for table, keys in TABLES:
+        print(f"{table}: converted {convert_table(table, keys, drop_json=drop_json)} rows")
+    if RAG_BACKEND == "pgvector":
+        print(f"rag_documents: filled embedding_vec for {backfill_embedding_vec()} rows")
@@ -2,13 +2,21 @@ CREATE EXTENSION IF NOT EXISTS pgcrypto;
 
 CREATE TABLE IF NOT EXISTS semantic_cache (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-    embedding JSONB NOT NULL,
+    embedding JSONB,
+    embedding_bin BYTEA,
     original_query TEXT NOT NULL,
     ai_response TEXT NOT NULL,
     model_name TEXT NOT NULL,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Exact packed float32 embedding; the JSONB column is legacy.
+ALTER TABLE semantic_cache ADD COLUMN IF NOT EXISTS embedding_bin BYTEA;
+ALTER TABLE semantic_cache ALTER COLUMN embedding DROP NOT NULL;
+
+-- Packed embedding in SEMANTIC_CACHE_DTYPE, scanned on lookup.
+ALTER TABLE semantic_cache ADD COLUMN IF NOT EXISTS embedding_compact BYTEA;
+
 CREATE TABLE IF NOT EXISTS tool_cache (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     tool_name TEXT NOT NULL,
@@ -32,3 +40,88 @@ CREATE TABLE IF NOT EXISTS logs (
     status TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
+
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    text_hash TEXT NOT NULL,
+    model_name TEXT NOT NULL,
+    embedding JSONB,
+    embedding_bin BYTEA,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (text_hash, model_name)
+);
+
+ALTER TABLE embedding_cache ADD COLUMN IF NOT EXISTS embedding_bin BYTEA;
+ALTER TABLE embedding_cache ALTER COLUMN embedding DROP NOT NULL;
+
+-- Workers pull semantic_cache rows newer than their last sync.
+CREATE INDEX IF NOT EXISTS semantic_cache_created_at_idx ON semantic_cache (created_at);
+
+-- Retention (Middleware/cache.py): hits drive least-frequently-used pruning,
+-- created_at drives the TTL.
+ALTER TABLE semantic_cache ADD COLUMN IF NOT EXISTS hit_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE semantic_cache ADD COLUMN IF NOT EXISTS last_hit_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE tool_cache ADD COLUMN IF NOT EXISTS hit_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE tool_cache ADD COLUMN IF NOT EXISTS last_hit_at TIMESTAMP WITH TIME ZONE;
+CREATE INDEX IF NOT EXISTS tool_cache_created_at_idx ON tool_cache (created_at);
+
+-- sha256 of the normalized query (Middleware/cache.py query_hash) for the
+-- verbatim-repeat fast path. The backfill approximates normalize_text();
+-- a legacy row it misses is still found by embedding.
+ALTER TABLE semantic_cache ADD COLUMN IF NOT EXISTS query_hash TEXT;
+
+UPDATE semantic_cache
+SET query_hash = encode(sha256(convert_to(lower(btrim(regexp_replace(original_query, '\s+', ' ', 'g'))), 'UTF8')), 'hex')
+WHERE query_hash IS NULL;
+
+CREATE INDEX IF NOT EXISTS semantic_cache_query_hash_idx ON semantic_cache (query_hash);
+
+-- Node-level LLM results (Middleware/llm_cache.py), keyed by a hash of the
+-- model, output schema, prompt messages and rag_context.
+CREATE TABLE IF NOT EXISTS llm_cache (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    cache_key TEXT NOT NULL UNIQUE,
+    model_name TEXT NOT NULL,
+    output_kind TEXT NOT NULL,
+    output JSONB NOT NULL,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    last_hit_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS llm_cache_created_at_idx ON llm_cache (created_at);
+
+-- Whole-turn answers for single-intent policy questions (Middleware/turn_cache.py),
+-- scoped to the corpus version they were answered from.
+CREATE TABLE IF NOT EXISTS turn_cache (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    corpus_version BIGINT NOT NULL,
+    query_hash TEXT NOT NULL,
+    original_query TEXT NOT NULL,
+    embedding_bin BYTEA NOT NULL,
+    answer TEXT NOT NULL,
+    state_delta JSONB NOT NULL,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    last_hit_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (corpus_version, query_hash)
+);
+
+CREATE INDEX IF NOT EXISTS turn_cache_created_at_idx ON turn_cache (created_at);
+
+-- Ticket and user rows a cached tool result was read from ("ticket:<id>",
+-- "user:<id>"); the write tools delete matching rows (Middleware/cache.py
+-- invalidate_tool_cache). Ticket reads cached before tracking existed are dropped.
+ALTER TABLE tool_cache ADD COLUMN IF NOT EXISTS dependencies TEXT[] NOT NULL DEFAULT '{}';
+CREATE INDEX IF NOT EXISTS tool_cache_dependencies_idx ON tool_cache USING GIN (dependencies);
+
+DELETE FROM tool_cache
+WHERE dependencies = '{}'
+  AND tool_name IN ('get_ticket', 'get_user_ticket_history', 'get_ticket_status');
+
+-- Last invalidation per dependency; a queued tool_cache write read before it is skipped.
+CREATE TABLE IF NOT EXISTS tool_cache_invalidations (
+    dependency TEXT PRIMARY KEY,
+    invalidated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS tool_cache_invalidations_at_idx ON tool_cache_invalidations (invalidated_at);
@@ -0,0 +1,16 @@
+CREATE EXTENSION IF NOT EXISTS vector;
+
+-- mistral-embed vectors are 1024-dimensional.
+ALTER TABLE rag_documents ADD COLUMN IF NOT EXISTS embedding_vec vector(1024);
+
+-- Rows stored only as embedding_bin are filled by Database/migrate_embeddings.py.
+UPDATE rag_documents
+SET embedding_vec = embedding::text::vector
+WHERE embedding_vec IS NULL AND embedding IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS rag_documents_embedding_vec_hnsw
+ON rag_documents USING hnsw (embedding_vec vector_cosine_ops);
+
+-- Department partition key used by department-filtered retrieval.
+CREATE INDEX IF NOT EXISTS rag_documents_department_key
+ON rag_documents (lower(split_part(department, '_', 1)));
@@ -0,0 +1,74 @@
+CREATE TABLE IF NOT EXISTS rag_documents (
+    id BIGSERIAL PRIMARY KEY,
+    department TEXT NOT NULL,
+    chunk_text TEXT NOT NULL,
+    embedding JSONB,
+    embedding_bin BYTEA,
+    source_file TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Older deployments created rag_documents without a stable row id.
+ALTER TABLE rag_documents ADD COLUMN IF NOT EXISTS id BIGSERIAL;
+
+-- Single-row counter bumped by RAG/ingest.py whenever rag_documents changes.
+CREATE TABLE IF NOT EXISTS rag_corpus_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO rag_corpus_version (id, version) VALUES (TRUE, 0)
+ON CONFLICT (id) DO NOTHING;
+
+-- Exact embedding as packed float32 (Database/vector_codec.py). Replaces the
+-- legacy JSONB column, which Database/migrate_embeddings.py converts.
+ALTER TABLE rag_documents ADD COLUMN IF NOT EXISTS embedding_bin BYTEA;
+ALTER TABLE rag_documents ALTER COLUMN embedding DROP NOT NULL;
+
+-- Packed copy of the normalized embedding in RAG_INDEX_DTYPE, scanned by
+-- compact in-memory indexes.
+ALTER TABLE rag_documents ADD COLUMN IF NOT EXISTS embedding_compact BYTEA;
+
+-- sha256 of department, source_file and chunk_text joined by chr(31); must
+-- match RAG/ingest.py content_hash(). Legacy rows are hashed here and exact
+-- duplicates collapsed so the hash can be unique.
+ALTER TABLE rag_documents ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- Workers reload only if the backfill or the dedup below touched rows; a
+-- migration run that changes nothing keeps their indexes and caches.
+DO $$
+DECLARE
+    changed BIGINT;
+    total BIGINT := 0;
+BEGIN
+    UPDATE rag_documents
+    SET content_hash = encode(sha256(convert_to(department || chr(31) || source_file || chr(31) || chunk_text, 'UTF8')), 'hex')
+    WHERE content_hash IS NULL;
+    GET DIAGNOSTICS changed = ROW_COUNT;
+    total := total + changed;
+
+    DELETE FROM rag_documents a
+    USING rag_documents b
+    WHERE a.content_hash = b.content_hash AND a.id > b.id;
+    GET DIAGNOSTICS changed = ROW_COUNT;
+    total := total + changed;
+
+    IF total > 0 THEN
+        UPDATE rag_corpus_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE id = TRUE;
+    END IF;
+END
+$$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS rag_documents_content_hash_key
+ON rag_documents (content_hash);
+
+-- Set by the section-aware chunker (RAG_CHUNKER=section): the clause a chunk
+-- holds ("5.3") and its heading path ("<policy title> > 5. Policy Statements").
+ALTER TABLE rag_documents ADD COLUMN IF NOT EXISTS section_id TEXT;
+ALTER TABLE rag_documents ADD COLUMN IF NOT EXISTS heading_path TEXT;
+
+-- Direct section lookups match section_id exactly or by "5.%" prefix.
+CREATE INDEX IF NOT EXISTS rag_documents_section_id_idx
+ON rag_documents (section_id text_pattern_ops);
@@ -1,7 +1,9 @@
+import asyncio
 import psycopg2
 from dotenv import load_dotenv
 from pathlib import Path
 import os
+import sys
 BASE_DIR = Path(__file__).resolve().parent.parent
 env_path = BASE_DIR / ".env"
 
@@ -16,3 +18,34 @@ def get_connection():
         port=os.getenv("DB_PORT"),
     )
 
+
+def use_selector_event_loop() -> None:
+    """Switch Windows to the selector event loop policy; a no-op elsewhere.
+
+    psycopg 3 async connections (get_async_connection, the async LangGraph
+    checkpointer) cannot run on Windows' default ProactorEventLoop. Call this
+    before asyncio.run() or before the server creates its loop.
+    """
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+
+async def get_async_connection():
+    """psycopg 3 AsyncConnection with the same settings as get_connection().
+
+    psycopg 3 is imported here so synchronous callers never need it.
+    """
+    import psycopg
+
+    if sys.platform == "win32" and isinstance(asyncio.get_running_loop(), asyncio.ProactorEventLoop):
+        raise RuntimeError(
+            "psycopg async connections need a selector event loop on Windows; "
+            "call Database.session.use_selector_event_loop() before starting the loop"
+        )
+    return await psycopg.AsyncConnection.connect(
+        dbname=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"),
+        port=os.getenv("DB_PORT"),
+    )
@@ -0,0 +1,79 @@
+import struct
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+# Packed embedding layout (all little-endian):
+#   magic "EV" | format version u8 | dtype code u8 | dim u32 | scale f32 | dim codes
+# Codes decode to float32 as codes * scale; scale is 1.0 except for int8.
+_MAGIC = b"EV"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<2sBBIf")
+HEADER_SIZE = _HEADER.size
+
+DTYPES: Dict[str, Tuple[int, np.dtype]] = {
+    "float32": (0, np.dtype("<f4")),
+    "float16": (1, np.dtype("<f2")),
+    "int8": (2, np.dtype("i1")),
+}
+_BY_CODE = {code: (name, dt) for name, (code, dt) in DTYPES.items()}
+
+
+def check_dtype(dtype: str) -> str:
+    dtype = str(dtype).strip().lower()
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    return dtype
+
+
+def quantize_rows(matrix: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Compact codes for each row plus a per-row float32 scale.
+
+    int8 uses symmetric per-vector scaling (max |x| maps to 127); float
+    dtypes are a plain cast with scale 1.0.
+    """
+    dtype = check_dtype(dtype)
+    rows = np.asarray(matrix, dtype=np.float32)
+    if rows.ndim == 1:
+        rows = rows.reshape(1, -1)
+    if dtype != "int8":
+        return rows.astype(DTYPES[dtype][1]), np.ones(rows.shape[0], dtype=np.float32)
+
+    peaks = np.abs(rows).max(axis=1) if rows.size else np.zeros(rows.shape[0], dtype=np.float32)
+    scales = np.where(peaks > 0.0, peaks / 127.0, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(rows / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def dequantize_rows(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    out = np.asarray(codes, dtype=np.float32)
+    if codes.dtype == np.int8:
+        out = out * scales[:, None]
+    return out
+
+
+def pack_vector(vector: Any, dtype: str = "float32") -> bytes:
+    """Serialize one embedding for a BYTEA column."""
+    codes, scales = quantize_rows(np.asarray(vector, dtype=np.float32).reshape(1, -1), dtype)
+    code, _ = DTYPES[check_dtype(dtype)]
+    header = _HEADER.pack(_MAGIC, _FORMAT_VERSION, code, codes.shape[1], float(scales[0]))
+    return header + codes.tobytes()
+
+
+def unpack_vector(buf: Any) -> Tuple[np.ndarray, float, str]:
+    """Zero-copy (codes, scale, dtype name) view over a packed embedding."""
+    view = memoryview(buf)
+    magic, version, code, dim, scale = _HEADER.unpack_from(view)
+    if magic != _MAGIC or version != _FORMAT_VERSION or code not in _BY_CODE:
+        raise ValueError("Not a packed embedding")
+    name, dt = _BY_CODE[code]
+    codes = np.frombuffer(view, dtype=dt, count=dim, offset=HEADER_SIZE)
+    return codes, scale, name
+
+
+def decode_vector(buf: Any) -> np.ndarray:
+    """float32 embedding from packed bytes; float32 payloads are not copied."""
+    codes, scale, name = unpack_vector(buf)
+    if name == "float32":
+        return codes
+    return codes.astype(np.float32) * np.float32(scale)
@@ -1,14 +1,78 @@
 import json
 import hashlib
+import os
+import time
 from datetime import datetime
+from threading import Lock, Thread
 from typing import Any, Callable, Dict, List, Optional, Union
+from uuid import uuid4
 from langchain.agents.middleware import wrap_model_call, wrap_tool_call
 from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
 from langchain.agents.middleware import ModelRequest, ToolCallRequest
 from Database.session import get_connection
-from Config.model import get_embeddings
+from Config.model import get_embeddings, normalize_text
 from langgraph.config import get_config
+from Middleware.tracing import span, trace_event, trace_warning
+from Middleware.semantic_index import SemanticIndex
+from Middleware.write_behind import queue_write
+from Database.vector_codec import check_dtype, decode_vector, pack_vector
+from dotenv import load_dotenv
 import numpy as np
+import psycopg2
+
+load_dotenv()
+
+SEMANTIC_CACHE_THRESHOLD = 0.80
+# Dtype of semantic_cache.embedding_compact, scanned on every lookup:
+# "float32", "float16" or "int8".
+SEMANTIC_CACHE_DTYPE = check_dtype(os.getenv("SEMANTIC_CACHE_DTYPE", "float16"))
+# Best approximate matches re-scored against the exact float32 embedding.
+SEMANTIC_CACHE_RERANK = int(os.getenv("SEMANTIC_CACHE_RERANK", "5"))
+# How far below the threshold a compact-code score may be and still be worth
+# the exact re-score (quantization error is well under this).
+SEMANTIC_CACHE_MARGIN = float(os.getenv("SEMANTIC_CACHE_MARGIN", "0.02"))
+# Rows before the in-process index switches from an exact scan to IVF, and
+# how many IVF lists each lookup scores.
+SEMANTIC_CACHE_ANN_MIN_ROWS = int(os.getenv("SEMANTIC_CACHE_ANN_MIN_ROWS", "4096"))
+SEMANTIC_CACHE_NPROBE = int(os.getenv("SEMANTIC_CACHE_NPROBE", "8"))
+# How often (seconds) a worker pulls rows other workers added to semantic_cache.
+SEMANTIC_CACHE_SYNC_SECONDS = float(os.getenv("SEMANTIC_CACHE_SYNC_SECONDS", "5"))
+# Retention: entries older than the TTL are neither served nor kept (0 = no
+# TTL), and past the row cap the least-hit entries are pruned (0 = no cap).
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "604800"))
+SEMANTIC_CACHE_MAX_ROWS = int(os.getenv("SEMANTIC_CACHE_MAX_ROWS", "50000"))
+# A new response whose query is at least this similar to a stored one
+# refreshes that entry instead of adding a near-duplicate row.
+SEMANTIC_CACHE_DUPLICATE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_DUPLICATE_THRESHOLD", "0.97"))
+TOOL_CACHE_TTL_SECONDS = float(os.getenv("TOOL_CACHE_TTL_SECONDS", "900"))
+# Per-tool TTL overrides as "tool=seconds,...". Ticket reads are invalidated by
+# the write tools, so their TTL only bounds changes made outside the tools.
+TOOL_CACHE_TTLS = {
+    name.strip(): float(seconds)
+    for name, seconds in (
+        item.split("=", 1)
+        for item in os.getenv(
+            "TOOL_CACHE_TTLS", "get_ticket=3600,get_user_ticket_history=3600,get_ticket_status=3600"
+        ).split(",")
+        if "=" in item
+    )
+}
+TOOL_CACHE_MAX_ROWS = int(os.getenv("TOOL_CACHE_MAX_ROWS", "10000"))
+# Node-level LLM cache (Middleware/llm_cache.py): per-worker LRU entries,
+# whether entries are shared through the llm_cache table, and its retention.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").strip().lower() in {"1", "true", "yes"}
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_PERSIST = os.getenv("LLM_CACHE_PERSIST", "true").strip().lower() in {"1", "true", "yes"}
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_MAX_ROWS = int(os.getenv("LLM_CACHE_MAX_ROWS", "50000"))
+# Turn-level answer cache (Middleware/turn_cache.py), off by default. A turn
+# skips the graph only for a query at least this similar to a cached one.
+TURN_CACHE_ENABLED = os.getenv("TURN_CACHE_ENABLED", "false").strip().lower() in {"1", "true", "yes"}
+TURN_CACHE_THRESHOLD = float(os.getenv("TURN_CACHE_THRESHOLD", "0.95"))
+TURN_CACHE_TTL_SECONDS = float(os.getenv("TURN_CACHE_TTL_SECONDS", "86400"))
+TURN_CACHE_MAX_ROWS = int(os.getenv("TURN_CACHE_MAX_ROWS", "10000"))
+# How often (seconds) the background pruner enforces the limits above.
+CACHE_PRUNE_INTERVAL_SECONDS = float(os.getenv("CACHE_PRUNE_INTERVAL_SECONDS", "300"))
 
 # Semantic Cache
 def get_most_recent_user_query(messages: List[Any]) -> Optional[str]:
@@ -24,77 +88,254 @@ def cosine_similarity(a, b):
     b = np.array(b)
     return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
 
-@wrap_model_call
-def wrap_semantic_cache(request: ModelRequest, handler: Callable):
-    messages = request.messages
-    model = request.model
-    model_name = getattr(model, "model_name", "unknown") if hasattr(model, "model_name") else str(model)
+def _stored_vector(*payloads) -> Optional[np.ndarray]:
+    """First non-null payload decoded: packed BYTEA zero-copy, legacy JSONB parsed."""
+    for payload in payloads:
+        if payload is None:
+            continue
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            return decode_vector(payload)
+        return np.asarray(json.loads(payload) if isinstance(payload, str) else payload, dtype=np.float32)
+    return None
 
-    query = get_most_recent_user_query(messages)
-    if not query:
-        return handler(request)
 
-    embeddings = get_embeddings()
-    query_vector = embeddings.embed_query(query)
-    query_vector = np.array(query_vector)
+_SEMANTIC_INDEX: Optional[SemanticIndex] = None
+_SEMANTIC_INDEX_LOCK = Lock()
+_SEMANTIC_SYNCED_AT = 0.0
+# created_at of the newest row pulled into this worker's index.
+_SEMANTIC_WATERMARK: Optional[datetime] = None
 
+
+def _sync_semantic_index(index: SemanticIndex, since: Optional[datetime]) -> Optional[datetime]:
+    """Add semantic_cache rows created since `since` (all rows when None)."""
     conn = get_connection()
     cur = conn.cursor()
-
-    best_match = None
-    best_score = 0.0
-
     try:
+        # Rows commit out of created_at order across workers, so re-read a
+        # short overlap and skip ids already indexed.
         cur.execute("""
-            SELECT embedding, ai_response
+            SELECT id, created_at, query_hash, embedding_compact,
+                   CASE WHEN embedding_compact IS NULL THEN embedding_bin END,
+                   CASE WHEN embedding_compact IS NULL AND embedding_bin IS NULL THEN embedding END
             FROM semantic_cache
-        """)
+            WHERE (%s::timestamptz IS NULL OR created_at >= %s::timestamptz - INTERVAL '30 seconds')
+              AND (%s = 0 OR created_at > CURRENT_TIMESTAMP - %s * INTERVAL '1 second')
+        """, (since, since, SEMANTIC_CACHE_TTL_SECONDS, SEMANTIC_CACHE_TTL_SECONDS))
         rows = cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+    watermark = since
+    for row_id, created_at, key, *payloads in rows:
+        if created_at is not None and (watermark is None or created_at > watermark):
+            watermark = created_at
+        if row_id not in index:
+            index.add(row_id, _stored_vector(*payloads), key=key)
+    return watermark
+
+
+def get_semantic_index() -> SemanticIndex:
+    """Process-wide index of semantic_cache, caught up every SEMANTIC_CACHE_SYNC_SECONDS.
+
+    Postgres stays the source of truth: the first call loads the table, later
+    calls pull only rows other workers inserted since, and this worker's own
+    inserts are added directly.
+    """
+    global _SEMANTIC_INDEX, _SEMANTIC_SYNCED_AT, _SEMANTIC_WATERMARK
+    with _SEMANTIC_INDEX_LOCK:
+        now = time.monotonic()
+        if _SEMANTIC_INDEX is not None and now - _SEMANTIC_SYNCED_AT < SEMANTIC_CACHE_SYNC_SECONDS:
+            return _SEMANTIC_INDEX
+        index = _SEMANTIC_INDEX or SemanticIndex(SEMANTIC_CACHE_ANN_MIN_ROWS, SEMANTIC_CACHE_NPROBE)
+        with span("semantic_cache.sync", full=_SEMANTIC_INDEX is None) as sp:
+            _SEMANTIC_WATERMARK = _sync_semantic_index(index, _SEMANTIC_WATERMARK)
+            sp.set(rows=len(index))
+        _SEMANTIC_INDEX = index
+        _SEMANTIC_SYNCED_AT = now
+        return index
+
+
+def query_hash(query: str) -> str:
+    """semantic_cache.query_hash: sha256 of the normalized query text."""
+    return hashlib.sha256(normalize_text(query).encode("utf-8")).hexdigest()
+
+
+def _exact_hit(key: str) -> Optional[str]:
+    """Cached answer for a verbatim (normalized) repeat, found without embedding."""
+    index = get_semantic_index()
+    row_id = index.find_key(key)
+    if row_id is None:
+        return None
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE semantic_cache
+            SET hit_count = hit_count + 1, last_hit_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+              AND (%s = 0 OR created_at > CURRENT_TIMESTAMP - %s * INTERVAL '1 second')
+            RETURNING ai_response
+        """, (row_id, SEMANTIC_CACHE_TTL_SECONDS, SEMANTIC_CACHE_TTL_SECONDS))
+        match = cur.fetchone()
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+    # An expired row stays indexed; the similarity path below confirms it is
+    # gone, drops it and stores the new answer as a fresh row.
+    return match[0] if match else None
+
+
+def _exact_best(cur, query_vector: np.ndarray, candidates: List[Any]):
+    """(id, score) of the best candidate re-scored against its float32 embedding."""
+    cur.execute("""
+        SELECT id, embedding_bin, CASE WHEN embedding_bin IS NULL THEN embedding END
+        FROM semantic_cache
+        WHERE id = ANY(%s::uuid[])
+    """, ([str(row_id) for row_id in candidates],))
+    best_id, best_score = None, 0.0
+    for row_id, packed, legacy in cur.fetchall():
+        vec = _stored_vector(packed, legacy)
+        if vec is None or vec.shape != query_vector.shape:
+            continue
+        score = float(cosine_similarity(query_vector, vec))
+        if score > best_score:
+            best_id, best_score = row_id, score
+    return best_id, best_score
 
-        for row in rows:
-            stored_embedding = np.array(row[0])
-            ai_response = row[1]
 
-            score = cosine_similarity(query_vector, stored_embedding)
+# Multi-row statements for Middleware/write_behind.py. Ids are generated here
+# so a row can enter the in-process index before it is flushed.
+_SEMANTIC_INSERT = """
+    INSERT INTO semantic_cache (id, embedding_bin, embedding_compact, original_query, query_hash, ai_response, model_name)
+    VALUES %s
+"""
+_SEMANTIC_REFRESH = """
+    UPDATE semantic_cache AS c
+    SET ai_response = v.ai_response, model_name = v.model_name, original_query = v.original_query,
+        query_hash = v.query_hash, created_at = CURRENT_TIMESTAMP
+    FROM (VALUES %s) AS v (id, ai_response, model_name, original_query, query_hash)
+    WHERE c.id = v.id
+"""
 
-            if score > best_score:
-                best_score = score
-                best_match = ai_response
 
-        if best_score > 0.80 and best_match:
+@wrap_model_call
+def wrap_semantic_cache(request: ModelRequest, handler: Callable):
+    messages = request.messages
+    model = request.model
+    model_name = getattr(model, "model_name", "unknown") if hasattr(model, "model_name") else str(model)
+
+    query = get_most_recent_user_query(messages)
+    if not query:
+        return handler(request)
+
+    start_cache_pruner()
+    key = query_hash(query)
+    try:
+        with span("semantic_cache.exact") as sp:
+            answer = _exact_hit(key)
+            sp.set(hit=bool(answer))
+        if answer:
             config = get_config()
             config.setdefault("metadata", {})
             config["metadata"]["cache_hit"] = True
+            return AIMessage(content=answer)
+    except Exception as e:
+        trace_warning("semantic_cache.lookup_error", e)
 
-            cur.close()
-            conn.close()
-            return AIMessage(content=best_match)
+    # Only a verbatim miss pays for the embedding and the similarity lookup.
+    with span("semantic_cache.embed"):
+        embeddings = get_embeddings()
+        query_vector = embeddings.embed_query(query)
+        query_vector = np.array(query_vector)
+
+    best_id, best_score = None, 0.0
+    # Set when the confirmed best row turned out to be expired or deleted.
+    gone = False
+    conn = None
+    try:
+        index = get_semantic_index()
+        with span("semantic_cache.score", rows=len(index)) as sp:
+            candidates = index.search(query_vector, SEMANTIC_CACHE_RERANK)
+            best_id, best_score = candidates[0] if candidates else (None, 0.0)
+            sp.set(candidates=len(candidates), approx_score=float(best_score))
+
+        # Compact codes only shortlist: candidates that could clear the
+        # threshold are confirmed against their exact embeddings.
+        if best_id is not None and best_score > SEMANTIC_CACHE_THRESHOLD - SEMANTIC_CACHE_MARGIN:
+            conn = get_connection()
+            cur = conn.cursor()
+            try:
+                if SEMANTIC_CACHE_DTYPE != "float32":
+                    best_id, best_score = _exact_best(cur, query_vector, [row_id for row_id, _ in candidates])
+                hit = best_id is not None and best_score > SEMANTIC_CACHE_THRESHOLD
+                trace_event("semantic_cache.match", best_score=float(best_score), hit=hit)
+
+                if hit:
+                    # Counting the hit and reading the answer is one statement.
+                    cur.execute("""
+                        UPDATE semantic_cache
+                        SET hit_count = hit_count + 1, last_hit_at = CURRENT_TIMESTAMP
+                        WHERE id = %s
+                          AND (%s = 0 OR created_at > CURRENT_TIMESTAMP - %s * INTERVAL '1 second')
+                        RETURNING ai_response
+                    """, (best_id, SEMANTIC_CACHE_TTL_SECONDS, SEMANTIC_CACHE_TTL_SECONDS))
+                    match = cur.fetchone()
+                    conn.commit()
+                    if match and match[0]:
+                        config = get_config()
+                        config.setdefault("metadata", {})
+                        config["metadata"]["cache_hit"] = True
+                        return AIMessage(content=match[0])
+                    if match is None:
+                        # Expired or pruned by another worker; stop matching it here.
+                        index.remove(best_id)
+                        gone = True
+            finally:
+                cur.close()
 
     except Exception as e:
-        print(f"Cache lookup error: {e}")
+        trace_warning("semantic_cache.lookup_error", e)
     finally:
-        if not conn.closed:
-            cur.close()
+        if conn is not None:
             conn.close()
 
     # Call LLM
     response = handler(request)
 
-    # Store only final response
+    # Store only final response; the write itself happens off the request path.
     if isinstance(response, AIMessage) and not response.tool_calls:
-        conn = get_connection()
-        cur = conn.cursor()
         try:
-            cur.execute("""
-                INSERT INTO semantic_cache (embedding, original_query, ai_response, model_name)
-                VALUES (%s, %s, %s, %s)
-            """, (query_vector.tolist(), query, response.content, model_name))
-            conn.commit()
+            if best_id is not None and not gone and best_score >= SEMANTIC_CACHE_DUPLICATE_THRESHOLD:
+                # Near-identical query already stored but not served (e.g. an
+                # empty answer): refresh it rather than adding a second row.
+                queue_write(_SEMANTIC_REFRESH, (str(best_id), response.content, model_name, query, key),
+                            key=str(best_id), template="(%s::uuid, %s, %s, %s, %s)")
+                trace_event("semantic_cache.refresh", best_score=float(best_score))
+                # The refreshed row now answers to this query's hash.
+                get_semantic_index().add(best_id, query_vector, key=key)
+            else:
+                row_id = str(uuid4())
+                unit = query_vector / (np.linalg.norm(query_vector) or 1.0)
+                compact = pack_vector(unit, SEMANTIC_CACHE_DTYPE)
+                # Visible to this worker's next lookup without waiting for the
+                # flush, and dropped again if the insert never lands.
+                index = get_semantic_index()
+                index.add(row_id, decode_vector(compact), key=key)
+                queue_write(_SEMANTIC_INSERT, (
+                    row_id,
+                    psycopg2.Binary(pack_vector(query_vector)),
+                    psycopg2.Binary(compact),
+                    query,
+                    key,
+                    response.content,
+                    model_name,
+                ), on_failure=lambda: index.remove(row_id))
         except Exception as e:
-            print(f"Cache store error: {e}")
-        finally:
-            cur.close()
-            conn.close()
+            trace_warning("semantic_cache.store_error", e)
 
     return response
 
@@ -106,6 +347,77 @@ CACHEABLE_TOOLS = [
     "get_ticket_status"
 ]
 
+# A row read before one of its dependencies was invalidated is not stored,
+# however late the queued write reaches Postgres.
+_TOOL_UPSERT = """
+    INSERT INTO tool_cache (tool_name, args_hash, output, dependencies)
+    SELECT v.tool_name, v.args_hash, v.output, v.dependencies
+    FROM (VALUES %s) AS v (tool_name, args_hash, output, dependencies, read_at)
+    WHERE NOT EXISTS (
+        SELECT 1 FROM tool_cache_invalidations i
+        WHERE i.dependency = ANY(v.dependencies) AND i.invalidated_at >= v.read_at
+    )
+    ON CONFLICT (tool_name, args_hash) DO UPDATE
+    SET output = EXCLUDED.output, dependencies = EXCLUDED.dependencies,
+        created_at = CURRENT_TIMESTAMP, hit_count = 0, last_hit_at = NULL
+"""
+
+
+def tool_cache_ttl(tool_name: str) -> float:
+    return TOOL_CACHE_TTLS.get(tool_name, TOOL_CACHE_TTL_SECONDS)
+
+
+def _tool_cache_max_ttl() -> float:
+    ttls = [TOOL_CACHE_TTL_SECONDS, *TOOL_CACHE_TTLS.values()]
+    return 0.0 if any(ttl <= 0 for ttl in ttls) else max(ttls)
+
+
+def tool_dependencies(ticket_ids: Any = (), user_ids: Any = ()) -> List[str]:
+    """Dependency keys ("ticket:<id>", "user:<id>") of a cached tool result."""
+    deps = [f"ticket:{ticket_id}" for ticket_id in ticket_ids if ticket_id]
+    deps += [f"user:{user_id}" for user_id in user_ids if user_id]
+    return sorted(set(deps))
+
+
+def invalidate_tool_cache(ticket_ids: Any = (), user_ids: Any = ()) -> int:
+    """Drop cached tool results that depend on these tickets or users.
+
+    Call after the write has committed. A ticket also invalidates its owner's
+    history. The invalidation is recorded so that reads still in flight (or
+    queued in the write-behind) are not stored afterwards.
+    """
+    ticket_ids = [str(ticket_id) for ticket_id in ticket_ids if ticket_id]
+    deps = tool_dependencies(ticket_ids, user_ids)
+    if not deps:
+        return 0
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            WITH deps AS (
+                SELECT unnest(%s::text[]) AS dependency
+                UNION
+                SELECT 'user:' || user_id::text FROM tickets WHERE id::text = ANY(%s::text[])
+            ), cleared AS (
+                DELETE FROM tool_cache
+                WHERE dependencies && ARRAY(SELECT dependency FROM deps)
+                RETURNING id
+            ), recorded AS (
+                INSERT INTO tool_cache_invalidations (dependency, invalidated_at)
+                SELECT dependency, CURRENT_TIMESTAMP FROM deps
+                ON CONFLICT (dependency) DO UPDATE SET invalidated_at = EXCLUDED.invalidated_at
+            )
+            SELECT count(*) FROM cleared
+        """, (deps, ticket_ids))
+        cleared = cur.fetchone()[0]
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    trace_event("tool_cache.invalidate", dependencies=len(deps), cleared=cleared)
+    return cleared
+
+
 @wrap_tool_call
 def wrap_tool_cache(request: ToolCallRequest, handler: Callable):
     tool_name = request.tool.name if hasattr(request.tool, "name") else str(request.tool)
@@ -113,9 +425,11 @@ def wrap_tool_cache(request: ToolCallRequest, handler: Callable):
     
     if tool_name not in CACHEABLE_TOOLS:
         return handler(request)
+    start_cache_pruner()
     
     args_str = json.dumps(args, sort_keys=True)
     args_hash = hashlib.sha256(args_str.encode()).hexdigest()
+    ttl = tool_cache_ttl(tool_name)
     
     # Update metadata for logging (counting tool calls)
     if hasattr(request.runtime, "config") and "metadata" in request.runtime.config:
@@ -123,21 +437,32 @@ def wrap_tool_cache(request: ToolCallRequest, handler: Callable):
 
     conn = get_connection()
     cur = conn.cursor()
+    read_at = None
     
     try:
+        # The statement time doubles as the read time checked against
+        # invalidations when the result is stored.
         cur.execute("""
-            SELECT output FROM tool_cache
-            WHERE tool_name = %s AND args_hash = %s
-        """, (tool_name, args_hash))
+            WITH hit AS (
+                UPDATE tool_cache
+                SET hit_count = hit_count + 1, last_hit_at = CURRENT_TIMESTAMP
+                WHERE tool_name = %s AND args_hash = %s
+                  AND (%s = 0 OR created_at > CURRENT_TIMESTAMP - %s * INTERVAL '1 second')
+                RETURNING output
+            )
+            SELECT (SELECT output FROM hit), CURRENT_TIMESTAMP
+        """, (tool_name, args_hash, ttl, ttl))
         
-        match = cur.fetchone()
-        if match:
+        match, read_at = cur.fetchone()
+        conn.commit()
+        trace_event("tool_cache.lookup", tool=tool_name, hit=match is not None)
+        if match is not None:
             cur.close()
             conn.close()
-            return match[0] # output is JSONB/dict
+            return match # output is JSONB/dict
             
     except Exception as e:
-        print(f"Tool cache lookup error: {e}")
+        trace_warning("tool_cache.lookup_error", e, tool=tool_name)
     finally:
         if not conn.closed:
             cur.close()
@@ -146,21 +471,131 @@ def wrap_tool_cache(request: ToolCallRequest, handler: Callable):
     # Execute tool
     result = handler(request)
     
-    # Store result
+    # Store result; without a read time it cannot be ordered against invalidations.
+    if read_at is not None:
+        try:
+            deps = tool_dependencies([args.get("ticket_id")], [args.get("user_id")])
+            queue_write(
+                _TOOL_UPSERT,
+                (tool_name, args_hash, json.dumps(result), deps, read_at),
+                key=(tool_name, args_hash),
+                template="(%s, %s, %s::jsonb, %s::text[], %s::timestamptz)",
+            )
+        except Exception as e:
+            trace_warning("tool_cache.store_error", e, tool=tool_name)
+        
+    return result
+
+
+# Retention
+_PRUNER: Optional[Thread] = None
+_PRUNER_LOCK = Lock()
+# Any fixed key: only one worker prunes per interval.
+_PRUNE_LOCK_KEY = 0x5EC0CA5E
+
+
+def _prune_table(cur, table: str, ttl_seconds: float, max_rows: int) -> List[Any]:
+    """Delete expired rows, then the least-hit rows beyond max_rows; returns deleted ids."""
+    deleted: List[Any] = []
+    if ttl_seconds > 0:
+        cur.execute(f"""
+            DELETE FROM {table}
+            WHERE created_at <= CURRENT_TIMESTAMP - %s * INTERVAL '1 second'
+            RETURNING id
+        """, (ttl_seconds,))
+        deleted.extend(row[0] for row in cur.fetchall())
+    if max_rows > 0:
+        # LFU; among equally used entries the one idle longest goes first.
+        cur.execute(f"""
+            DELETE FROM {table}
+            WHERE id IN (
+                SELECT id FROM {table}
+                ORDER BY hit_count DESC, COALESCE(last_hit_at, created_at) DESC
+                OFFSET %s
+            )
+            RETURNING id
+        """, (max_rows,))
+        deleted.extend(row[0] for row in cur.fetchall())
+    return deleted
+
+
+def _prune_step(cur, table: str, step: Callable[[], List[Any]]) -> List[Any]:
+    """Run one table's pruning in a savepoint; a failure (say, a table that is
+    not migrated yet) is logged and rolled back without losing the others."""
+    cur.execute("SAVEPOINT cache_prune")
+    try:
+        deleted = step()
+    except Exception as e:
+        cur.execute("ROLLBACK TO SAVEPOINT cache_prune")
+        trace_warning("cache.prune_error", e, table=table)
+        return []
+    cur.execute("RELEASE SAVEPOINT cache_prune")
+    return deleted
+
+
+def _prune_tools(cur) -> List[Any]:
+    # Lookups apply the per-tool TTLs; rows go once past the longest one,
+    # and so do invalidation records no cached read can predate.
+    tool_ttl = _tool_cache_max_ttl()
+    deleted = _prune_table(cur, "tool_cache", tool_ttl, TOOL_CACHE_MAX_ROWS)
+    if tool_ttl > 0:
+        cur.execute("""
+            DELETE FROM tool_cache_invalidations
+            WHERE invalidated_at <= CURRENT_TIMESTAMP - %s * INTERVAL '1 second'
+        """, (tool_ttl,))
+    return deleted
+
+
+def prune_caches() -> Dict[str, int]:
+    """Apply TTL and size limits to semantic_cache, tool_cache, llm_cache and turn_cache once."""
     conn = get_connection()
     cur = conn.cursor()
     try:
-        cur.execute("""
-            INSERT INTO tool_cache (tool_name, args_hash, output)
-            VALUES (%s, %s, %s)
-            ON CONFLICT (tool_name, args_hash) DO UPDATE SET output = EXCLUDED.output, created_at = CURRENT_TIMESTAMP
-        """, (tool_name, args_hash, json.dumps(result)))
+        cur.execute("SELECT pg_try_advisory_xact_lock(%s)", (_PRUNE_LOCK_KEY,))
+        if not cur.fetchone()[0]:
+            conn.rollback()
+            return {"semantic_cache": 0, "tool_cache": 0, "llm_cache": 0, "turn_cache": 0}
+        semantic = _prune_step(cur, "semantic_cache", lambda: _prune_table(
+            cur, "semantic_cache", SEMANTIC_CACHE_TTL_SECONDS, SEMANTIC_CACHE_MAX_ROWS))
+        tools = _prune_step(cur, "tool_cache", lambda: _prune_tools(cur))
+        llm = _prune_step(cur, "llm_cache", lambda: _prune_table(
+            cur, "llm_cache", LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ROWS))
+        turns = _prune_step(cur, "turn_cache", lambda: _prune_table(
+            cur, "turn_cache", TURN_CACHE_TTL_SECONDS, TURN_CACHE_MAX_ROWS))
         conn.commit()
-    except Exception as e:
-        print(f"Tool cache store error: {e}")
     finally:
         cur.close()
         conn.close()
-        
-    return result
 
+    # Other workers drop these ids lazily, when a lookup finds them gone.
+    if _SEMANTIC_INDEX is not None:
+        for row_id in semantic:
+            _SEMANTIC_INDEX.remove(row_id)
+    stats = {
+        "semantic_cache": len(semantic),
+        "tool_cache": len(tools),
+        "llm_cache": len(llm),
+        "turn_cache": len(turns),
+    }
+    trace_event("cache.prune", **stats)
+    return stats
+
+
+def _prune_loop() -> None:
+    while True:
+        try:
+            prune_caches()
+        except Exception as e:
+            trace_warning("cache.prune_error", e)
+        time.sleep(CACHE_PRUNE_INTERVAL_SECONDS)
+
+
+def start_cache_pruner() -> None:
+    """Start the background pruning thread once per process."""
+    global _PRUNER
+    if _PRUNER is not None or CACHE_PRUNE_INTERVAL_SECONDS <= 0:
+        return
+    with _PRUNER_LOCK:
+        if _PRUNER is None:
+            _PRUNER = Thread(target=_prune_loop, name="cache-pruner", daemon=True)
+            _PRUNER.start()
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple, Type
+
+from langchain_core.messages import AIMessage, BaseMessage
+from pydantic import BaseModel
+
+from Database.session import get_connection
+from Middleware.cache import (
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_PERSIST,
+    LLM_CACHE_SIZE,
+    LLM_CACHE_TTL_SECONDS,
+    start_cache_pruner,
+)
+from Middleware.tracing import span, trace_warning
+from Middleware.write_behind import queue_write
+
+_LLM_UPSERT = """
+    INSERT INTO llm_cache (cache_key, model_name, output_kind, output)
+    VALUES %s
+    ON CONFLICT (cache_key) DO UPDATE
+    SET output = EXCLUDED.output, created_at = CURRENT_TIMESTAMP, hit_count = 0, last_hit_at = NULL
+"""
+
+
+def _message_payload(message: Any) -> Any:
+    if isinstance(message, BaseMessage):
+        return [message.type, message.content]
+    if isinstance(message, dict):
+        return [message.get("role"), message.get("content")]
+    return ["raw", str(message)]
+
+
+class CachedModel:
+    """Caching stand-in for model.invoke() inside graph nodes.
+
+    Results are keyed on the model name, the output schema (None for plain
+    text), the exact prompt messages and a hash of any extra context such as
+    rag_context. Hits come from a per-worker LRU first, then from the shared
+    llm_cache table. Structured outputs are stored as their JSON dump and
+    validated back into the schema; text outputs come back as AIMessage.
+    """
+
+    def __init__(
+        self,
+        runnable: Any,
+        model_name: str,
+        schema: Optional[Type[BaseModel]] = None,
+        max_entries: int = LLM_CACHE_SIZE,
+        persist: bool = LLM_CACHE_PERSIST,
+    ):
+        self.runnable = runnable
+        self.model_name = model_name
+        self.schema = schema
+        self.max_entries = max_entries
+        self.persist = persist
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def kind(self) -> str:
+        if self.schema is None:
+            return "text"
+        return f"{self.schema.__module__}.{self.schema.__qualname__}"
+
+    def cache_key(self, messages: Any, context: str = "") -> str:
+        prompt = messages if isinstance(messages, list) else [messages]
+        payload = json.dumps(
+            {
+                "model": self.model_name,
+                "kind": self.kind,
+                "messages": [_message_payload(m) for m in prompt],
+                "context": hashlib.sha256(str(context or "").encode("utf-8")).hexdigest(),
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _dump(self, result: Any) -> Optional[Dict[str, Any]]:
+        if self.schema is not None:
+            return result.model_dump(mode="json") if isinstance(result, BaseModel) else None
+        if isinstance(result, AIMessage) and not result.tool_calls:
+            return {"content": result.content}
+        return None
+
+    def _load(self, output: Dict[str, Any]) -> Any:
+        if self.schema is not None:
+            return self.schema.model_validate(output)
+        return AIMessage(content=output["content"])
+
+    def _get_local(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if LLM_CACHE_TTL_SECONDS > 0 and entry[0] + LLM_CACHE_TTL_SECONDS <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _put_local(self, key: str, output: Dict[str, Any]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), output)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_shared(self, key: str) -> Optional[Dict[str, Any]]:
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                UPDATE llm_cache
+                SET hit_count = hit_count + 1, last_hit_at = CURRENT_TIMESTAMP
+                WHERE cache_key = %s
+                  AND (%s = 0 OR created_at > CURRENT_TIMESTAMP - %s * INTERVAL '1 second')
+                RETURNING output
+            """, (key, LLM_CACHE_TTL_SECONDS, LLM_CACHE_TTL_SECONDS))
+            row = cur.fetchone()
+            conn.commit()
+            return row[0] if row else None
+        finally:
+            cur.close()
+            conn.close()
+
+    def _put_shared(self, key: str, output: Dict[str, Any]) -> None:
+        queue_write(_LLM_UPSERT, (key, self.model_name, self.kind, json.dumps(output)), key=key)
+
+    def lookup(self, key: str) -> Tuple[Optional[Any], Optional[str]]:
+        """(cached result, tier it came from), or (None, None) on a miss."""
+        output, tier = self._get_local(key), "memory"
+        if output is None and self.persist:
+            tier = "postgres"
+            try:
+                output = self._get_shared(key)
+            except Exception as e:
+                trace_warning("llm_cache.lookup_error", e, kind=self.kind)
+            if output is not None:
+                self._put_local(key, output)
+        if output is None:
+            return None, None
+        try:
+            return self._load(output), tier
+        except Exception as e:
+            # Schema changed since the entry was written; treat as a miss.
+            trace_warning("llm_cache.decode_error", e, kind=self.kind)
+            return None, None
+
+    def store(self, key: str, result: Any) -> None:
+        output = self._dump(result)
+        if output is None:
+            return
+        self._put_local(key, output)
+        if self.persist:
+            try:
+                self._put_shared(key, output)
+            except Exception as e:
+                trace_warning("llm_cache.store_error", e, kind=self.kind)
+
+    def invoke(self, messages: Any, config: Optional[Dict[str, Any]] = None, context: str = "") -> Any:
+        if not LLM_CACHE_ENABLED:
+            return self.runnable.invoke(messages, config=config)
+        if self.persist:
+            start_cache_pruner()
+
+        key = self.cache_key(messages, context)
+        with span("llm_cache", kind=self.kind) as sp:
+            cached, tier = self.lookup(key)
+            sp.set(hit=cached is not None, tier=tier)
+        if cached is not None:
+            return cached
+
+        result = self.runnable.invoke(messages, config=config)
+        self.store(key, result)
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def cache_model(model: Any, schema: Optional[Type[BaseModel]] = None) -> CachedModel:
+    """Wrap a chat model (structured to schema when given) in a CachedModel."""
+    runnable = model.with_structured_output(schema) if schema is not None else model
+    name = getattr(model, "model", None) or getattr(model, "model_name", None) or type(model).__name__
+    return CachedModel(runnable, str(name), schema)
@@ -5,11 +5,13 @@ from typing import Any, Dict, Optional
 from Database.session import get_connection
 from langchain.agents.middleware import before_agent, before_model, after_model, after_agent
 from langgraph.config import get_config
+from Middleware.tracing import trace_event, trace_warning
+
 
 @before_agent
 def before_agent_hook(state: Any, runtime: Any):
     config = get_config()
-    print(f"DEBUG: before_agent_hook called. State type: {type(state)}")
+    trace_event("agent.start", state_type=type(state).__name__)
     # Initialize logging context in metadata
     if "metadata" not in config:
         config["metadata"] = {}
@@ -112,7 +114,7 @@ def after_agent_hook(state: Any, runtime: Any):
         ))
         conn.commit()
     except Exception as e:
-        print(f"Logging error: {e}")
+        trace_warning("logger.store_error", e)
     finally:
         cur.close()
         conn.close()
@@ -4,6 +4,29 @@ from typing import Callable, Any
 from langchain.agents.middleware import wrap_model_call, ModelRequest
 
 from langgraph.config import get_config
+from Middleware.tracing import trace_warning
+
+
+def is_transient_error(e: Exception) -> bool:
+    """Timeouts, rate limits and 5xx-style failures that are worth retrying."""
+    # Simple detection of transient errors
+    error_msg = str(e).lower()
+    is_transient = any(term in error_msg for term in [
+        "timeout", "rate limit", "429", "500", "502", "503", "504",
+        "connection", "server error"
+    ])
+
+    # Check for validation/logic errors which shouldn't be retried
+    is_validation = any(term in error_msg for term in [
+        "validation", "invalid", "bad request", "400", "permission"
+    ])
+    return is_transient and not is_validation
+
+
+def backoff_delay(attempt: int, base_delay: float = 1) -> float:
+    # Exponential backoff: base * 2^attempt + jitter
+    return base_delay * (2 ** attempt) + random.uniform(0, 1)
+
 
 @wrap_model_call
 def wrap_retry(request: ModelRequest, handler: Callable):
@@ -14,27 +37,20 @@ def wrap_retry(request: ModelRequest, handler: Callable):
         try:
             return handler(request)
         except Exception as e:
-            # Simple detection of transient errors
-            error_msg = str(e).lower()
-            is_transient = any(term in error_msg for term in [
-                "timeout", "rate limit", "429", "500", "502", "503", "504", 
-                "connection", "server error"
-            ])
-            
-            # Check for validation/logic errors which shouldn't be retried
-            is_validation = any(term in error_msg for term in [
-                "validation", "invalid", "bad request", "400", "permission"
-            ])
-            
-            if is_transient and not is_validation and attempt < max_retries:
+            if is_transient_error(e) and attempt < max_retries:
                 # Update retry count in metadata
                 config = get_config()
                 if "metadata" in config:
                     config["metadata"]["retries"] = config["metadata"].get("retries", 0) + 1
                 
-                # Exponential backoff: base * 2^attempt + jitter
-                delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
-                print(f"Transient error detected: {e}. Retrying in {delay:.2f}s... (Attempt {attempt + 1}/{max_retries})")
+                delay = backoff_delay(attempt, base_delay)
+                trace_warning(
+                    "model.retry",
+                    e,
+                    delay_s=round(delay, 3),
+                    attempt=attempt + 1,
+                    max_retries=max_retries,
+                )
                 time.sleep(delay)
                 continue
             else:
@@ -0,0 +1,171 @@
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Spherical k-means passes when (re)training the coarse quantizer.
+_TRAIN_ITERATIONS = 8
+# Training sample per list; more rows barely move the centroids.
+_TRAIN_ROWS_PER_LIST = 64
+
+
+def _unit(vector: Any) -> Optional[np.ndarray]:
+    vec = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm > 0.0 else None
+
+
+class SemanticIndex:
+    """Incremental in-process nearest-neighbour index over cached query embeddings.
+
+    Below min_rows every lookup is an exact scan of one contiguous matrix.
+    From min_rows on, rows are grouped under k-means centroids (IVF) and a
+    lookup scores only the nprobe closest groups. New rows are appended and
+    assigned to their nearest centroid as they arrive. The centroids are
+    retrained whenever the index has doubled since the last training.
+
+    A row may also carry an exact key (e.g. a hash of the normalized query)
+    so verbatim repeats are found with find_key() without a vector.
+    """
+
+    def __init__(self, min_rows: int = 4096, nprobe: int = 8):
+        self.min_rows = min_rows
+        self.nprobe = nprobe
+        self._lock = Lock()
+        self._ids: List[Any] = []
+        self._positions: Dict[Any, int] = {}
+        self._keys: Dict[Any, Any] = {}
+        self._key_of: Dict[Any, Any] = {}
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._count = 0
+        self._live = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = []
+        self._trained_at = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    def __contains__(self, row_id: Any) -> bool:
+        with self._lock:
+            return row_id in self._positions
+
+    @property
+    def dim(self) -> int:
+        return self._matrix.shape[1]
+
+    def find_key(self, key: Any) -> Any:
+        """Id of the row added with this exact key, or None."""
+        with self._lock:
+            return self._keys.get(key)
+
+    def add(self, row_id: Any, vector: Any, key: Any = None) -> bool:
+        """Insert (or replace) one row; returns False for unusable vectors."""
+        vec = _unit(vector)
+        if vec is None:
+            return False
+        with self._lock:
+            if self._count and vec.shape[0] != self.dim:
+                return False
+            if row_id in self._positions:
+                self._remove(row_id)
+            if key is not None:
+                self._keys[key] = row_id
+                self._key_of[row_id] = key
+            if self._count == self._matrix.shape[0]:
+                # Amortized doubling so inserts stay O(1) on average.
+                grown = np.zeros((max(64, 2 * self._count), vec.shape[0]), dtype=np.float32)
+                if self._count:
+                    grown[:self._count] = self._matrix[:self._count]
+                alive = np.zeros(grown.shape[0], dtype=bool)
+                alive[:self._count] = self._alive[:self._count]
+                self._matrix, self._alive = grown, alive
+            pos = self._count
+            self._matrix[pos] = vec
+            self._alive[pos] = True
+            self._ids.append(row_id)
+            self._positions[row_id] = pos
+            self._count += 1
+            self._live += 1
+
+            if self._centroids is not None:
+                self._lists[int(np.argmax(self._centroids @ vec))].append(pos)
+            if self._live >= self.min_rows and self._live >= 2 * self._trained_at:
+                self._train()
+        return True
+
+    def remove(self, row_id: Any) -> None:
+        with self._lock:
+            self._remove(row_id)
+
+    def _remove(self, row_id: Any) -> None:
+        # Tombstone: the slot is skipped until the next training compacts it.
+        key = self._key_of.pop(row_id, None)
+        if key is not None and self._keys.get(key) == row_id:
+            del self._keys[key]
+        pos = self._positions.pop(row_id, None)
+        if pos is not None:
+            self._ids[pos] = None
+            self._alive[pos] = False
+            self._live -= 1
+
+    def _compact(self) -> None:
+        keep = np.flatnonzero(self._alive[:self._count])
+        self._matrix = self._matrix[keep]
+        self._alive = np.ones(keep.shape[0], dtype=bool)
+        self._ids = [self._ids[pos] for pos in keep.tolist()]
+        self._positions = {row_id: pos for pos, row_id in enumerate(self._ids)}
+        self._count = len(self._ids)
+
+    def _train(self) -> None:
+        self._compact()
+        rows = self._matrix[:self._count]
+        n_lists = max(1, int(np.sqrt(self._count)))
+        rng = np.random.default_rng(0)
+        sample = rows[rng.choice(self._count, min(self._count, n_lists * _TRAIN_ROWS_PER_LIST), replace=False)]
+        centroids = sample[rng.choice(sample.shape[0], n_lists, replace=False)].copy()
+        for _ in range(_TRAIN_ITERATIONS):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for j in range(n_lists):
+                members = sample[assign == j]
+                if members.shape[0]:
+                    center = members.sum(axis=0)
+                    norm = float(np.linalg.norm(center))
+                    if norm > 0.0:
+                        centroids[j] = center / norm
+
+        assign = np.argmax(rows @ centroids.T, axis=1)
+        lists: List[List[int]] = [[] for _ in range(n_lists)]
+        for pos, j in enumerate(assign.tolist()):
+            lists[j].append(pos)
+        self._centroids = centroids
+        self._lists = lists
+        self._trained_at = self._count
+
+    def search(self, query: Any, k: int) -> List[Tuple[Any, float]]:
+        """Up to k (id, cosine score) pairs, best first."""
+        vec = _unit(query)
+        if vec is None or k <= 0:
+            return []
+        with self._lock:
+            if not self._live or vec.shape[0] != self.dim:
+                return []
+            if self._centroids is None:
+                positions = np.flatnonzero(self._alive[:self._count])
+                scores = self._matrix[:self._count] @ vec
+                scores = scores[positions]
+            else:
+                probe = min(self.nprobe, len(self._lists))
+                nearest = np.argpartition(-(self._centroids @ vec), probe - 1)[:probe]
+                positions = np.fromiter(
+                    (pos for j in nearest for pos in self._lists[j]), dtype=np.int64
+                )
+                positions = positions[self._alive[positions]]
+                scores = self._matrix[positions] @ vec
+            if not positions.shape[0]:
+                return []
+            k = min(k, positions.shape[0])
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(self._ids[int(positions[i])], float(scores[i])) for i in top]
@@ -0,0 +1,177 @@
+import atexit
+import json
+import logging
+import os
+import time
+import urllib.request
+from contextvars import ContextVar
+from threading import Event, Lock, Thread
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Where finished spans go:
+#   ""                      - tracing disabled (default); span() is a no-op
+#   "jsonl:<path>"          - append one JSON object per span to <path>
+#   "http(s)://host/path"   - POST batches of spans as a JSON array to a local collector
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "").strip()
+TRACE_FLUSH_SECONDS = float(os.getenv("TRACE_FLUSH_SECONDS", "2"))
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", "256"))
+
+_CURRENT: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class _Exporter:
+    """Buffers span records and ships them from a background thread."""
+
+    def __init__(self, target: str):
+        self.target = target
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = Lock()
+        self._wake = Event()
+        self._thread = Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._buffer.append(record)
+            full = len(self._buffer) >= TRACE_BATCH_SIZE
+        if full:
+            self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(TRACE_FLUSH_SECONDS)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        try:
+            if self.target.startswith("jsonl:"):
+                with open(self.target[len("jsonl:"):], "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(r, default=str) + "\n" for r in batch)
+            else:
+                req = urllib.request.Request(
+                    self.target,
+                    data=json.dumps(batch, default=str).encode(),
+                    headers={"Content-Type": "application/json"},
+                    method="POST",
+                )
+                urllib.request.urlopen(req, timeout=2).close()
+        except Exception:
+            # Tracing must never take the request path down with it.
+            pass
+
+
+_EXPORTER: Optional[_Exporter] = _Exporter(TRACE_EXPORT) if TRACE_EXPORT else None
+
+
+class Span:
+    """A timed unit of work; use as a context manager and attach attributes with set()."""
+
+    __slots__ = ("name", "attrs", "trace_id", "span_id", "parent_id", "_start", "_t0", "_token")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        parent = _CURRENT.get()
+        self.name = name
+        self.attrs = attrs
+        self.trace_id = parent.trace_id if parent else uuid4().hex
+        self.span_id = uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+
+    def set(self, **attrs: Any) -> "Span":
+        self.attrs.update(attrs)
+        return self
+
+    def __enter__(self) -> "Span":
+        self._start = time.time()
+        self._t0 = time.perf_counter()
+        self._token = _CURRENT.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        duration_ms = (time.perf_counter() - self._t0) * 1000.0
+        _CURRENT.reset(self._token)
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self._start,
+            "duration_ms": round(duration_ms, 3),
+            "status": "error" if exc_type else "ok",
+            "attrs": self.attrs,
+        }
+        if exc is not None:
+            record["error"] = repr(exc)
+        _EXPORTER.export(record)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs: Any) -> "_NoopSpan":
+        return self
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def tracing_enabled() -> bool:
+    return _EXPORTER is not None
+
+
+def span(name: str, **attrs: Any):
+    """Start a span; returns a shared no-op object when tracing is disabled."""
+    if _EXPORTER is None:
+        return _NOOP_SPAN
+    return Span(name, attrs)
+
+
+def trace_event(name: str, **attrs: Any) -> None:
+    """Record a zero-duration span (errors, cache hits, decisions)."""
+    if _EXPORTER is None:
+        return
+    with Span(name, attrs):
+        pass
+
+
+def trace_warning(name: str, error: Any = None, **attrs: Any) -> None:
+    """trace_event() for a failure or degraded path, also logged as a warning.
+
+    The log line ("name: error (k=v, ...)") is emitted whether or not tracing
+    is enabled and is attributed to the caller's line.
+    """
+    message = name
+    if error is not None:
+        message += f": {error}"
+    if attrs:
+        message += " (" + ", ".join(f"{key}={value}" for key, value in attrs.items()) + ")"
+    if error is not None:
+        attrs["error"] = str(error)
+    trace_event(name, **attrs)
+    logger.warning("%s", message, stacklevel=2)
+
+
+def flush_traces() -> None:
+    if _EXPORTER is not None:
+        _EXPORTER.flush()
+
+
+atexit.register(flush_traces)
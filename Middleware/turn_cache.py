@@ -0,0 +1,236 @@
+import json
+import time
+from datetime import datetime
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import psycopg2
+from langchain_core.messages import AIMessage, HumanMessage
+
+from Config.model import get_embeddings
+from Database.session import get_connection
+from Database.vector_codec import decode_vector, pack_vector
+from Middleware.cache import (
+    SEMANTIC_CACHE_ANN_MIN_ROWS,
+    SEMANTIC_CACHE_NPROBE,
+    SEMANTIC_CACHE_SYNC_SECONDS,
+    TURN_CACHE_THRESHOLD,
+    TURN_CACHE_TTL_SECONDS,
+    query_hash,
+    start_cache_pruner,
+)
+from Middleware.semantic_index import SemanticIndex
+from Middleware.tracing import span, trace_event, trace_warning
+
+# Per-turn outputs of intent_splitter, router and policy that a hit restores.
+_CACHED_FIELDS = ("service_type", "rag_context", "rag_score", "rag_found")
+
+_LOCK = Lock()
+_INDEX: Optional[SemanticIndex] = None
+_INDEX_VERSION: Optional[int] = None
+_SYNCED_AT = 0.0
+_WATERMARK: Optional[datetime] = None
+
+
+def _sync(index: SemanticIndex, version: int, since: Optional[datetime]) -> Optional[datetime]:
+    """Add turn_cache rows of this corpus version created since `since` (all when None)."""
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT id, created_at, query_hash, embedding_bin
+            FROM turn_cache
+            WHERE corpus_version = %s
+              AND (%s::timestamptz IS NULL OR created_at >= %s::timestamptz - INTERVAL '30 seconds')
+              AND (%s = 0 OR created_at > CURRENT_TIMESTAMP - %s * INTERVAL '1 second')
+        """, (version, since, since, TURN_CACHE_TTL_SECONDS, TURN_CACHE_TTL_SECONDS))
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+    watermark = since
+    for row_id, created_at, key, packed in rows:
+        if created_at is not None and (watermark is None or created_at > watermark):
+            watermark = created_at
+        if row_id not in index and packed is not None:
+            index.add(row_id, decode_vector(packed), key=key)
+    return watermark
+
+
+def get_turn_index(version: int) -> SemanticIndex:
+    """In-process index of the turn_cache rows for one corpus version.
+
+    A new corpus version starts a fresh index, so answers built from an older
+    corpus are never matched again.
+    """
+    global _INDEX, _INDEX_VERSION, _SYNCED_AT, _WATERMARK
+    with _LOCK:
+        now = time.monotonic()
+        if _INDEX_VERSION != version:
+            _INDEX, _INDEX_VERSION, _WATERMARK = None, version, None
+        if _INDEX is not None and now - _SYNCED_AT < SEMANTIC_CACHE_SYNC_SECONDS:
+            return _INDEX
+        index = _INDEX or SemanticIndex(SEMANTIC_CACHE_ANN_MIN_ROWS, SEMANTIC_CACHE_NPROBE)
+        with span("turn_cache.sync", full=_INDEX is None, corpus_version=version) as sp:
+            _WATERMARK = _sync(index, version, _WATERMARK)
+            sp.set(rows=len(index))
+        _INDEX = index
+        _SYNCED_AT = now
+        return index
+
+
+def _pending(values: Dict[str, Any]) -> bool:
+    return any(task.get("status") == "PENDING" for task in values.get("tasks") or [])
+
+
+def turn_ready(values: Dict[str, Any]) -> bool:
+    """True when the thread is idle, so a new turn starts from intent splitting."""
+    return not (
+        values.get("awaiting_confirmation")
+        or values.get("status") == "AWAITING_USER"
+        or _pending(values)
+    )
+
+
+def _cacheable(before: Dict[str, Any], after: Dict[str, Any]) -> bool:
+    # One freshly split POLICY_QUERY task that was answered from the corpus.
+    tasks = after.get("tasks") or []
+    return (
+        len(tasks) == 1
+        and tasks != (before.get("tasks") or [])
+        and tasks[0].get("intent") == "POLICY_QUERY"
+        and after.get("intent") == "POLICY_QUERY"
+        and after.get("action") == "ANSWER"
+        and after.get("status") == "COMPLETED"
+        and bool(after.get("rag_found"))
+        and not after.get("error")
+    )
+
+
+def _final_answer(values: Dict[str, Any]) -> Optional[str]:
+    messages = values.get("messages") or []
+    if messages and isinstance(messages[-1], AIMessage) and not messages[-1].tool_calls:
+        return str(messages[-1].content)
+    return None
+
+
+def _hit_delta(query: str, answer: str, cached: Dict[str, Any]) -> Dict[str, Any]:
+    """State update equivalent to running the graph for a single policy task."""
+    service_type = cached.get("service_type", "GENERAL")
+    delta = {field: cached[field] for field in _CACHED_FIELDS if field in cached}
+    delta.update({
+        "messages": [HumanMessage(content=query), AIMessage(content=answer)],
+        "user_query": query,
+        "tasks": [{"sub_query": query, "intent": "POLICY_QUERY", "service_type": service_type, "status": "COMPLETED"}],
+        "current_task_index": 0,
+        "awaiting_confirmation": False,
+        "confirmed": False,
+        "intent": "POLICY_QUERY",
+        "action": "ANSWER",
+        "status": "COMPLETED",
+        "error": None,
+    })
+    return delta
+
+
+def lookup_turn(query: str, version: int) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+    """(state delta for a cached answer or None, query embedding if one was computed).
+
+    A normalized verbatim repeat is found by hash; anything else needs an
+    embedding at least TURN_CACHE_THRESHOLD similar to a cached question.
+    """
+    start_cache_pruner()
+    vector = None
+    try:
+        index = get_turn_index(version)
+        with span("turn_cache.lookup", rows=len(index)) as sp:
+            row_id = index.find_key(query_hash(query))
+            score = 1.0
+            if row_id is None and len(index):
+                vector = np.asarray(get_embeddings().embed_query(query), dtype=np.float32)
+                candidates = index.search(vector, 1)
+                if candidates and candidates[0][1] >= TURN_CACHE_THRESHOLD:
+                    row_id, score = candidates[0]
+            sp.set(hit=row_id is not None, score=float(score) if row_id is not None else None)
+        if row_id is None:
+            return None, vector
+
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                UPDATE turn_cache
+                SET hit_count = hit_count + 1, last_hit_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND corpus_version = %s
+                  AND (%s = 0 OR created_at > CURRENT_TIMESTAMP - %s * INTERVAL '1 second')
+                RETURNING answer, state_delta
+            """, (row_id, version, TURN_CACHE_TTL_SECONDS, TURN_CACHE_TTL_SECONDS))
+            match = cur.fetchone()
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+        if match is None:
+            # Expired or pruned; the next store of this question re-adds it.
+            index.remove(row_id)
+            return None, vector
+        answer, cached = match
+        return _hit_delta(query, answer, cached if isinstance(cached, dict) else json.loads(cached)), vector
+    except Exception as e:
+        trace_warning("turn_cache.lookup_error", e)
+        return None, vector
+
+
+def store_turn(
+    query: str,
+    version: int,
+    before: Dict[str, Any],
+    after: Dict[str, Any],
+    vector: Optional[np.ndarray] = None,
+    served: Optional[int] = None,
+) -> bool:
+    """Cache a completed single-intent policy turn under its corpus version.
+
+    served is the corpus version after the turn; when it moved on mid-turn
+    the answer may mix versions and is not stored.
+    """
+    answer = _final_answer(after)
+    if answer is None or not _cacheable(before, after) or (served is not None and served != version):
+        return False
+    try:
+        if vector is None:
+            vector = np.asarray(get_embeddings().embed_query(query), dtype=np.float32)
+        key = query_hash(query)
+        cached = {field: after.get(field) for field in _CACHED_FIELDS}
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                INSERT INTO turn_cache (corpus_version, query_hash, original_query, embedding_bin, answer, state_delta)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON CONFLICT (corpus_version, query_hash) DO UPDATE
+                SET answer = EXCLUDED.answer, state_delta = EXCLUDED.state_delta,
+                    embedding_bin = EXCLUDED.embedding_bin, original_query = EXCLUDED.original_query,
+                    created_at = CURRENT_TIMESTAMP, hit_count = 0, last_hit_at = NULL
+                RETURNING id
+            """, (
+                version,
+                key,
+                query,
+                psycopg2.Binary(pack_vector(vector)),
+                answer,
+                json.dumps(cached),
+            ))
+            row_id = cur.fetchone()[0]
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+        get_turn_index(version).add(row_id, vector, key=key)
+        trace_event("turn_cache.store", corpus_version=version)
+        return True
+    except Exception as e:
+        trace_warning("turn_cache.store_error", e)
+        return False
@@ -0,0 +1,240 @@
+import atexit
+import os
+from collections import deque
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+
+from Database.session import get_connection
+from Middleware.tracing import span, trace_warning
+
+load_dotenv()
+
+# Cache writes are queued and applied from a background thread; set to false
+# to write synchronously on the request path instead.
+CACHE_WRITE_BEHIND = os.getenv("CACHE_WRITE_BEHIND", "true").strip().lower() in {"1", "true", "yes"}
+# Queued writes beyond this are dropped (a cache entry is only an optimization).
+CACHE_WRITE_QUEUE_SIZE = int(os.getenv("CACHE_WRITE_QUEUE_SIZE", "2048"))
+# A flush starts once this many writes are queued, or every CACHE_WRITE_FLUSH_SECONDS.
+CACHE_WRITE_BATCH_SIZE = int(os.getenv("CACHE_WRITE_BATCH_SIZE", "128"))
+CACHE_WRITE_FLUSH_SECONDS = float(os.getenv("CACHE_WRITE_FLUSH_SECONDS", "0.5"))
+# How long process exit waits for the queue to drain.
+CACHE_WRITE_DRAIN_SECONDS = float(os.getenv("CACHE_WRITE_DRAIN_SECONDS", "5"))
+
+# (statement, row template, dedupe key, row, called if the row is not written)
+_Write = Tuple[str, Optional[str], Any, Sequence[Any], Optional[Callable[[], None]]]
+# (statement, row template, rows, failure callbacks of every write folded into it)
+_Statement = Tuple[str, Optional[str], List[Sequence[Any]], List[Callable[[], None]]]
+
+
+def _statements(batch: List[_Write]) -> List[_Statement]:
+    """Group queued rows into one multi-row statement each, in first-queued order.
+
+    Rows sharing a dedupe key collapse to the last one queued, which also keeps
+    a multi-row ON CONFLICT DO UPDATE from touching the same row twice.
+    """
+    groups: Dict[Tuple[str, Optional[str]], Dict[Any, Sequence[Any]]] = {}
+    callbacks: Dict[Tuple[str, Optional[str]], List[Callable[[], None]]] = {}
+    for sql, template, key, row, on_failure in batch:
+        rows = groups.setdefault((sql, template), {})
+        if key is None:
+            key = object()
+        else:
+            rows.pop(key, None)
+        rows[key] = row
+        if on_failure is not None:
+            callbacks.setdefault((sql, template), []).append(on_failure)
+    return [
+        (sql, template, list(rows.values()), callbacks.get((sql, template), []))
+        for (sql, template), rows in groups.items()
+    ]
+
+
+def _notify(callbacks: List[Callable[[], None]]) -> None:
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception as e:
+            trace_warning("write_behind.callback_error", e)
+
+
+def _apply(batch: List[_Write]) -> int:
+    """Write a batch; returns the number of statements that failed.
+
+    Each statement runs in its own savepoint, so one bad statement (say, a
+    table that is not migrated yet) does not roll back the others. The
+    on_failure callbacks of writes that did not land are called afterwards.
+    """
+    statements = _statements(batch)
+    failed: List[Callable[[], None]] = []
+    errors = 0
+    conn = cur = None
+    try:
+        # Inside the try: an unreachable database must still run the callbacks.
+        conn = get_connection()
+        cur = conn.cursor()
+        for sql, template, rows, callbacks in statements:
+            cur.execute("SAVEPOINT write_behind")
+            try:
+                execute_values(cur, sql, rows, template=template, page_size=CACHE_WRITE_BATCH_SIZE)
+            except Exception as e:
+                cur.execute("ROLLBACK TO SAVEPOINT write_behind")
+                trace_warning("write_behind.statement_error", e, rows=len(rows))
+                failed.extend(callbacks)
+                errors += 1
+            else:
+                cur.execute("RELEASE SAVEPOINT write_behind")
+        conn.commit()
+    except Exception:
+        _notify([callback for _, _, _, callbacks in statements for callback in callbacks])
+        if conn is not None:
+            conn.rollback()
+        raise
+    finally:
+        if cur is not None:
+            cur.close()
+        if conn is not None:
+            conn.close()
+    _notify(failed)
+    return errors
+
+
+class WriteBehind:
+    """Bounded queue of cache INSERT/UPSERT rows, flushed in batches by a daemon thread.
+
+    Statements are written with a single "VALUES %s" placeholder and applied with
+    execute_values, one transaction per flush and one savepoint per statement.
+    Failed writes are traced and dropped rather than retried; their on_failure
+    callbacks let callers undo in-process state that assumed the row exists.
+    """
+
+    def __init__(
+        self,
+        max_pending: int = CACHE_WRITE_QUEUE_SIZE,
+        batch_size: int = CACHE_WRITE_BATCH_SIZE,
+        flush_seconds: float = CACHE_WRITE_FLUSH_SECONDS,
+    ):
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.dropped = 0
+        self._pending: Deque[_Write] = deque()
+        self._lock = Lock()
+        # Held for a whole flush so batches reach Postgres in queue order.
+        self._flush_lock = Lock()
+        self._wake = Event()
+        self._stopped = False
+        self._thread: Optional[Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def submit(
+        self,
+        sql: str,
+        row: Sequence[Any],
+        key: Any = None,
+        template: Optional[str] = None,
+        on_failure: Optional[Callable[[], None]] = None,
+    ) -> bool:
+        """Queue one row for sql; returns False when the queue is full and it was dropped.
+
+        on_failure is also called for a dropped row.
+        """
+        write = (sql, template, key, row, on_failure)
+        stopped = full = dropped = False
+        with self._lock:
+            if self._stopped:
+                stopped = True
+            elif len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                trace_warning("write_behind.dropped", pending=len(self._pending))
+                dropped = True
+            else:
+                self._pending.append(write)
+                full = len(self._pending) >= self.batch_size
+                if self._thread is None:
+                    self._thread = Thread(target=self._run, name="cache-write-behind", daemon=True)
+                    self._thread.start()
+        if dropped:
+            _notify([on_failure] if on_failure is not None else [])
+            return False
+        if stopped:
+            # Late writes during shutdown go straight to the database.
+            _apply([write])
+        elif full:
+            self._wake.set()
+        return True
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+            if self._stopped:
+                return
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns the number of rows taken."""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+                self._pending.clear()
+            if not batch:
+                return 0
+            try:
+                with span("write_behind.flush", rows=len(batch)):
+                    _apply(batch)
+            except Exception as e:
+                trace_warning("write_behind.flush_error", e, rows=len(batch))
+            return len(batch)
+
+    def drain(self, timeout: float = CACHE_WRITE_DRAIN_SECONDS) -> None:
+        """Stop the worker after it has written everything queued."""
+        with self._lock:
+            self._stopped = True
+            thread = self._thread
+        self._wake.set()
+        if thread is not None:
+            thread.join(timeout)
+        self.flush()
+
+
+_WRITER: Optional[WriteBehind] = None
+_WRITER_LOCK = Lock()
+
+
+def get_write_behind() -> WriteBehind:
+    """Process-wide write-behind queue."""
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = WriteBehind()
+        return _WRITER
+
+
+def queue_write(
+    sql: str,
+    row: Sequence[Any],
+    key: Any = None,
+    template: Optional[str] = None,
+    on_failure: Optional[Callable[[], None]] = None,
+) -> None:
+    """Queue a cache write, or apply it now when CACHE_WRITE_BEHIND is off.
+
+    on_failure runs if the row is dropped or its statement fails.
+    """
+    if CACHE_WRITE_BEHIND:
+        get_write_behind().submit(sql, row, key=key, template=template, on_failure=on_failure)
+    else:
+        _apply([(sql, template, key, row, on_failure)])
+
+
+def drain_writes() -> None:
+    if _WRITER is not None:
+        _WRITER.drain()
+
+
+atexit.register(drain_writes)
@@ -0,0 +1,146 @@
+import math
+from typing import Any, Dict, List, Optional, Sequence
+
+from Config.rag import RAG_CONTEXT_TOKEN_BUDGET
+from Middleware.tracing import trace_event
+
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+# Shortest shared edge treated as splitter overlap rather than coincidence.
+_MIN_OVERLAP_CHARS = 30
+# Paragraphs shorter than this (headings, bullets) may legitimately repeat.
+_MIN_DEDUP_CHARS = 40
+# Rough characters-per-token ratio for English policy text.
+_CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate; good enough for budgeting, no tokenizer needed."""
+    return math.ceil(len(text) / _CHARS_PER_TOKEN)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def _overlap_merge(a: str, b: str) -> Optional[str]:
+    """a and b joined on a shared edge (a's tail == b's head), or None."""
+    head = b[:_MIN_OVERLAP_CHARS]
+    start = a.find(head)
+    while start != -1:
+        tail = a[start:]
+        if b.startswith(tail):
+            return a + b[len(tail):]
+        start = a.find(head, start + 1)
+    return None
+
+
+def _merge(a: str, b: str) -> Optional[str]:
+    if b in a:
+        return a
+    if a in b:
+        return b
+    if min(len(a), len(b)) < _MIN_OVERLAP_CHARS:
+        return None
+    return _overlap_merge(a, b) or _overlap_merge(b, a)
+
+
+def _merge_source(blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Collapse chunks of one source that overlap or contain each other."""
+    merged: List[Dict[str, Any]] = []
+    for block in blocks:
+        current = dict(block)
+        changed = True
+        while changed:
+            changed = False
+            for other in merged:
+                text = _merge(other["text"], current["text"])
+                if text is not None:
+                    merged.remove(other)
+                    current = dict(current, text=text, score=max(other["score"], current["score"]))
+                    changed = True
+                    break
+        merged.append(current)
+    return merged
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    cut = text[:max_chars]
+    boundary = max(cut.rfind("\n"), cut.rfind(". "))
+    if boundary > max_chars // 2:
+        cut = cut[:boundary + 1]
+    return cut.rstrip()
+
+
+def assemble_context(
+    results: Sequence[Dict[str, Any]],
+    token_budget: Optional[int] = None,
+    prior: str = "",
+) -> str:
+    """Build rag_context from retrieval results within a token budget.
+
+    Overlapping or contained chunks from the same source_file are merged,
+    paragraphs already emitted are dropped, and blocks are added greedily by
+    score until token_budget (RAG_CONTEXT_TOKEN_BUDGET by default) is spent.
+    prior is context already in state; it is kept first and counts against
+    the budget.
+    """
+    budget = RAG_CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+
+    by_source: Dict[str, List[Dict[str, Any]]] = {}
+    for r in results:
+        text = str(r.get("chunk_text") or "").strip()
+        if text:
+            source = str(r.get("source_file") or "")
+            by_source.setdefault(source, []).append(
+                {"text": text, "score": float(r.get("score") or 0.0), "source": source}
+            )
+    blocks = [b for group in by_source.values() for b in _merge_source(group)]
+    blocks.sort(key=lambda b: b["score"], reverse=True)
+
+    parts: List[str] = []
+    seen = set()
+    emitted = ""
+    used = 0
+    for text in ([prior.strip()] if prior.strip() else []) + [b["text"] for b in blocks]:
+        # Same text retrieved under another source (or already in prior).
+        if _normalize(text) in emitted:
+            continue
+        paragraphs = []
+        # Only a block that makes it into the context marks its paragraphs
+        # seen; a skipped one must not hide them from lower-scored blocks.
+        keys = set()
+        for paragraph in text.split("\n"):
+            key = _normalize(paragraph)
+            if len(key) >= _MIN_DEDUP_CHARS:
+                if key in seen or key in keys or any(key in s for s in seen | keys):
+                    continue
+                keys.add(key)
+            paragraphs.append(paragraph)
+        text = "\n".join(paragraphs).strip()
+        if not text:
+            continue
+
+        cost = estimate_tokens(text) + (estimate_tokens(CONTEXT_SEPARATOR) if parts else 0)
+        if used + cost > budget:
+            if parts:
+                continue
+            # Never return nothing because the best block alone is too long.
+            text = _truncate(text, budget * _CHARS_PER_TOKEN)
+            cost = estimate_tokens(text)
+            keys = {key for key in keys if key in _normalize(text)}
+        parts.append(text)
+        seen |= keys
+        emitted += _normalize(text) + "\n"
+        used += cost
+
+    raw_tokens = sum(estimate_tokens(str(r.get("chunk_text") or "")) for r in results)
+    trace_event(
+        "rag.context",
+        chunks=len(results),
+        blocks=len(parts),
+        tokens=used,
+        raw_tokens=raw_tokens,
+        budget=budget,
+    )
+    return CONTEXT_SEPARATOR.join(parts)
@@ -0,0 +1,50 @@
+import time
+from threading import Lock
+from typing import Any, Optional
+
+from Database.session import get_connection
+from Config.rag import RAG_INDEX_REFRESH_SECONDS
+
+
+def get_corpus_version(cur: Any) -> int:
+    """Return the current rag_documents version stamp (0 when never bumped)."""
+    cur.execute("SELECT version FROM rag_corpus_version WHERE id = TRUE")
+    row = cur.fetchone()
+    return int(row[0]) if row else 0
+
+
+def bump_corpus_version(cur: Any) -> int:
+    """Increment the corpus version inside the caller's transaction and return it."""
+    cur.execute("""
+        INSERT INTO rag_corpus_version (id, version, updated_at)
+        VALUES (TRUE, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (id) DO UPDATE
+        SET version = rag_corpus_version.version + 1, updated_at = CURRENT_TIMESTAMP
+        RETURNING version
+    """)
+    return int(cur.fetchone()[0])
+
+
+_LOCK = Lock()
+_VERSION: Optional[int] = None
+_LAST_CHECK = 0.0
+
+
+def current_corpus_version() -> int:
+    """Process-wide corpus version, re-read at most every RAG_INDEX_REFRESH_SECONDS."""
+    global _VERSION, _LAST_CHECK
+    with _LOCK:
+        now = time.monotonic()
+        if _VERSION is not None and now - _LAST_CHECK < RAG_INDEX_REFRESH_SECONDS:
+            return _VERSION
+
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            _VERSION = get_corpus_version(cur)
+        finally:
+            cur.close()
+            conn.close()
+
+        _LAST_CHECK = now
+        return _VERSION
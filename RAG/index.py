@@ -0,0 +1,487 @@
+import json
+import struct
+import time
+from collections.abc import Sequence as SequenceABC
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from Database.session import get_connection
+from Database.vector_codec import check_dtype, decode_vector, dequantize_rows, quantize_rows
+from Config.rag import RAG_INDEX_DTYPE, RAG_INDEX_REFRESH_SECONDS, RAG_RERANK_OVERSAMPLE, RAG_SEARCH_MODE
+from RAG.corpus import get_corpus_version
+from Middleware.tracing import span, trace_event, trace_warning
+
+# Rows dequantized per block when scanning compact codes, so a query never
+# materializes a float32 copy of the whole matrix.
+_SCAN_BLOCK_ROWS = 4096
+
+ExactLoader = Callable[[List[Any]], Dict[Any, np.ndarray]]
+
+
+def _to_vector(value: Any) -> Optional[np.ndarray]:
+    """Convert JSON/DB vector payload into 1D float vector."""
+    if value is None:
+        return None
+
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        try:
+            return decode_vector(value)
+        except (ValueError, TypeError, struct.error):
+            return None
+
+    parsed = value
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+        except json.JSONDecodeError:
+            return None
+
+    if not isinstance(parsed, (list, tuple)):
+        return None
+
+    try:
+        vec = np.asarray(parsed, dtype=np.float32).reshape(-1)
+    except (ValueError, TypeError):
+        return None
+
+    if vec.size == 0:
+        return None
+
+    return vec
+
+
+def _normalize(vec: np.ndarray) -> Optional[np.ndarray]:
+    norm = float(np.linalg.norm(vec))
+    if norm == 0.0 or not np.isfinite(norm):
+        return None
+    return vec / norm
+
+
+def department_key(department: Any) -> str:
+    """Map stored department names ("HR_Policies") and routed service types ("HR") to one key."""
+    return str(department or "").split("_", 1)[0].strip().casefold()
+
+
+class VectorIndex:
+    """Immutable in-memory index over every chunk in rag_documents.
+
+    Embeddings live in one contiguous, L2-normalized matrix so a query is
+    scored with a single matrix-vector product. Rows are grouped by
+    department, so each department partition is a contiguous slice of it.
+
+    The matrix may hold float16 or per-row scaled int8 codes instead of
+    float32. Compact indexes shortlist top_k * RAG_RERANK_OVERSAMPLE
+    candidates and re-score them against exact vectors from exact_loader.
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[Any],
+        departments: Sequence[str],
+        source_files: Sequence[str],
+        chunk_texts: Sequence[str],
+        codes: np.ndarray,
+        version: int,
+        scales: Optional[np.ndarray] = None,
+        exact_loader: Optional[ExactLoader] = None,
+    ):
+        self.ids = list(ids)
+        self.departments = list(departments)
+        self.source_files = list(source_files)
+        # Snapshot-backed indexes pass a lazily decoded sequence; keep it as is.
+        self.chunk_texts = chunk_texts if isinstance(chunk_texts, SequenceABC) else list(chunk_texts)
+        codes = np.asarray(codes)
+        if codes.dtype not in (np.float16, np.int8):
+            codes = codes.astype(np.float32, copy=False)
+        self.codes = np.ascontiguousarray(codes)
+        self.scales = (
+            np.asarray(scales, dtype=np.float32)
+            if scales is not None
+            else np.ones(self.codes.shape[0], dtype=np.float32)
+        )
+        self.version = version
+        self.exact_loader = exact_loader
+        self._lexical = None
+        self._lexical_lock = Lock()
+        self._row_of_id: Optional[Dict[Any, int]] = None
+
+        self.partitions: Dict[str, Tuple[int, int]] = {}
+        for i, dept in enumerate(self.departments):
+            key = department_key(dept)
+            start, end = self.partitions.get(key, (i, i))
+            if end != i:
+                raise ValueError("VectorIndex rows must be grouped by department")
+            self.partitions[key] = (start, i + 1)
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: Iterable[Sequence[Any]],
+        version: int,
+        dtype: str = "float32",
+        exact_loader: Optional[ExactLoader] = None,
+    ) -> "VectorIndex":
+        """Build from (id, department, source_file, chunk_text, embedding) rows.
+
+        Rows with unparsable, zero-norm or off-dimension embeddings are dropped.
+        """
+        ids, departments, source_files, chunk_texts, vectors = [], [], [], [], []
+        dim = None
+        for row_id, dept, source_file, chunk_text, embedding in rows:
+            vec = _to_vector(embedding)
+            if vec is None:
+                continue
+            if dim is None:
+                dim = vec.shape[0]
+            if vec.shape[0] != dim:
+                continue
+            vec = _normalize(vec)
+            if vec is None:
+                continue
+            ids.append(row_id)
+            departments.append(dept)
+            source_files.append(source_file)
+            chunk_texts.append(chunk_text)
+            vectors.append(vec)
+
+        if not vectors:
+            return cls([], [], [], [], np.zeros((0, 0), dtype=np.float32), version)
+
+        order = sorted(range(len(ids)), key=lambda i: department_key(departments[i]))
+        codes, scales = quantize_rows(np.vstack([vectors[i] for i in order]), dtype)
+        return cls(
+            [ids[i] for i in order],
+            [departments[i] for i in order],
+            [source_files[i] for i in order],
+            [chunk_texts[i] for i in order],
+            codes,
+            version,
+            scales=scales,
+            exact_loader=exact_loader,
+        )
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.codes.shape[1] if self.codes.ndim == 2 else 0
+
+    @property
+    def dtype(self) -> str:
+        return str(self.codes.dtype)
+
+    @property
+    def compact(self) -> bool:
+        return self.codes.dtype != np.float32
+
+    def _scores(self, queries: np.ndarray, start: int, end: int) -> np.ndarray:
+        """Similarity of each normalized query against rows start:end only."""
+        if not self.compact:
+            return queries @ self.codes[start:end].T
+        scores = np.empty((queries.shape[0], end - start), dtype=np.float32)
+        for lo in range(start, end, _SCAN_BLOCK_ROWS):
+            hi = min(lo + _SCAN_BLOCK_ROWS, end)
+            block = dequantize_rows(self.codes[lo:hi], self.scales[lo:hi])
+            scores[:, lo - start:hi - start] = queries @ block.T
+        return scores
+
+    def has_department(self, department: Any) -> bool:
+        return department_key(department) in self.partitions
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        top_k: int,
+        department: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Return the top_k chunks by cosine similarity, best first.
+
+        With department set, only that department's partition is scored; an
+        unknown department yields no results.
+        """
+        return self.search_many([query_vector], top_k, [department])[0]
+
+    def search_many(
+        self,
+        query_vectors: Sequence[np.ndarray],
+        top_k: int,
+        departments: Optional[Sequence[Optional[str]]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """search() for several queries, scored with one matrix-matrix product."""
+        results: List[List[Dict[str, Any]]] = [[] for _ in query_vectors]
+        if len(self) == 0 or top_k <= 0 or not results:
+            return results
+        if departments is None:
+            departments = [None] * len(results)
+
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(len(results), -1)
+        if queries.shape[1] != self.dim:
+            return results
+        norms = np.linalg.norm(queries, axis=1)
+        valid = np.isfinite(norms) & (norms > 0.0)
+        if not valid.any():
+            return results
+
+        normalized = queries[valid] / norms[valid, None]
+        rerank = self.compact and self.exact_loader is not None
+        first_pass = top_k * max(RAG_RERANK_OVERSAMPLE, 1) if rerank else top_k
+
+        # Queries sharing a partition are scored together against its rows only;
+        # the whole matrix is read just for queries without a department.
+        groups: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        for row, i in enumerate(np.flatnonzero(valid)):
+            offset, end = 0, len(self)
+            if departments[i]:
+                partition = self.partitions.get(department_key(departments[i]))
+                if partition is None:
+                    continue
+                offset, end = partition
+            groups.setdefault((offset, end), []).append((row, int(i)))
+
+        shortlists: Dict[int, Tuple[int, np.ndarray]] = {}
+        for (offset, end), members in groups.items():
+            scores = self._scores(normalized[[row for row, _ in members]], offset, end)
+            for window, (row, i) in zip(scores, members):
+                k = min(first_pass, window.shape[0])
+                if k < window.shape[0]:
+                    candidates = np.argpartition(-window, k - 1)[:k]
+                else:
+                    candidates = np.arange(window.shape[0])
+                order = candidates[np.argsort(-window[candidates], kind="stable")]
+                results[i] = [self._result(offset + int(j), float(window[j])) for j in order[:top_k]]
+                shortlists[i] = (row, order + offset)
+
+        if rerank and shortlists:
+            self._rerank(normalized, shortlists, top_k, results)
+        return results
+
+    def _rerank(
+        self,
+        normalized: np.ndarray,
+        shortlists: Dict[int, Tuple[int, np.ndarray]],
+        top_k: int,
+        results: List[List[Dict[str, Any]]],
+    ) -> None:
+        """Replace approximate results with exact float32 scores, one loader call for all queries."""
+        wanted = sorted({int(r) for _, rows in shortlists.values() for r in rows})
+        with span("rag.rerank", candidates=len(wanted)):
+            exact = self.exact_loader([self.ids[r] for r in wanted])
+        if not exact:
+            return
+
+        for i, (row, candidates) in shortlists.items():
+            query = normalized[row]
+            rescored = []
+            for r in candidates:
+                vec = exact.get(self.ids[int(r)])
+                if vec is not None and vec.shape[0] == query.shape[0]:
+                    rescored.append((float(vec @ query), int(r)))
+            if rescored:
+                rescored.sort(key=lambda item: item[0], reverse=True)
+                results[i] = [self._result(r, score) for score, r in rescored[:top_k]]
+
+    def score_ids(self, query_vector: np.ndarray, ids: Iterable[Any]) -> Dict[Any, float]:
+        """Cosine similarity between query_vector and the given chunk ids.
+
+        Compact indexes answer from their dequantized codes.
+        """
+        if self._row_of_id is None:
+            self._row_of_id = {row_id: i for i, row_id in enumerate(self.ids)}
+        rows = [self._row_of_id[i] for i in ids if i in self._row_of_id]
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(query))
+        if not rows or query.shape[0] != self.dim or norm == 0.0:
+            return {}
+        scores = dequantize_rows(self.codes[rows], self.scales[rows]) @ (query / norm)
+        return {self.ids[row]: float(score) for row, score in zip(rows, scores)}
+
+    def lexical(self):
+        """BM25 index over the same chunks, built on first use."""
+        with self._lexical_lock:
+            if self._lexical is None:
+                from RAG.lexical import BM25Index
+
+                self._lexical = BM25Index(
+                    self.ids, self.departments, self.source_files, self.chunk_texts, self.version
+                )
+            return self._lexical
+
+    def _result(self, i: int, score: float) -> Dict[str, Any]:
+        return {
+            "id": self.ids[i],
+            "department": self.departments[i],
+            "source_file": self.source_files[i],
+            "chunk_text": self.chunk_texts[i],
+            "score": score,
+        }
+
+
+_LOCK = Lock()
+_LOAD_LOCK = Lock()
+_INDEX: Optional[VectorIndex] = None
+_RELOADING = False
+_LAST_CHECK = 0.0
+
+
+def _first(*payloads: Any) -> Any:
+    return next((p for p in payloads if p is not None), None)
+
+
+def fetch_exact_vectors(ids: List[Any]) -> Dict[Any, np.ndarray]:
+    """Normalized float32 embeddings for the given rag_documents ids."""
+    if not ids:
+        return {}
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT id, embedding_bin,
+                   CASE WHEN embedding_bin IS NULL THEN embedding END
+            FROM rag_documents
+            WHERE id = ANY(%s)
+        """, (list(ids),))
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+    exact: Dict[Any, np.ndarray] = {}
+    for row_id, packed, legacy in rows:
+        vec = _to_vector(_first(packed, legacy))
+        vec = _normalize(vec) if vec is not None else None
+        if vec is not None:
+            exact[row_id] = vec
+    return exact
+
+
+def _load_index(cur: Any, version: int) -> VectorIndex:
+    # Each row ships one payload: the packed column the index wants, then the
+    # exact float32 embedding_bin, and JSONB only for unconverted legacy rows.
+    dtype = check_dtype(RAG_INDEX_DTYPE)
+    if dtype == "float32":
+        cur.execute("""
+            SELECT id, department, source_file, chunk_text,
+                   NULL, embedding_bin,
+                   CASE WHEN embedding_bin IS NULL THEN embedding END
+            FROM rag_documents
+            ORDER BY id
+        """)
+    else:
+        cur.execute("""
+            SELECT id, department, source_file, chunk_text,
+                   embedding_compact,
+                   CASE WHEN embedding_compact IS NULL THEN embedding_bin END,
+                   CASE WHEN embedding_compact IS NULL AND embedding_bin IS NULL THEN embedding END
+            FROM rag_documents
+            ORDER BY id
+        """)
+    rows = [
+        (row_id, dept, source_file, chunk_text, _first(compact, packed, legacy))
+        for row_id, dept, source_file, chunk_text, compact, packed, legacy in cur.fetchall()
+    ]
+    if dtype == "float32":
+        return VectorIndex.from_rows(rows, version)
+    return VectorIndex.from_rows(rows, version, dtype=dtype, exact_loader=fetch_exact_vectors)
+
+
+def _build_index(version: int) -> VectorIndex:
+    from RAG.snapshot import load_snapshot
+
+    with span("rag.index.load", corpus_version=version) as sp:
+        index = load_snapshot(version, exact_loader=fetch_exact_vectors)
+        sp.set(source="snapshot" if index is not None else "database")
+        if index is None:
+            conn = get_connection()
+            cur = conn.cursor()
+            try:
+                # Re-read under this connection: the version may have moved again.
+                version = get_corpus_version(cur)
+                index = _load_index(cur, version)
+            finally:
+                cur.close()
+                conn.close()
+        if RAG_SEARCH_MODE != "vector":
+            # Build BM25 here too, not on the first query after the swap.
+            index.lexical()
+        sp.set(chunks=len(index), dtype=index.dtype)
+    return index
+
+
+def _reload(version: int) -> None:
+    global _INDEX, _RELOADING
+    try:
+        index = _build_index(version)
+    except Exception as e:
+        trace_warning("rag.index.reload_error", e, corpus_version=version)
+        index = None
+    with _LOCK:
+        # A single reference assignment: readers hold the old index or the new one.
+        if index is not None and (_INDEX is None or index.version > _INDEX.version):
+            _INDEX = index
+            trace_event("rag.index.swap", corpus_version=index.version, chunks=len(index))
+        _RELOADING = False
+
+
+def _read_version() -> int:
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        return get_corpus_version(cur)
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _first_load() -> VectorIndex:
+    global _INDEX, _LAST_CHECK
+    # Only callers with nothing to serve wait here; one of them builds.
+    with _LOAD_LOCK:
+        if _INDEX is None:
+            index = _build_index(_read_version())
+            with _LOCK:
+                if _INDEX is None or index.version > _INDEX.version:
+                    _INDEX = index
+                _LAST_CHECK = time.monotonic()
+        return _INDEX
+
+
+def get_index() -> VectorIndex:
+    """Return the process-wide index, reloading it when the corpus version moves.
+
+    Only the first load blocks. Later reloads are built on a background
+    thread while the current index keeps serving, then swapped in whole.
+    The version check and every load run outside _LOCK, which guards only
+    the shared references.
+    """
+    global _LAST_CHECK, _RELOADING
+    with _LOCK:
+        index = _INDEX
+        now = time.monotonic()
+        if index is not None and now - _LAST_CHECK < RAG_INDEX_REFRESH_SECONDS:
+            return index
+        # Claim this check; concurrent readers keep serving the current index.
+        _LAST_CHECK = now
+    if index is None:
+        return _first_load()
+
+    try:
+        version = _read_version()
+    except Exception as e:
+        trace_warning("rag.index.version_check_error", e)
+        return index
+
+    with _LOCK:
+        if _INDEX.version != version and not _RELOADING:
+            _RELOADING = True
+            Thread(target=_reload, args=(version,), name="rag-index-reload", daemon=True).start()
+        return _INDEX
+
+
+def invalidate_index() -> None:
+    """Force the next get_index() call to re-check the corpus version."""
+    global _LAST_CHECK
+    with _LOCK:
+        _LAST_CHECK = 0.0
@@ -1,86 +1,466 @@
 import os
+import hashlib
+import struct
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from Database.session import get_connection
 from Config.model import get_embeddings
+from Config.rag import (
+    INGEST_BATCH_SIZE,
+    INGEST_CHECKPOINT_PATH,
+    INGEST_CHUNK_WORKERS,
+    INGEST_CONCURRENCY,
+    INGEST_FILES_PER_WORKER,
+    INGEST_MAX_RETRIES,
+    INGEST_WATCH_INTERVAL_SECONDS,
+    RAG_BACKEND,
+    RAG_CHUNKER,
+    RAG_INDEX_DTYPE,
+)
+from Database.vector_codec import decode_vector, pack_vector
+from Middleware.retry import backoff_delay, is_transient_error
+from Middleware.tracing import trace_warning
+from RAG.corpus import bump_corpus_version
+from RAG.sections import split_sections
+from RAG.snapshot import build_snapshot
 import json
 import numpy as np
-
+import psycopg2
+from psycopg2.extras import execute_values
 
 DOCS_PATH = "RAG/Docs"
+CHUNK_SIZE = 800
 
+# Checkpoint record header: sha256 chunk key, packed vector length.
+_RECORD_HEADER = struct.Struct("<32sI")
 
-def load_documents():
-    documents = []
 
-    for filename in os.listdir(DOCS_PATH):
-        if filename.endswith(".txt"):
-            filepath = os.path.join(DOCS_PATH, filename)
+_SPLITTER = None
 
-            with open(filepath, "r", encoding="utf-8") as f:
-                text = f.read()
 
-            documents.append({
-                "filename": filename,
-                "department": filename.replace(".txt", ""),
-                "content": text
-            })
+def _splitter():
+    # Built once per process; chunking workers each get their own.
+    global _SPLITTER
+    if _SPLITTER is None:
+        _SPLITTER = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=150,
+            separators=["\n\n", "\n", ".", " ", ""]
+        )
+    return _SPLITTER
 
-    return documents
 
+def iter_document_paths(root: str = DOCS_PATH) -> Iterator[str]:
+    """Paths of every .txt under root, subdirectories included, relative to root."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith(".txt"):
+                yield os.path.relpath(os.path.join(dirpath, filename), root)
 
-def chunk_documents(documents):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800,
-        chunk_overlap=150,
-        separators=["\n\n", "\n", ".", " ", ""]
-    )
 
-    all_chunks = []
+def _read_document(root: str, relpath: str):
+    with open(os.path.join(root, relpath), "r", encoding="utf-8") as f:
+        text = f.read()
 
-    for doc in documents:
-        chunks = splitter.split_text(doc["content"])
+    filename = os.path.basename(relpath)
+    return {
+        "filename": relpath.replace(os.sep, "/"),
+        "department": filename.replace(".txt", ""),
+        "content": text
+    }
+
+
+def iter_documents(root: str = DOCS_PATH):
+    """Yield documents one file at a time."""
+    for relpath in iter_document_paths(root):
+        yield _read_document(root, relpath)
 
-        for chunk in chunks:
-            all_chunks.append({
+
+def load_documents():
+    return list(iter_documents())
+
+
+def _split_document(doc):
+    sections = split_sections(doc["content"], CHUNK_SIZE) if RAG_CHUNKER == "section" else []
+    if sections:
+        return [
+            {
                 "department": doc["department"],
                 "source_file": doc["filename"],
-                "chunk_text": chunk
-            })
+                "chunk_text": section["text"],
+                "section_id": section["section_id"],
+                "heading_path": section["heading_path"],
+            }
+            for section in sections
+        ]
+    return [
+        {
+            "department": doc["department"],
+            "source_file": doc["filename"],
+            "chunk_text": chunk
+        }
+        for chunk in _splitter().split_text(doc["content"])
+    ]
+
+
+def _chunk_file(root: str, relpath: str):
+    # Runs in a worker process: the file is read there, not in the parent.
+    return _split_document(_read_document(root, relpath))
+
+
+def chunk_documents(documents):
+    all_chunks = []
+
+    for doc in documents:
+        all_chunks.extend(_split_document(doc))
 
     return all_chunks
 
-def store_chunks(chunks):
-    conn = get_connection()
-    cur = conn.cursor()
 
-    embeddings = get_embeddings()
+def iter_chunks(
+    root: str = DOCS_PATH,
+    workers: int = INGEST_CHUNK_WORKERS,
+    files_per_worker: int = INGEST_FILES_PER_WORKER,
+    paths: Optional[Iterable[str]] = None,
+):
+    """Yield chunks of every document under root (or just paths), in path order.
+
+    Files are read and split across a process pool. At most
+    workers * files_per_worker files are in flight, so memory stays bounded
+    by that window rather than by the size of the corpus.
+    """
+    relpaths = iter_document_paths(root) if paths is None else paths
+    if workers <= 1:
+        for relpath in relpaths:
+            yield from _split_document(_read_document(root, relpath))
+        return
+
+    window = workers * max(files_per_worker, 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for relpath in relpaths:
+            pending.append(pool.submit(_chunk_file, root, relpath))
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def iter_batches(items: Iterable, size: int) -> Iterator[list]:
+    """Group an iterable into lists of at most size items."""
+    it = iter(items)
+    while True:
+        batch = list(islice(it, max(size, 1)))
+        if not batch:
+            return
+        yield batch
+
+
+def content_hash(chunk) -> str:
+    """rag_documents.content_hash: sha256 of department, source_file and text.
+
+    Must match the SQL backfill in Database/schema_rag.sql.
+    """
+    payload = "\x1f".join([chunk["department"], chunk["source_file"], chunk["chunk_text"]])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def chunk_key(chunk) -> bytes:
+    """Stable identity of a chunk for the ingest checkpoint."""
+    return bytes.fromhex(content_hash(chunk))
+
 
-    for chunk in chunks:
-        vector = embeddings.embed_query(chunk["chunk_text"])
-        vector_json = json.dumps(vector)
+def index_checkpoint(path: str) -> Dict[bytes, Tuple[int, int]]:
+    """Embeddings finished by a previous, interrupted run, by chunk key.
 
-        cur.execute("""
-            INSERT INTO rag_documents (department, chunk_text, embedding, source_file)
-            VALUES (%s, %s, %s::jsonb, %s)
-        """, (
+    Records are sha256 key | u32 length | packed float32 vector; only the
+    offset and length of each vector are kept so resuming a large run does
+    not load every vector. A torn trailing record from a crash is ignored.
+    """
+    done: Dict[bytes, Tuple[int, int]] = {}
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(_RECORD_HEADER.size)
+            if len(header) < _RECORD_HEADER.size:
+                break
+            key, size = _RECORD_HEADER.unpack(header)
+            start = f.tell()
+            if len(f.read(size)) < size:
+                break
+            done[key] = (start, size)
+    return done
+
+
+def _read_checkpoint(path: str, entries: List[Tuple[int, int]]) -> List[np.ndarray]:
+    with open(path, "rb") as f:
+        vectors = []
+        for start, size in entries:
+            f.seek(start)
+            vectors.append(decode_vector(f.read(size)))
+        return vectors
+
+
+def _append_checkpoint(f, keys: List[bytes], vectors: List[np.ndarray], done: Dict[bytes, Tuple[int, int]]) -> None:
+    for key, vector in zip(keys, vectors):
+        packed = pack_vector(vector)
+        f.write(_RECORD_HEADER.pack(key, len(packed)))
+        done[key] = (f.tell(), len(packed))
+        f.write(packed)
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _embed_batch(embeddings, texts: List[str]) -> List[np.ndarray]:
+    for attempt in range(INGEST_MAX_RETRIES + 1):
+        try:
+            vectors = embeddings.embed_documents(texts)
+            return [np.asarray(v, dtype=np.float32) for v in vectors]
+        except Exception as e:
+            if not is_transient_error(e) or attempt == INGEST_MAX_RETRIES:
+                raise
+            delay = backoff_delay(attempt)
+            trace_warning("ingest.retry", e, delay_s=round(delay, 3), attempt=attempt + 1)
+            time.sleep(delay)
+
+
+def embed_chunks(
+    chunks,
+    batch_size: int = INGEST_BATCH_SIZE,
+    concurrency: int = INGEST_CONCURRENCY,
+    checkpoint_path: str = INGEST_CHECKPOINT_PATH,
+    resumed: Optional[Dict[bytes, Tuple[int, int]]] = None,
+) -> List[np.ndarray]:
+    """Embed every chunk in batches, several batches in flight.
+
+    Each finished batch is appended to checkpoint_path, and chunks already
+    recorded there are not sent again. Callers embedding many groups of
+    chunks pass resumed (from index_checkpoint) so the file is indexed once.
+    """
+    keys = [chunk_key(c) for c in chunks]
+    if resumed is None:
+        resumed = index_checkpoint(checkpoint_path)
+    recorded = list(dict.fromkeys(k for k in keys if k in resumed))
+    done: Dict[bytes, np.ndarray] = dict(zip(
+        recorded, _read_checkpoint(checkpoint_path, [resumed[k] for k in recorded]) if recorded else []
+    ))
+    todo = list(dict.fromkeys(k for k in keys if k not in done))
+    text_of = {k: c["chunk_text"] for k, c in zip(keys, chunks)}
+    batches = [todo[i:i + batch_size] for i in range(0, len(todo), max(batch_size, 1))]
+    print(f"Embedding {len(todo)} chunks in {len(batches)} batches ({len(done)} resumed from checkpoint)")
+
+    if batches:
+        embeddings = get_embeddings(cached=False)
+        checkpoint = open(checkpoint_path, "ab") if checkpoint_path else None
+        try:
+            with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+                futures = {
+                    pool.submit(_embed_batch, embeddings, [text_of[k] for k in batch]): batch
+                    for batch in batches
+                }
+                for n, future in enumerate(as_completed(futures), 1):
+                    batch = futures[future]
+                    try:
+                        vectors = future.result()
+                    except Exception:
+                        # Finished batches are checkpointed; don't spend calls on the rest.
+                        for pending in futures:
+                            pending.cancel()
+                        raise
+                    if checkpoint is not None:
+                        _append_checkpoint(checkpoint, batch, vectors, resumed)
+                    done.update(zip(batch, vectors))
+                    print(f"  batch {n}/{len(batches)} done")
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+
+    return [done[k] for k in keys]
+
+
+def _insert_rows(cur, chunks, vectors) -> None:
+    rows = []
+    for chunk, vector in zip(chunks, vectors):
+        row = [
             chunk["department"],
             chunk["chunk_text"],
-            vector_json,
-            chunk["source_file"]
-        ))
+            psycopg2.Binary(pack_vector(vector)),
+            psycopg2.Binary(pack_vector(vector / (np.linalg.norm(vector) or 1.0), RAG_INDEX_DTYPE)),
+            chunk["source_file"],
+            content_hash(chunk),
+            chunk.get("section_id"),
+            chunk.get("heading_path"),
+        ]
+        if RAG_BACKEND == "pgvector":
+            row.append(json.dumps(vector.tolist()))
+        rows.append(tuple(row))
+
+    if RAG_BACKEND == "pgvector":
+        execute_values(cur, """
+            INSERT INTO rag_documents (department, chunk_text, embedding_bin, embedding_compact, source_file, content_hash, section_id, heading_path, embedding_vec)
+            VALUES %s
+            ON CONFLICT (content_hash) DO NOTHING
+        """, rows, template="(%s, %s, %s, %s, %s, %s, %s, %s, %s::vector)", page_size=INGEST_BATCH_SIZE)
+    else:
+        execute_values(cur, """
+            INSERT INTO rag_documents (department, chunk_text, embedding_bin, embedding_compact, source_file, content_hash, section_id, heading_path)
+            VALUES %s
+            ON CONFLICT (content_hash) DO NOTHING
+        """, rows, page_size=INGEST_BATCH_SIZE)
+
+
+def store_chunks(
+    chunks: Iterable,
+    full: bool = False,
+    checkpoint_path: str = INGEST_CHECKPOINT_PATH,
+    sources: Optional[Iterable[str]] = None,
+) -> Dict[str, int]:
+    """Make rag_documents hold exactly these chunks.
 
-    conn.commit()
-    cur.close()
-    conn.close()
+    chunks may be any iterable (e.g. iter_chunks()); it is consumed in
+    windows of INGEST_BATCH_SIZE * INGEST_CONCURRENCY, so memory does not
+    grow with the corpus. Incremental by default: only chunks whose
+    content_hash is not stored yet are embedded and inserted, rows whose
+    chunk disappeared are deleted, and unchanged rows are left alone.
+    full=True re-embeds and replaces every row. All writes and the corpus
+    version bump share one transaction; readers keep the previous corpus
+    until it commits. With sources, only rows of those source_files are
+    considered stale, so chunks of a few changed files can be synced alone.
+    """
+    sources = list(sources) if sources is not None else None
+    resumed = index_checkpoint(checkpoint_path)
+    window = INGEST_BATCH_SIZE * max(INGEST_CONCURRENCY, 1)
+    inserted = unchanged = deleted = 0
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        if full:
+            cur.execute("DELETE FROM rag_documents")
+            deleted = cur.rowcount
+        else:
+            # Hashes seen this run live in Postgres, not in the ingest process.
+            cur.execute("""
+                CREATE TEMP TABLE ingest_seen (content_hash TEXT PRIMARY KEY) ON COMMIT DROP
+            """)
+
+        for batch in iter_batches(chunks, window):
+            unique = {content_hash(c): c for c in batch}
+            if not full:
+                execute_values(cur, """
+                    INSERT INTO ingest_seen (content_hash) VALUES %s ON CONFLICT DO NOTHING
+                """, [(h,) for h in unique])
+            cur.execute("""
+                SELECT content_hash FROM rag_documents WHERE content_hash = ANY(%s)
+            """, (list(unique),))
+            stored = {row[0] for row in cur.fetchall()}
+            new = [c for h, c in unique.items() if h not in stored]
+            unchanged += len(unique) - len(new)
+            if new:
+                _insert_rows(cur, new, embed_chunks(new, checkpoint_path=checkpoint_path, resumed=resumed))
+                inserted += len(new)
+
+        if not full:
+            cur.execute("""
+                DELETE FROM rag_documents d
+                WHERE NOT EXISTS (SELECT 1 FROM ingest_seen s WHERE s.content_hash = d.content_hash)
+                  AND (%s::text[] IS NULL OR d.source_file = ANY(%s::text[]))
+            """, (sources, sources))
+            deleted = cur.rowcount
+
+        # Same transaction as the writes so workers never reload a partial corpus.
+        if inserted or deleted:
+            bump_corpus_version(cur)
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+    # Everything is in Postgres; the next run starts fresh.
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return {"inserted": inserted, "deleted": deleted, "unchanged": unchanged}
+
+
+def scan_documents(root: str = DOCS_PATH) -> Dict[str, Tuple[int, int]]:
+    """(mtime_ns, size) of every document under root, by relative path."""
+    found: Dict[str, Tuple[int, int]] = {}
+    for relpath in iter_document_paths(root):
+        try:
+            st = os.stat(os.path.join(root, relpath))
+        except OSError:
+            continue  # removed between the walk and the stat
+        found[relpath] = (st.st_mtime_ns, st.st_size)
+    return found
+
+
+def _source_file(relpath: str) -> str:
+    return relpath.replace(os.sep, "/")
+
+
+def watch(root: str = DOCS_PATH, interval: float = INGEST_WATCH_INTERVAL_SECONDS) -> None:
+    """Poll root and re-index changed files until interrupted.
+
+    The first pass syncs the whole corpus. After that, each scan that finds
+    added, modified or removed files syncs only those files, bumps the corpus
+    version and writes a new snapshot; running workers pick it up on their
+    next refresh and swap indexes without a restart.
+    """
+    known: Optional[Dict[str, Tuple[int, int]]] = None
+    while True:
+        current = scan_documents(root)
+        if known is None:
+            changed, removed = list(current), []
+        else:
+            changed = [p for p, stamp in current.items() if known.get(p) != stamp]
+            removed = [p for p in known if p not in current]
+
+        if changed or removed or known is None:
+            try:
+                stats = store_chunks(
+                    iter_chunks(root, paths=changed),
+                    sources=None if known is None else [_source_file(p) for p in changed + removed],
+                )
+                if stats["inserted"] or stats["deleted"]:
+                    build_snapshot()
+            except Exception as e:
+                # Leave known as it was so the next scan retries these files.
+                trace_warning("ingest.watch_error", e, changed=len(changed), removed=len(removed))
+                print(f"Re-index failed, retrying in {interval}s: {e}")
+            else:
+                known = current
+                print(
+                    f"{len(changed)} changed, {len(removed)} removed: inserted {stats['inserted']} "
+                    f"chunks, deleted {stats['deleted']}."
+                )
+        time.sleep(interval)
 
 
 if __name__ == "__main__":
-    docs = load_documents()
-    chunks = chunk_documents(docs)
+    if "--watch" in sys.argv:
+        try:
+            watch()
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
 
-    print(f"Loaded {len(docs)} documents")
-    print(f"Generated {len(chunks)} chunks")
+    # Documents are read, chunked, embedded and stored as a stream.
+    # --full re-embeds everything; by default only changed chunks are touched.
+    stats = store_chunks(iter_chunks(), full="--full" in sys.argv)
 
-    store_chunks(chunks)
+    print(
+        f"Inserted {stats['inserted']} chunks, deleted {stats['deleted']}, "
+        f"left {stats['unchanged']} unchanged."
+    )
 
-    print("Chunks embedded and stored successfully.")
\ No newline at end of file
+    # Workers map this instead of reloading rag_documents from Postgres.
+    snapshot = build_snapshot()
+    if snapshot:
+        print(f"Index snapshot written to {snapshot}")
\ No newline at end of file
@@ -0,0 +1,277 @@
+import math
+import re
+import time
+from collections import Counter
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from Database.session import get_connection
+from Config.rag import (
+    RAG_BACKEND,
+    RAG_INDEX_REFRESH_SECONDS,
+    RAG_LEXICAL_DECISIVE_RATIO,
+)
+from RAG.corpus import get_corpus_version
+from RAG.index import department_key, get_index
+
+# Hyphenated compounds ("AN-HR-OPG-001", "carry-forward"), section numbers
+# ("4.3", "12.1.2") and words.
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)+|\d+(?:\.\d+)+|\w+")
+# Exact references: document IDs as written in the policy preambles
+# ("AN-HR-OPG-001": letter groups ending in a serial number) and section numbers.
+_DOCUMENT_ID_RE = re.compile(r"^[a-z]{2,}(?:-[a-z]{2,})+-\d{2,}$")
+_SECTION_NUMBER_RE = re.compile(r"^\d+(?:\.\d+)+$")
+_WORD_RE = re.compile(r"[A-Za-z]+")
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for",
+    "from", "how", "i", "in", "is", "it", "my", "of", "on", "or", "the", "to",
+    "what", "when", "which", "who", "with",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased BM25 terms; compound references are kept whole alongside their parts."""
+    tokens: List[str] = []
+    for token in _TOKEN_RE.findall(str(text).lower()):
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        if "-" in token:
+            tokens.extend(part for part in token.split("-") if part not in _STOPWORDS)
+    return tokens
+
+
+def reference_terms(text: str) -> Set[str]:
+    """Exact-reference terms (document IDs, section numbers) present in text."""
+    return {t for t in tokenize(text) if _DOCUMENT_ID_RE.match(t) or _SECTION_NUMBER_RE.match(t)}
+
+
+def named_departments(text: str, departments: Iterable[str]) -> Set[str]:
+    """Department keys named in text ("section 5.3 in HR" -> {"hr"}).
+
+    A name that is also a stopword ("it") only counts when written in capitals.
+    """
+    keys = {department_key(d) for d in departments}
+    named = set()
+    for word in _WORD_RE.findall(str(text)):
+        key = word.casefold()
+        if key in keys and (key not in _STOPWORDS or word.isupper()):
+            named.add(key)
+    return named
+
+
+def _grouped(departments: Sequence[str]) -> bool:
+    """True when each department's rows are already contiguous."""
+    done: Set[str] = set()
+    current = None
+    for dept in departments:
+        key = department_key(dept)
+        if key != current:
+            if key in done:
+                return False
+            done.add(key)
+            current = key
+    return True
+
+
+class BM25Index:
+    """Okapi BM25 inverted index over rag_documents chunks.
+
+    Rows follow the same department grouping as VectorIndex so a department
+    filter is a contiguous row range.
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[Any],
+        departments: Sequence[str],
+        source_files: Sequence[str],
+        chunk_texts: Sequence[str],
+        version: int,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        if _grouped(departments):
+            # Already in VectorIndex order: share chunk_texts (memory-mapped for
+            # a snapshot-backed index) rather than copying every text.
+            order: Sequence[int] = range(len(ids))
+            self.chunk_texts = chunk_texts
+        else:
+            order = sorted(range(len(ids)), key=lambda i: department_key(departments[i]))
+            self.chunk_texts = [chunk_texts[i] for i in order]
+        self.ids = [ids[i] for i in order]
+        self.departments = [departments[i] for i in order]
+        self.source_files = [source_files[i] for i in order]
+        self.version = version
+        self.k1 = k1
+        self.b = b
+
+        self._row_of_id = {row_id: row for row, row_id in enumerate(self.ids)}
+        self.partitions: Dict[str, Tuple[int, int]] = {}
+        for i, dept in enumerate(self.departments):
+            key = department_key(dept)
+            start, _ = self.partitions.get(key, (i, i))
+            self.partitions[key] = (start, i + 1)
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = np.zeros(len(self.ids), dtype=np.float32)
+        self.terms: List[Set[str]] = []
+        for row, text in enumerate(self.chunk_texts):
+            counts = Counter(tokenize(text))
+            lengths[row] = sum(counts.values())
+            self.terms.append(set(counts))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((row, tf))
+
+        n = len(self.ids)
+        avg_len = float(lengths.mean()) if n else 0.0
+        self._norm = k1 * (1.0 - b + b * lengths / avg_len) if avg_len else lengths
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray, float]] = {}
+        for term, entries in postings.items():
+            rows = np.fromiter((r for r, _ in entries), dtype=np.int64, count=len(entries))
+            tfs = np.fromiter((tf for _, tf in entries), dtype=np.float32, count=len(entries))
+            df = len(entries)
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            self._postings[term] = (rows, tfs, idf)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query: str, top_k: int, department: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Top_k chunks by BM25 score, best first; chunks with no matching term are omitted.
+
+        Each hit also carries lexical_coverage, a calibrated 0..1 match score.
+        """
+        if not self.ids or top_k <= 0:
+            return []
+
+        start, end = 0, len(self.ids)
+        if department:
+            partition = self.partitions.get(department_key(department))
+            if partition is None:
+                return []
+            start, end = partition
+
+        terms = set(tokenize(query))
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            rows, tfs, idf = posting
+            scores[rows] += idf * tfs * (self.k1 + 1.0) / (tfs + self._norm[rows])
+
+        window = scores[start:end]
+        hits = np.flatnonzero(window > 0.0)
+        if hits.size == 0:
+            return []
+        if hits.size > top_k:
+            hits = hits[np.argpartition(-window[hits], top_k - 1)[:top_k]]
+        hits = hits[np.argsort(-window[hits], kind="stable")]
+        weights = self._term_weights(terms)
+        total = sum(weights.values())
+        return [
+            self._result(
+                start + int(i),
+                float(window[i]),
+                sum(w for t, w in weights.items() if t in self.terms[start + int(i)]) / total,
+            )
+            for i in hits
+        ]
+
+    def _term_weights(self, terms: Set[str]) -> Dict[str, float]:
+        # A term absent from the corpus weighs as much as the rarest possible one.
+        unseen = math.log(1.0 + (len(self.ids) + 0.5) / 0.5)
+        return {t: self._postings[t][2] if t in self._postings else unseen for t in terms}
+
+    def _result(self, row: int, score: float, coverage: float) -> Dict[str, Any]:
+        return {
+            "id": self.ids[row],
+            "department": self.departments[row],
+            "source_file": self.source_files[row],
+            "chunk_text": self.chunk_texts[row],
+            "lexical_score": score,
+            # IDF-weighted share of the query terms found in the chunk (0..1);
+            # unlike raw BM25 it is comparable across queries.
+            "lexical_coverage": coverage,
+        }
+
+    def is_decisive(self, query: str, results: List[Dict[str, Any]]) -> bool:
+        """True when the top hit is the clear owner of every exact reference in query.
+
+        Only queries that name a document ID or section number qualify; plain
+        keyword overlap never skips the embedding call. Every policy document
+        reuses the same section numbers, so a section number counts only when
+        the query names exactly one department and the top hit belongs to it.
+        The runner-up (from that department, if scoped) must either miss one
+        of the references or trail by RAG_LEXICAL_DECISIVE_RATIO.
+        """
+        references = reference_terms(query)
+        if not references or not results:
+            return False
+        if any(_SECTION_NUMBER_RE.match(t) for t in references):
+            named = named_departments(query, self.partitions)
+            if len(named) != 1:
+                return False
+            scope = named.pop()
+            if department_key(results[0]["department"]) != scope:
+                return False
+            results = [r for r in results if department_key(r["department"]) == scope]
+        top = results[0]
+        if not references.issubset(self.terms[self._row_of_id[top["id"]]]):
+            return False
+        if len(results) == 1:
+            return True
+        runner_up = results[1]
+        if not references.issubset(self.terms[self._row_of_id[runner_up["id"]]]):
+            return True
+        return top["lexical_score"] >= RAG_LEXICAL_DECISIVE_RATIO * runner_up["lexical_score"]
+
+
+_LOCK = Lock()
+_LEXICAL: Optional[BM25Index] = None
+_LAST_CHECK = 0.0
+
+
+def get_lexical_index() -> BM25Index:
+    """Return the process-wide BM25 index for the current corpus version.
+
+    The memory backend reuses the chunk texts already held by the vector index;
+    the pgvector backend loads text columns only.
+    """
+    global _LEXICAL, _LAST_CHECK
+    if RAG_BACKEND != "pgvector":
+        return get_index().lexical()
+
+    with _LOCK:
+        now = time.monotonic()
+        if _LEXICAL is not None and now - _LAST_CHECK < RAG_INDEX_REFRESH_SECONDS:
+            return _LEXICAL
+
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            version = get_corpus_version(cur)
+            if _LEXICAL is None or _LEXICAL.version != version:
+                cur.execute("""
+                    SELECT id, department, source_file, chunk_text
+                    FROM rag_documents
+                    ORDER BY id
+                """)
+                rows = cur.fetchall()
+                _LEXICAL = BM25Index(
+                    [r[0] for r in rows],
+                    [r[1] for r in rows],
+                    [r[2] for r in rows],
+                    [r[3] for r in rows],
+                    version,
+                )
+        finally:
+            cur.close()
+            conn.close()
+
+        _LAST_CHECK = now
+        return _LEXICAL
@@ -0,0 +1,130 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from Database.session import get_async_connection, get_connection
+from Config.rag import RAG_HNSW_EF_SEARCH
+from RAG.index import department_key
+
+
+def to_vector_literal(vector: Any) -> str:
+    """Render an embedding as a pgvector text literal ('[0.1,0.2,...]')."""
+    return json.dumps([float(x) for x in np.asarray(vector, dtype=np.float32).reshape(-1)])
+
+
+_SEARCH_SQL = """
+    SELECT id, department, source_file, chunk_text,
+           1 - (embedding_vec <=> %s::vector) AS score
+    FROM rag_documents
+    WHERE embedding_vec IS NOT NULL {dept_filter}
+    ORDER BY embedding_vec <=> %s::vector
+    LIMIT %s
+"""
+
+_SCORE_IDS_SQL = """
+    SELECT id, 1 - (embedding_vec <=> %s::vector)
+    FROM rag_documents
+    WHERE id = ANY(%s) AND embedding_vec IS NOT NULL
+"""
+
+
+def _search_query(query_vector: np.ndarray, top_k: int, department: Optional[str]) -> Tuple[str, List[Any]]:
+    literal = to_vector_literal(query_vector)
+    dept_filter = ""
+    params: List[Any] = [literal]
+    if department:
+        dept_filter = "AND lower(split_part(department, '_', 1)) = %s"
+        params.append(department_key(department))
+    params.extend([literal, top_k])
+    return _SEARCH_SQL.format(dept_filter=dept_filter), params
+
+
+def _results(rows: List[Tuple[Any, ...]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": row_id,
+            "department": dept,
+            "source_file": source_file,
+            "chunk_text": chunk_text,
+            "score": float(score),
+        }
+        for row_id, dept, source_file, chunk_text, score in rows
+    ]
+
+
+def search(query_vector: np.ndarray, top_k: int, department: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Top_k chunks by cosine similarity, ranked by the HNSW index in Postgres."""
+    if top_k <= 0:
+        return []
+
+    sql, params = _search_query(query_vector, top_k, department)
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        # SET LOCAL scopes the knob to this transaction only.
+        cur.execute("SET LOCAL hnsw.ef_search = %s", (max(RAG_HNSW_EF_SEARCH, top_k),))
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+    return _results(rows)
+
+
+async def asearch(query_vector: np.ndarray, top_k: int, department: Optional[str] = None) -> List[Dict[str, Any]]:
+    """search() over a psycopg 3 async connection."""
+    if top_k <= 0:
+        return []
+
+    sql, params = _search_query(query_vector, top_k, department)
+    conn = await get_async_connection()
+    try:
+        async with conn.cursor() as cur:
+            # psycopg 3 binds server-side, which SET does not accept.
+            await cur.execute(
+                "SELECT set_config('hnsw.ef_search', %s, true)",
+                (str(max(RAG_HNSW_EF_SEARCH, top_k)),),
+            )
+            await cur.execute(sql, params)
+            rows = await cur.fetchall()
+        await conn.commit()
+    finally:
+        await conn.close()
+
+    return _results(rows)
+
+
+def score_ids(query_vector: np.ndarray, ids: List[Any]) -> Dict[Any, float]:
+    """Exact cosine similarity between query_vector and the given chunk ids."""
+    if not ids:
+        return {}
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(_SCORE_IDS_SQL, (to_vector_literal(query_vector), list(ids)))
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+    return {row_id: float(score) for row_id, score in rows}
+
+
+async def ascore_ids(query_vector: np.ndarray, ids: List[Any]) -> Dict[Any, float]:
+    """score_ids() over a psycopg 3 async connection."""
+    if not ids:
+        return {}
+
+    conn = await get_async_connection()
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(_SCORE_IDS_SQL, (to_vector_literal(query_vector), list(ids)))
+            rows = await cur.fetchall()
+    finally:
+        await conn.close()
+
+    return {row_id: float(score) for row_id, score in rows}
@@ -0,0 +1,98 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from Config.model import normalize_text
+from Config.rag import RAG_RESULT_CACHE_SIZE, RAG_RESULT_CACHE_TTL_SECONDS
+from RAG.index import department_key
+
+ResultKey = Tuple[str, int, str, str, int]
+
+
+def result_key(query: str, top_k: int, department: Optional[str], mode: str, version: int) -> ResultKey:
+    """Cache key for one search: normalized query, top_k, department, mode, corpus version."""
+    return (normalize_text(query), top_k, department_key(department), mode, version)
+
+
+class ResultCache:
+    """Thread-safe TTL + LRU map of search results.
+
+    Empty result lists are cached like any other, so repeated out-of-scope
+    questions skip retrieval too. Values are copied on the way in and out.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return [dict(r) for r in entry[1]]
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+    def put(self, key: Hashable, results: List[Dict[str, Any]]) -> None:
+        if self.max_entries <= 0:
+            return
+        expires = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (expires, [dict(r) for r in results])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+_LOCK = Lock()
+_CACHE: Optional[ResultCache] = None
+
+
+def get_result_cache() -> ResultCache:
+    """Return the process-wide retrieval result cache."""
+    global _CACHE
+    with _LOCK:
+        if _CACHE is None:
+            _CACHE = ResultCache(RAG_RESULT_CACHE_SIZE, RAG_RESULT_CACHE_TTL_SECONDS)
+        return _CACHE
+
+
+def result_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and occupancy of the retrieval result cache."""
+    return get_result_cache().stats()
@@ -1,43 +1,28 @@
-import json
-import math
-from typing import Any, List, Optional
+import asyncio
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import numpy as np
 
-from Database.session import get_connection
 from Config.model import get_embeddings
-
+from Config.rag import (
+    RAG_BACKEND,
+    RAG_DEPARTMENT_FALLBACK_SCORE,
+    RAG_HYBRID_CANDIDATES,
+    RAG_HYBRID_LEXICAL_WEIGHT,
+    RAG_SEARCH_MODE,
+)
+from RAG.corpus import current_corpus_version
+from RAG.index import _to_vector, get_index
+from RAG.lexical import BM25Index, get_lexical_index
+from RAG import pgvector_store
+from RAG.sections import lookup_section, parse_section_ref
+from RAG.result_cache import ResultKey, get_result_cache, result_key
+from Middleware.tracing import span, trace_event, trace_warning
 
 # Temporarily lowered for debugging/validation runs.
 RAG_SCORE_THRESHOLD = 0.5
 
 
-def _to_vector(value: Any) -> Optional[np.ndarray]:
-    """Convert JSON/DB vector payload into 1D float vector."""
-    if value is None:
-        return None
-
-    parsed = value
-    if isinstance(value, str):
-        try:
-            parsed = json.loads(value)
-        except json.JSONDecodeError:
-            return None
-
-    if not isinstance(parsed, (list, tuple)):
-        return None
-
-    try:
-        vec = np.asarray(parsed, dtype=np.float32).reshape(-1)
-    except (ValueError, TypeError):
-        return None
-
-    if vec.size == 0:
-        return None
-
-    return vec
-
-
 def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     a_norm = np.linalg.norm(a)
     b_norm = np.linalg.norm(b)
@@ -46,90 +31,447 @@ def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     return float(np.dot(a, b) / (a_norm * b_norm))
 
 
-def search_knowledge_base(query: str, top_k: int = 3):
-    embeddings = get_embeddings()
-    query_raw = embeddings.embed_query(query)
-    query_vector = _to_vector(query_raw)
-
-    if query_vector is None:
-        print("[RAG] Query embedding generation failed: empty/invalid vector")
-        return []
-
-    conn = get_connection()
-    cur = conn.cursor()
-
-    cur.execute("SELECT COUNT(*) FROM rag_documents")
-    total_chunks = int(cur.fetchone()[0] or 0)
-
-    cur.execute("""
-        SELECT department, chunk_text, embedding
-        FROM rag_documents
-    """)
-    rows = cur.fetchall()
-
-    print(f"[RAG] Query: {query}")
-    print(f"[RAG] Query embedding length: {len(query_vector)}")
-    print(f"[RAG] Embeddings count in DB: {total_chunks}")
-    print(f"[RAG] Number of stored chunks retrieved: {len(rows)}")
-
-    scored_results = []
-    raw_scores: List[float] = []
-    dimension_mismatches = 0
-
-    for dept, chunk_text, embedding_json in rows:
-        stored_embedding = _to_vector(embedding_json)
-        if stored_embedding is None:
-            continue
-
-        if stored_embedding.shape[0] != query_vector.shape[0]:
-            dimension_mismatches += 1
-            continue
-
-        score = cosine_similarity(query_vector, stored_embedding)
-        if math.isnan(score) or math.isinf(score):
+def _vector_search_many(
+    query_vectors: List[np.ndarray],
+    top_k: int,
+    departments: List[Optional[str]],
+) -> List[List[Dict[str, Any]]]:
+    if RAG_BACKEND == "pgvector":
+        with span("rag.fetch", backend="pgvector", queries=len(query_vectors), top_k=top_k):
+            return [
+                pgvector_store.search(vector, top_k, department=department)
+                for vector, department in zip(query_vectors, departments)
+            ]
+
+    with span("rag.fetch", backend="memory") as sp:
+        index = get_index()
+        sp.set(chunks=len(index), corpus_version=index.version)
+
+    if len(index) and index.dim != query_vectors[0].shape[0]:
+        trace_warning("rag.dimension_mismatch", query_dim=query_vectors[0].shape[0], index_dim=index.dim)
+        return [[] for _ in query_vectors]
+
+    with span("rag.score", queries=len(query_vectors), chunks=len(index), top_k=top_k):
+        return index.search_many(query_vectors, top_k, departments)
+
+
+def _vector_scores_for_ids(query_vector: np.ndarray, ids: List[Any]) -> Dict[Any, float]:
+    if RAG_BACKEND == "pgvector":
+        return pgvector_store.score_ids(query_vector, ids)
+    return get_index().score_ids(query_vector, ids)
+
+
+def served_version() -> int:
+    """Corpus version that search results are currently produced from."""
+    # The memory backend keeps serving its current index while a newer corpus
+    # version loads, so results are cached under the version that produced them.
+    if RAG_BACKEND == "pgvector":
+        return current_corpus_version()
+    return get_index().version
+
+
+def _section_phase(
+    queries: List[str],
+    top_k: int,
+    departments: List[Optional[str]],
+) -> Dict[int, List[Dict[str, Any]]]:
+    """Results for queries that cite a section ("section 5.3"), looked up directly."""
+    direct: Dict[int, List[Dict[str, Any]]] = {}
+    for i, query in enumerate(queries):
+        ref = parse_section_ref(query)
+        if ref:
+            hits = lookup_section(ref, top_k, departments[i])
+            if hits:
+                direct[i] = hits
+    return direct
+
+
+def _lexical_search(query: str, top_k: int, department: Optional[str]) -> Tuple[BM25Index, List[Dict[str, Any]]]:
+    lexical = get_lexical_index()
+    results = lexical.search(query, top_k, department=department)
+    if department and not results:
+        results = lexical.search(query, top_k)
+    return lexical, results
+
+
+def _lexical_only(lexical_results: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+    """Lexical hits in BM25 order, scored by their calibrated term coverage.
+
+    The coverage is absolute (it does not rescale the best hit to 1.0), so the
+    usual score threshold applies to lexical-only answers too.
+    """
+    return [dict(r, score=r["lexical_coverage"]) for r in lexical_results[:top_k]]
+
+
+def _unscored_ids(vector_results: List[Dict[str, Any]], lexical_results: List[Dict[str, Any]]) -> List[Any]:
+    """Lexical candidates that the vector search did not return (and so did not score)."""
+    seen = {r["id"] for r in vector_results}
+    return [r["id"] for r in lexical_results if r["id"] not in seen]
+
+
+def _fuse(
+    vector_results: List[Dict[str, Any]],
+    lexical_results: List[Dict[str, Any]],
+    extra_scores: Dict[Any, float],
+    top_k: int,
+) -> List[Dict[str, Any]]:
+    """Rank the union of both candidate lists by a weighted hybrid score.
+
+    extra_scores holds the cosine similarity of the _unscored_ids() candidates.
+    "score" stays the cosine similarity so downstream thresholds keep their
+    meaning; the fused value is exposed as "hybrid_score".
+    """
+    merged: Dict[Any, Dict[str, Any]] = {}
+    for r in vector_results:
+        merged[r["id"]] = dict(r, lexical_score=0.0)
+    for r in lexical_results:
+        entry = merged.setdefault(r["id"], dict(r, score=extra_scores.get(r["id"], 0.0)))
+        entry["lexical_score"] = r["lexical_score"]
+
+    max_lexical = max((r["lexical_score"] for r in lexical_results), default=0.0)
+    weight = RAG_HYBRID_LEXICAL_WEIGHT
+    for r in merged.values():
+        lexical = r["lexical_score"] / max_lexical if max_lexical else 0.0
+        r["hybrid_score"] = (1.0 - weight) * r["score"] + weight * lexical
+
+    ranked = sorted(merged.values(), key=lambda r: r["hybrid_score"], reverse=True)
+    return ranked[:top_k]
+
+
+def _apply_threshold(top_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    best_score = max((r["score"] for r in top_results), default=None)
+    passed = best_score is not None and best_score >= RAG_SCORE_THRESHOLD
+    trace_event(
+        "rag.threshold",
+        candidates=len(top_results),
+        best_score=best_score,
+        threshold=RAG_SCORE_THRESHOLD,
+        passed=passed,
+        department=top_results[0].get("department") if top_results else None,
+    )
+    return top_results if passed else []
+
+
+def search_knowledge_base_many(
+    queries: Sequence[str],
+    top_k: int = 3,
+    departments: Optional[Sequence[Optional[str]]] = None,
+    mode: Optional[str] = None,
+) -> List[List[Dict[str, Any]]]:
+    """search_knowledge_base() for several queries at once.
+
+    Queries that still need a vector search are embedded in one batched
+    embed_documents call and scored together with one matrix-matrix product.
+    """
+    mode = (mode or RAG_SEARCH_MODE).lower()
+    queries = list(queries)
+    departments = list(departments) if departments is not None else [None] * len(queries)
+    with span("rag.search", queries=len(queries), top_k=top_k, mode=mode) as sp:
+        version = served_version()
+        keys, results, misses = _cached(queries, top_k, departments, mode, version, sp)
+        if misses:
+            fresh = _search_many(
+                [queries[i] for i in misses], top_k, [departments[i] for i in misses], mode, sp
+            )
+            _remember(keys, results, misses, fresh)
+        return results
+
+
+def _cached(
+    queries: List[str],
+    top_k: int,
+    departments: List[Optional[str]],
+    mode: str,
+    version: int,
+    sp: Any,
+) -> Tuple[List[ResultKey], List[Optional[List[Dict[str, Any]]]], List[int]]:
+    """Result-cache lookups; returns keys, cached results and one index per distinct miss."""
+    cache = get_result_cache()
+    keys = [result_key(q, top_k, d, mode, version) for q, d in zip(queries, departments)]
+    results: List[Optional[List[Dict[str, Any]]]] = [None] * len(queries)
+    misses: Dict[ResultKey, int] = {}
+    for i, key in enumerate(keys):
+        if key in misses:
             continue
-
-        raw_scores.append(score)
-        scored_results.append(
-            {
-                "department": dept,
-                "chunk_text": chunk_text,
-                "score": score,
-            }
+        results[i] = cache.get(key)
+        if results[i] is None:
+            misses[key] = i
+    sp.set(cache_hits=len(queries) - len(misses), corpus_version=version)
+    return keys, results, list(misses.values())
+
+
+def _remember(
+    keys: List[ResultKey],
+    results: List[Optional[List[Dict[str, Any]]]],
+    misses: List[int],
+    fresh: List[List[Dict[str, Any]]],
+) -> None:
+    cache = get_result_cache()
+    by_key = {}
+    for i, hits in zip(misses, fresh):
+        cache.put(keys[i], hits)
+        by_key[keys[i]] = hits
+    for i, key in enumerate(keys):
+        if results[i] is None:
+            results[i] = [dict(r) for r in by_key[key]]
+
+
+def _lexical_phase(
+    queries: List[str],
+    candidates: int,
+    top_k: int,
+    departments: List[Optional[str]],
+    mode: str,
+) -> Tuple[List[Optional[List[Dict[str, Any]]]], List[List[Dict[str, Any]]]]:
+    """BM25 candidates per query; queries answered lexically get their final results."""
+    results: List[Optional[List[Dict[str, Any]]]] = [None] * len(queries)
+    lexical_hits: List[List[Dict[str, Any]]] = [[] for _ in queries]
+    if mode in ("hybrid", "lexical"):
+        with span("rag.lexical", queries=len(queries)) as lexical_span:
+            for i, query in enumerate(queries):
+                lexical, lexical_hits[i] = _lexical_search(query, candidates, departments[i])
+                if mode == "lexical" or lexical.is_decisive(query, lexical_hits[i]):
+                    results[i] = _apply_threshold(_lexical_only(lexical_hits[i], top_k))
+            lexical_span.set(fast_path=sum(r is not None for r in results))
+    return results, lexical_hits
+
+
+def _parse_vectors(
+    pending: List[int],
+    raw_vectors: List[Any],
+    results: List[Optional[List[Dict[str, Any]]]],
+) -> Dict[int, np.ndarray]:
+    vectors: Dict[int, np.ndarray] = {}
+    for i, raw in zip(pending, raw_vectors):
+        vector = _to_vector(raw)
+        if vector is None:
+            trace_warning("rag.embed_invalid")
+            results[i] = []
+        else:
+            vectors[i] = vector
+    return vectors
+
+
+def _weak(
+    vector_hits: Dict[int, List[Dict[str, Any]]],
+    departments: List[Optional[str]],
+) -> List[int]:
+    """Department-filtered queries whose best hit warrants a corpus-wide retry."""
+    return [
+        i for i, hits in vector_hits.items()
+        if departments[i] and (not hits or hits[0]["score"] < RAG_DEPARTMENT_FALLBACK_SCORE)
+    ]
+
+
+def _search_many(
+    queries: List[str],
+    top_k: int,
+    departments: Optional[Sequence[Optional[str]]],
+    mode: str,
+    sp: Any,
+) -> List[List[Dict[str, Any]]]:
+    departments = list(departments) if departments is not None else [None] * len(queries)
+    candidates = max(top_k, RAG_HYBRID_CANDIDATES) if mode == "hybrid" else top_k
+
+    results, lexical_hits = _lexical_phase(queries, candidates, top_k, departments, mode)
+    sp.set(lexical_fast_path=sum(r is not None for r in results))
+    direct = _section_phase(queries, top_k, departments)
+    sp.set(section_lookups=len(direct))
+    for i, hits in direct.items():
+        results[i] = hits
+    pending = [i for i, r in enumerate(results) if r is None]
+    if not pending:
+        return results
+
+    with span("rag.embed", queries=len(pending)):
+        raw_vectors = get_embeddings().embed_documents([queries[i] for i in pending])
+    vectors = _parse_vectors(pending, raw_vectors, results)
+    pending = list(vectors)
+    if not pending:
+        return results
+
+    vector_hits = dict(zip(
+        pending,
+        _vector_search_many([vectors[i] for i in pending], candidates, [departments[i] for i in pending]),
+    ))
+
+    weak = _weak(vector_hits, departments)
+    sp.set(department_fallbacks=len(weak))
+    if weak:
+        vector_hits.update(zip(
+            weak,
+            _vector_search_many([vectors[i] for i in weak], candidates, [None] * len(weak)),
+        ))
+
+    for i in pending:
+        if mode == "hybrid":
+            extra = _vector_scores_for_ids(vectors[i], _unscored_ids(vector_hits[i], lexical_hits[i]))
+            top_results = _fuse(vector_hits[i], lexical_hits[i], extra, top_k)
+        else:
+            top_results = vector_hits[i][:top_k]
+        results[i] = _apply_threshold(top_results)
+
+    return results
+
+
+async def _avector_search_many(
+    query_vectors: List[np.ndarray],
+    top_k: int,
+    departments: List[Optional[str]],
+) -> List[List[Dict[str, Any]]]:
+    if RAG_BACKEND == "pgvector":
+        with span("rag.fetch", backend="pgvector", queries=len(query_vectors), top_k=top_k, mode="async"):
+            return list(await asyncio.gather(*(
+                pgvector_store.asearch(vector, top_k, department=department)
+                for vector, department in zip(query_vectors, departments)
+            )))
+    # In-process scoring is a short numpy call; only an index reload touches
+    # the database, so keep both off the event loop.
+    return await asyncio.to_thread(_vector_search_many, query_vectors, top_k, departments)
+
+
+async def _avector_scores_for_ids(query_vector: np.ndarray, ids: List[Any]) -> Dict[Any, float]:
+    if not ids:
+        return {}
+    if RAG_BACKEND == "pgvector":
+        return await pgvector_store.ascore_ids(query_vector, ids)
+    # get_index() may check the corpus version or load the index; not on the loop.
+    return await asyncio.to_thread(_vector_scores_for_ids, query_vector, ids)
+
+
+async def _asearch_many(
+    queries: List[str],
+    top_k: int,
+    departments: Optional[Sequence[Optional[str]]],
+    mode: str,
+    sp: Any,
+) -> List[List[Dict[str, Any]]]:
+    departments = list(departments) if departments is not None else [None] * len(queries)
+    candidates = max(top_k, RAG_HYBRID_CANDIDATES) if mode == "hybrid" else top_k
+
+    results, lexical_hits = await asyncio.to_thread(
+        _lexical_phase, queries, candidates, top_k, departments, mode
+    )
+    sp.set(lexical_fast_path=sum(r is not None for r in results))
+    direct = await asyncio.to_thread(_section_phase, queries, top_k, departments)
+    sp.set(section_lookups=len(direct))
+    for i, hits in direct.items():
+        results[i] = hits
+    pending = [i for i, r in enumerate(results) if r is None]
+    if not pending:
+        return results
+
+    with span("rag.embed", queries=len(pending), mode="async"):
+        raw_vectors = await get_embeddings().aembed_documents([queries[i] for i in pending])
+    vectors = _parse_vectors(pending, raw_vectors, results)
+    pending = list(vectors)
+    if not pending:
+        return results
+
+    vector_hits = dict(zip(
+        pending,
+        await _avector_search_many(
+            [vectors[i] for i in pending], candidates, [departments[i] for i in pending]
+        ),
+    ))
+
+    weak = _weak(vector_hits, departments)
+    sp.set(department_fallbacks=len(weak))
+    if weak:
+        vector_hits.update(zip(
+            weak,
+            await _avector_search_many([vectors[i] for i in weak], candidates, [None] * len(weak)),
+        ))
+
+    for i in pending:
+        if mode == "hybrid":
+            extra = await _avector_scores_for_ids(vectors[i], _unscored_ids(vector_hits[i], lexical_hits[i]))
+            top_results = _fuse(vector_hits[i], lexical_hits[i], extra, top_k)
+        else:
+            top_results = vector_hits[i][:top_k]
+        results[i] = _apply_threshold(top_results)
+
+    return results
+
+
+async def asearch_knowledge_base_many(
+    queries: Sequence[str],
+    top_k: int = 3,
+    departments: Optional[Sequence[Optional[str]]] = None,
+    mode: Optional[str] = None,
+) -> List[List[Dict[str, Any]]]:
+    """Async search_knowledge_base_many(): the embedding call and pgvector
+    queries are awaited, so one event loop can serve many lookups."""
+    mode = (mode or RAG_SEARCH_MODE).lower()
+    queries = list(queries)
+    departments = list(departments) if departments is not None else [None] * len(queries)
+    with span("rag.search", queries=len(queries), top_k=top_k, mode=mode, run="async") as sp:
+        version = await asyncio.to_thread(served_version)
+        keys, results, misses = _cached(queries, top_k, departments, mode, version, sp)
+        if misses:
+            fresh = await _asearch_many(
+                [queries[i] for i in misses], top_k, [departments[i] for i in misses], mode, sp
+            )
+            _remember(keys, results, misses, fresh)
+        return results
+
+
+def prefetch_knowledge_base(
+    requests: Sequence[Tuple[str, Optional[str], int]],
+    mode: Optional[str] = None,
+) -> int:
+    """Warm the result cache for several (query, department, top_k) requests.
+
+    Requests sharing a top_k go through one search_knowledge_base_many() batch;
+    search_knowledge_base() with the same arguments is then a cache hit.
+    Returns the number of requests actually fetched.
+    """
+    mode = (mode or RAG_SEARCH_MODE).lower()
+    cache = get_result_cache()
+    version = served_version()
+    todo: Dict[int, Dict[ResultKey, Tuple[str, Optional[str]]]] = {}
+    for query, department, top_k in requests:
+        key = result_key(query, top_k, department, mode, version)
+        if key not in cache:
+            todo.setdefault(top_k, {}).setdefault(key, (query, department))
+
+    fetched = 0
+    for top_k, batch in todo.items():
+        search_knowledge_base_many(
+            [q for q, _ in batch.values()], top_k, [d for _, d in batch.values()], mode
         )
+        fetched += len(batch)
+    return fetched
+
+
+def search_knowledge_base(
+    query: str,
+    top_k: int = 3,
+    department: Optional[str] = None,
+    mode: Optional[str] = None,
+):
+    """Top_k policy chunks for query, optionally restricted to one department.
+
+    A department search whose best score is below RAG_DEPARTMENT_FALLBACK_SCORE
+    falls back to the whole corpus. mode overrides RAG_SEARCH_MODE
+    ("vector", "hybrid" or "lexical"). A query citing a section ("section
+    5.3") is answered from that clause directly, without an embedding call.
+    Results, including empty ones, are served from the result cache while
+    the corpus version is unchanged.
+    """
+    return search_knowledge_base_many([query], top_k, [department], mode)[0]
+
+
+async def asearch_knowledge_base(
+    query: str,
+    top_k: int = 3,
+    department: Optional[str] = None,
+    mode: Optional[str] = None,
+):
+    """Async search_knowledge_base() for use from async graph nodes."""
+    return (await asearch_knowledge_base_many([query], top_k, [department], mode))[0]
 
-    cur.close()
-    conn.close()
-
-    print(f"[RAG] Dimension mismatches skipped: {dimension_mismatches}")
-    if raw_scores:
-        top_preview = sorted(raw_scores, reverse=True)[: min(10, len(raw_scores))]
-        print(f"[RAG] Similarity scores before threshold filtering (top): {[round(s, 4) for s in top_preview]}")
-    else:
-        print("[RAG] Similarity scores before threshold filtering: []")
-
-    # Sort by similarity descending
-    scored_results.sort(key=lambda x: x["score"], reverse=True)
-    top_results = scored_results[:top_k]
-
-    if not top_results:
-        print("[RAG] No candidate chunks after scoring")
-        return []
-
-    print(f"[RAG] Top score before threshold: {top_results[0]['score']:.4f}")
-    if top_results[0]["score"] < RAG_SCORE_THRESHOLD:
-        print(f"[RAG] Top score below threshold ({RAG_SCORE_THRESHOLD})")
-        return []
-
-    selected = top_results[0]
-    snippet = (selected.get("chunk_text") or "")[:200].replace("\n", " ")
-    print(
-        f"[RAG] Final selected chunk: department={selected.get('department')} "
-        f"score={selected.get('score', 0.0):.4f} text='{snippet}'"
-    )
 
-    return top_results
-    
 def build_context(query: str, top_k: int = 3):
     results = search_knowledge_base(query, top_k)
 
@@ -0,0 +1,141 @@
+import re
+from typing import Any, Dict, List, Optional
+
+from Database.session import get_connection
+from RAG.index import department_key
+
+# "5. Policy Statements": a top-level heading, short and without a final period.
+_HEADING = re.compile(r"^(\d{1,3})\.\s+([^\d\s].{0,99}?)(?<!\.)\s*$")
+# "5.3 Expense claims must ...": a numbered clause, possibly nested (5.3.1).
+_CLAUSE = re.compile(r"^(\d{1,3}(?:\.\d{1,3})+)\.?\s+\S")
+# "Document ID: AN-FIN-OPG-001": preamble metadata, not part of the title.
+_FIELD = re.compile(r"^[\w ()/-]{1,40}:\s")
+# "section 5.3", "clause 7.2", "sec. 4", "§ 6.1" inside a query.
+_SECTION_REF = re.compile(r"(?:\bsection|\bclause|\bsec\.?|§)\s*(\d{1,3}(?:\.\d{1,3})*)\b", re.IGNORECASE)
+
+HEADING_SEPARATOR = " > "
+
+
+def parse_section_ref(query: str) -> Optional[str]:
+    """Section id referenced by query ("what does section 5.3 say" -> "5.3")."""
+    match = _SECTION_REF.search(query or "")
+    return match.group(1) if match else None
+
+
+def _title(preamble: List[str]) -> str:
+    lines = [line for line in preamble if line and not _FIELD.match(line)]
+    return lines[-1] if lines else ""
+
+
+def _pieces(lines: List[str], max_chars: int) -> List[str]:
+    """Clause text, split on line boundaries only when it exceeds max_chars."""
+    pieces: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in lines:
+        if current and size + len(line) + 1 > max_chars:
+            pieces.append("\n".join(current).strip())
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        pieces.append("\n".join(current).strip())
+    return [p for p in pieces if p]
+
+
+def split_sections(text: str, chunk_size: int = 800) -> List[Dict[str, Optional[str]]]:
+    """Split a numbered policy document into one chunk per clause.
+
+    Each chunk carries its top-level heading line so it reads on its own, plus
+    section_id ("5.3") and heading_path ("<title> > 5. Policy Statements").
+    Clauses are never cut mid-line; one longer than chunk_size is split on line
+    boundaries into several chunks with the same section_id. Text before the
+    first heading becomes a chunk with no section_id. Returns [] when the text
+    has no numbered headings, so the caller can fall back to another splitter.
+    """
+    lines = [line.rstrip() for line in text.splitlines()]
+    first = next((i for i, line in enumerate(lines) if _HEADING.match(line)), None)
+    if first is None:
+        return []
+
+    preamble = [line.strip() for line in lines[:first]]
+    title = _title(preamble)
+    chunks: List[Dict[str, Optional[str]]] = []
+
+    def emit(section_id: Optional[str], heading: Optional[str], body: List[str]) -> None:
+        path = HEADING_SEPARATOR.join(p for p in (title, heading) if p)
+        budget = max(chunk_size - (len(heading) + 1 if heading else 0), 1)
+        for piece in _pieces(body, budget):
+            chunks.append({
+                "section_id": section_id,
+                "heading_path": path or None,
+                "text": f"{heading}\n{piece}" if heading else piece,
+            })
+
+    emit(None, None, preamble)
+
+    heading: Optional[str] = None
+    section_id: Optional[str] = None
+    body: List[str] = []
+    for line in lines[first:]:
+        heading_match = _HEADING.match(line)
+        clause_match = _CLAUSE.match(line)
+        if heading_match or clause_match:
+            emit(section_id, heading, body)
+            body = []
+            if heading_match:
+                heading, section_id = line.strip(), heading_match.group(1)
+                continue
+            section_id = clause_match.group(1)
+        body.append(line)
+    emit(section_id, heading, body)
+    return chunks
+
+
+def _section_order(row: Dict[str, Any]) -> List[int]:
+    return [int(part) for part in str(row["section_id"]).split(".")]
+
+
+def lookup_section(section_id: str, top_k: int, department: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Chunks stored under section_id or its sub-clauses, without an embedding call.
+
+    Returns [] when nothing matches or when the reference is ambiguous (found in
+    more than one source file), so the caller falls back to search.
+    """
+    if top_k <= 0 or not section_id:
+        return []
+
+    dept_filter = ""
+    params: List[Any] = [section_id, f"{section_id}.%"]
+    if department:
+        dept_filter = "AND lower(split_part(department, '_', 1)) = %s"
+        params.append(department_key(department))
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(f"""
+            SELECT id, department, source_file, chunk_text, section_id
+            FROM rag_documents
+            WHERE (section_id = %s OR section_id LIKE %s) {dept_filter}
+        """, params)
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+    if len({row[2] for row in rows}) != 1:
+        return []
+    results = [
+        {
+            "id": row_id,
+            "department": dept,
+            "source_file": source_file,
+            "chunk_text": chunk_text,
+            "section_id": sid,
+            "score": 1.0,
+        }
+        for row_id, dept, source_file, chunk_text, sid in rows
+    ]
+    results.sort(key=lambda r: (_section_order(r), r["id"]))
+    return results[:top_k]
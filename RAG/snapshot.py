@@ -0,0 +1,200 @@
+import json
+import os
+import shutil
+from collections.abc import Sequence
+from typing import List, Optional
+
+import numpy as np
+
+from Database.session import get_connection
+from Config.rag import RAG_INDEX_DTYPE, RAG_INDEX_SNAPSHOT_DIR
+from RAG.corpus import get_corpus_version
+from RAG.index import VectorIndex, _load_index
+from Middleware.tracing import span, trace_warning
+
+# Snapshot layout under RAG_INDEX_SNAPSHOT_DIR:
+#   CURRENT                 name of the live version directory
+#   v<version>/embeddings.npy  normalized codes, rows grouped by department
+#   v<version>/scales.npy      per-row int8 scales (ones for float dtypes)
+#   v<version>/rows.npy        id, department, source_file and chunk byte range per row
+#   v<version>/chunks.bin      UTF-8 chunk texts back to back
+#   v<version>/meta.json       version, dtype, dim, department and source_file names
+
+# A version directory is written under a temporary name and renamed into place
+# before CURRENT is swapped, so readers never see a partial snapshot.
+_FORMAT = 1
+_ROW_DTYPE = np.dtype([
+    ("id", "<i8"),
+    ("department", "<i4"),
+    ("source_file", "<i4"),
+    ("start", "<i8"),
+    ("end", "<i8"),
+])
+
+
+class MappedTexts(Sequence):
+    """Chunk texts decoded on access from a memory-mapped chunks.bin."""
+
+    def __init__(self, blob: np.ndarray, starts: np.ndarray, ends: np.ndarray):
+        self._blob = blob
+        self._starts = starts
+        self._ends = ends
+
+    def __len__(self) -> int:
+        return self._starts.shape[0]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self._blob[self._starts[i]:self._ends[i]].tobytes().decode("utf-8")
+
+
+def _names(values: Sequence[str]) -> List[str]:
+    return list(dict.fromkeys(values))
+
+
+def _remove_dir(path: str) -> bool:
+    """Delete a snapshot directory; False (traced and logged) if it is still there.
+
+    On Windows files another worker has memory-mapped cannot be deleted, so a
+    failed removal is retried by the next write_snapshot().
+    """
+    try:
+        shutil.rmtree(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        trace_warning("rag.snapshot_remove_error", e, path=path)
+        return False
+    return True
+
+
+def write_snapshot(index: VectorIndex, root: str = RAG_INDEX_SNAPSHOT_DIR) -> str:
+    """Persist index under root and make it the CURRENT snapshot.
+
+    Returns the version directory written. Older version directories are
+    removed; workers still mapping them keep their pages until they reload.
+    """
+    name = f"v{index.version}"
+    os.makedirs(root, exist_ok=True)
+    tmp = os.path.join(root, f".{name}.tmp-{os.getpid()}")
+    _remove_dir(tmp)
+    os.makedirs(tmp)
+
+    departments = _names(index.departments)
+    source_files = _names(index.source_files)
+    dept_pos = {d: i for i, d in enumerate(departments)}
+    source_pos = {s: i for i, s in enumerate(source_files)}
+
+    rows = np.zeros(len(index), dtype=_ROW_DTYPE)
+    offset = 0
+    with open(os.path.join(tmp, "chunks.bin"), "wb") as f:
+        for i, text in enumerate(index.chunk_texts):
+            data = str(text).encode("utf-8")
+            f.write(data)
+            rows[i] = (
+                index.ids[i],
+                dept_pos[index.departments[i]],
+                source_pos[index.source_files[i]],
+                offset,
+                offset + len(data),
+            )
+            offset += len(data)
+
+    np.save(os.path.join(tmp, "embeddings.npy"), index.codes)
+    np.save(os.path.join(tmp, "scales.npy"), index.scales)
+    np.save(os.path.join(tmp, "rows.npy"), rows)
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "format": _FORMAT,
+            "version": index.version,
+            "dtype": index.dtype,
+            "dim": index.dim,
+            "count": len(index),
+            "departments": departments,
+            "source_files": source_files,
+        }, f)
+
+    final = os.path.join(root, name)
+    if not _remove_dir(final):
+        # A same-version snapshot that is still mapped; CURRENT names the new one.
+        name = f"{name}-{os.getpid()}"
+        final = os.path.join(root, name)
+        _remove_dir(final)
+    os.rename(tmp, final)
+
+    pointer = os.path.join(root, f".CURRENT.tmp-{os.getpid()}")
+    with open(pointer, "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(pointer, os.path.join(root, "CURRENT"))
+
+    for entry in os.listdir(root):
+        if entry.startswith("v") and entry != name:
+            _remove_dir(os.path.join(root, entry))
+    return final
+
+
+def load_snapshot(version: int, exact_loader=None, root: str = RAG_INDEX_SNAPSHOT_DIR) -> Optional[VectorIndex]:
+    """Memory-map the CURRENT snapshot if it matches version and RAG_INDEX_DTYPE.
+
+    Returns None when there is no usable snapshot, so the caller can fall back
+    to loading rag_documents.
+    """
+    if not root:
+        return None
+    try:
+        with open(os.path.join(root, "CURRENT"), encoding="utf-8") as f:
+            path = os.path.join(root, f.read().strip())
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("format") != _FORMAT or meta.get("version") != version or meta.get("dtype") != RAG_INDEX_DTYPE:
+        return None
+
+    try:
+        codes = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+        scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="r")
+        rows = np.load(os.path.join(path, "rows.npy"), mmap_mode="r")
+        blob = np.zeros(0, dtype=np.uint8)
+        if os.path.getsize(os.path.join(path, "chunks.bin")):
+            blob = np.memmap(os.path.join(path, "chunks.bin"), dtype=np.uint8, mode="r")
+    except (OSError, ValueError) as e:
+        trace_warning("rag.snapshot_error", e, path=path)
+        return None
+    if codes.shape[0] != rows.shape[0] or codes.shape[0] != meta["count"]:
+        return None
+
+    departments = meta["departments"]
+    source_files = meta["source_files"]
+    return VectorIndex(
+        rows["id"].tolist(),
+        [departments[i] for i in rows["department"]],
+        [source_files[i] for i in rows["source_file"]],
+        MappedTexts(blob, rows["start"], rows["end"]),
+        codes,
+        version,
+        scales=scales,
+        exact_loader=exact_loader if codes.dtype != np.float32 else None,
+    )
+
+
+def build_snapshot(root: str = RAG_INDEX_SNAPSHOT_DIR) -> Optional[str]:
+    """Load rag_documents at the current corpus version and snapshot it."""
+    if not root:
+        return None
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        version = get_corpus_version(cur)
+        index = _load_index(cur, version)
+    finally:
+        cur.close()
+        conn.close()
+
+    with span("rag.snapshot.write", corpus_version=version, chunks=len(index)):
+        return write_snapshot(index, root)
+
+
+if __name__ == "__main__":
+    print(f"Snapshot written to {build_snapshot()}")
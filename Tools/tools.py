@@ -4,12 +4,22 @@ from langchain.tools import tool
 from Database.session import get_connection
 from langchain_core.tools import InjectedToolArg
 from langgraph.config import get_config
+from Middleware.cache import invalidate_tool_cache
+from Middleware.tracing import trace_warning
 
 ALLOWED_DEPARTMENTS = ["HR", "Finance", "Travel", "IT"]
 ALLOWED_PRIORITIES = ["low", "medium", "high", "urgent"]
 ALLOWED_STATUS = ["open", "in_progress", "closed"]
 
 
+def _invalidate_reads(ticket_ids=(), user_ids=()) -> None:
+    # The write has committed; if this fails, stale reads only last until their TTL.
+    try:
+        invalidate_tool_cache(ticket_ids, user_ids)
+    except Exception as e:
+        trace_warning("tool_cache.invalidate_error", e)
+
+
 @tool
 def create_ticket(
     department: Literal["HR", "Finance", "Travel", "IT"],
@@ -54,6 +64,7 @@ def create_ticket(
     conn.commit()
     cur.close()
     conn.close()
+    _invalidate_reads(user_ids=[user_id])
 
     return {
         "ticket_id": ticket_id,
@@ -102,6 +113,7 @@ def update_ticket_fields(ticket_id: str, fields: dict) -> dict:
 
     if not updated:
         raise ValueError("Ticket not found")
+    _invalidate_reads([ticket_id])
 
     return {
         "ticket_id": updated[0],
@@ -130,6 +142,7 @@ def add_ticket_message(
     conn.commit()
     cur.close()
     conn.close()
+    _invalidate_reads([ticket_id])
 
     return {
         "message_id": message_id,
@@ -175,6 +188,7 @@ def assign_to_department(
 
     if not updated:
         raise ValueError("Ticket not found")
+    _invalidate_reads([ticket_id])
 
     return {
         "ticket_id": ticket_id,
@@ -203,6 +217,7 @@ def close_ticket(ticket_id: str) -> dict:
 
     if not updated:
         raise ValueError("Ticket not found")
+    _invalidate_reads([ticket_id])
 
     return {
         "ticket_id": ticket_id,
@@ -1,3 +1,3 @@
-from Agents.graph import agent_graph, invoke_agent
+from Agents.graph import agent_graph, ainvoke_agent, invoke_agent
 
-__all__ = ["agent_graph", "invoke_agent"]
+__all__ = ["agent_graph", "ainvoke_agent", "invoke_agent"]
@@ -0,0 +1,50 @@
+from RAG.context import CONTEXT_SEPARATOR, assemble_context, estimate_tokens
+
+CLAIMS = "Employees must submit expense claims within thirty days of purchase."
+RECEIPTS = "Itemised receipts are required for every claim above fifty dollars."
+
+
+def _result(text, score, source="Finance_Policies.txt"):
+    return {"chunk_text": text, "score": score, "source_file": source}
+
+
+def test_overlapping_chunks_of_one_source_are_merged():
+    first = "1. Scope\n" + CLAIMS
+    second = CLAIMS + "\n" + RECEIPTS
+    context = assemble_context([_result(first, 0.9), _result(second, 0.8)], token_budget=500)
+    assert context == "1. Scope\n" + CLAIMS + "\n" + RECEIPTS
+
+
+def test_repeated_paragraph_from_another_source_is_dropped():
+    context = assemble_context(
+        [_result(CLAIMS + "\n" + RECEIPTS, 0.9), _result(CLAIMS, 0.8, "Travel_Policies.txt")],
+        token_budget=500,
+    )
+    assert context.count(CLAIMS) == 1
+    assert CONTEXT_SEPARATOR not in context
+
+
+def test_block_skipped_for_budget_does_not_hide_its_paragraphs():
+    # The 0.9 block does not fit after the first one; its CLAIMS paragraph
+    # must still be emitted from the smaller 0.5 block.
+    short = "Travel must be booked through the approved agency."
+    filler = "\n".join(f"Clause {i} covers approval routing for regional offices." for i in range(30))
+    results = [
+        _result(short, 0.95, "Travel_Policies.txt"),
+        _result(filler + "\n" + CLAIMS, 0.9),
+        _result(CLAIMS, 0.5, "HR_Policies.txt"),
+    ]
+    context = assemble_context(results, token_budget=100)
+    assert context == short + CONTEXT_SEPARATOR + CLAIMS
+
+
+def test_budget_is_respected_and_first_block_truncated():
+    long_text = "\n".join(f"Sentence {i} of a very long clause about leave." for i in range(200))
+    context = assemble_context([_result(long_text, 0.9)], token_budget=50)
+    assert context
+    assert estimate_tokens(context) <= 50
+
+
+def test_prior_context_is_kept_first():
+    context = assemble_context([_result(RECEIPTS, 0.9), _result(CLAIMS, 0.8)], token_budget=500, prior=CLAIMS)
+    assert context.split(CONTEXT_SEPARATOR) == [CLAIMS, RECEIPTS]
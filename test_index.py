@@ -0,0 +1,152 @@
+import time
+
+import numpy as np
+import pytest
+
+import RAG.index as rag_index
+from RAG.index import VectorIndex
+
+ROWS = [
+    (1, "HR_Policies", "HR_Policies.txt", "leave", [1.0, 0.0, 0.0]),
+    (2, "IT_Policies", "IT_Policies.txt", "passwords", [0.0, 1.0, 0.0]),
+    (3, "HR_Policies", "HR_Policies.txt", "probation", [0.8, 0.0, 0.6]),
+    (4, "Finance_Policies", "Finance_Policies.txt", "expenses", [0.0, 0.0, 1.0]),
+    (5, "IT_Policies", "IT_Policies.txt", "broken", "not a vector"),
+]
+
+
+def test_from_rows_groups_departments_and_drops_bad_vectors():
+    index = VectorIndex.from_rows(ROWS, 3)
+    assert len(index) == 4
+    assert index.version == 3
+    assert set(index.partitions) == {"hr", "it", "finance"}
+    start, end = index.partitions["hr"]
+    assert sorted(index.ids[start:end]) == [1, 3]
+
+
+def test_search_ranks_by_cosine_similarity():
+    index = VectorIndex.from_rows(ROWS, 1)
+    results = index.search(np.array([2.0, 0.0, 0.0]), 2)
+    assert [r["id"] for r in results] == [1, 3]
+    assert results[0]["score"] == pytest.approx(1.0)
+    assert results[0]["chunk_text"] == "leave"
+
+
+def test_search_with_department_scores_only_that_partition():
+    index = VectorIndex.from_rows(ROWS, 1)
+    results = index.search(np.array([0.0, 0.0, 1.0]), 5, department="HR")
+    assert [r["id"] for r in results] == [3, 1]
+    assert index.search(np.array([1.0, 0.0, 0.0]), 5, department="Legal") == []
+
+
+def test_search_many_matches_search():
+    index = VectorIndex.from_rows(ROWS, 1)
+    queries = [np.array([1.0, 0.0, 0.0]), np.array([0.0, 1.0, 0.0])]
+    batched = index.search_many(queries, 2, [None, "IT"])
+    assert batched[0] == index.search(queries[0], 2)
+    assert batched[1] == index.search(queries[1], 2, department="IT")
+
+
+class _RecordingCodes:
+    """Stands in for VectorIndex.codes and records which rows are read."""
+
+    def __init__(self, codes):
+        self._codes = codes
+        self.shape, self.dtype, self.ndim = codes.shape, codes.dtype, codes.ndim
+        self.reads = []
+
+    def __getitem__(self, key):
+        self.reads.append(key)
+        return self._codes[key]
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_department_query_reads_only_its_partition(dtype):
+    index = VectorIndex.from_rows(ROWS, 1, dtype=dtype)
+    codes = _RecordingCodes(index.codes)
+    index.codes = codes
+    start, end = index.partitions["hr"]
+
+    results = index.search_many([np.array([1.0, 0.0, 0.0])] * 2, 5, ["HR", "HR_Policies"])
+    assert [[r["id"] for r in hits] for hits in results] == [[1, 3], [1, 3]]
+    assert codes.reads
+    for key in codes.reads:
+        assert isinstance(key, slice)
+        assert start <= key.start and key.stop <= end
+
+
+def test_invalid_queries_return_nothing():
+    index = VectorIndex.from_rows(ROWS, 1)
+    assert index.search(np.zeros(3), 3) == []
+    assert index.search(np.ones(4), 3) == []
+    assert VectorIndex.from_rows([], 1).search(np.ones(3), 3) == []
+
+
+def test_score_ids():
+    index = VectorIndex.from_rows(ROWS, 1)
+    scores = index.score_ids(np.array([1.0, 0.0, 0.0]), [3, 4, 99])
+    assert set(scores) == {3, 4}
+    assert scores[3] == pytest.approx(0.8)
+    assert scores[4] == pytest.approx(0.0)
+
+
+def test_compact_index_reranks_with_exact_vectors():
+    exact = {row[0]: np.asarray(row[4]) / np.linalg.norm(row[4]) for row in ROWS[:4]}
+    calls = []
+
+    def loader(ids):
+        calls.append(list(ids))
+        return {i: exact[i] for i in ids}
+
+    index = VectorIndex.from_rows(ROWS, 1, dtype="int8", exact_loader=loader)
+    assert index.compact
+    results = index.search(np.array([1.0, 0.0, 0.0]), 2)
+    assert [r["id"] for r in results] == [1, 3]
+    assert results[1]["score"] == pytest.approx(0.8)
+    assert len(calls) == 1
+
+
+def test_rows_must_be_grouped_by_department():
+    codes = np.eye(3, dtype=np.float32)
+    with pytest.raises(ValueError):
+        VectorIndex([1, 2, 3], ["HR", "IT", "HR"], ["a", "b", "a"], ["x", "y", "z"], codes, 1)
+
+
+@pytest.fixture
+def served(monkeypatch):
+    """A loaded index whose last version check is long past."""
+    index = VectorIndex.from_rows(ROWS, 1)
+    monkeypatch.setattr(rag_index, "_INDEX", index)
+    monkeypatch.setattr(rag_index, "_RELOADING", False)
+    monkeypatch.setattr(rag_index, "RAG_INDEX_REFRESH_SECONDS", 60.0)
+    monkeypatch.setattr(rag_index, "_LAST_CHECK", time.monotonic() - 61.0)
+    return index
+
+
+def test_get_index_keeps_serving_when_the_version_check_fails(served, monkeypatch):
+    def fail():
+        raise RuntimeError("database down")
+
+    monkeypatch.setattr(rag_index, "_read_version", fail)
+    assert rag_index.get_index() is served
+
+
+def test_get_index_reloads_in_the_background(served, monkeypatch):
+    newer = VectorIndex.from_rows(ROWS[:2], 2)
+    monkeypatch.setattr(rag_index, "_read_version", lambda: 2)
+    monkeypatch.setattr(rag_index, "_build_index", lambda version: newer)
+
+    assert rag_index.get_index() is served
+    deadline = time.monotonic() + 5
+    while rag_index._INDEX is not newer and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert rag_index._INDEX is newer
+    assert not rag_index._RELOADING
+
+
+def test_get_index_skips_the_check_within_the_refresh_interval(served, monkeypatch):
+    checks = []
+    monkeypatch.setattr(rag_index, "_read_version", lambda: checks.append(1) or 1)
+    rag_index.get_index()
+    rag_index.get_index()
+    assert len(checks) == 1
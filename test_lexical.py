@@ -0,0 +1,81 @@
+from RAG.lexical import BM25Index, named_departments, reference_terms, tokenize
+
+
+def _index():
+    rows = [
+        (1, "HR_Policies", "HR_Policies.txt", "Document ID: AN-HR-OPG-001\nAnnual leave policy"),
+        (2, "HR_Policies", "HR_Policies.txt", "5.3 Unused leave may be carried forward; the carry-forward limit is ten days."),
+        (3, "IT_Policies", "IT_Policies.txt", "Document ID: AN-IT-OPG-001\nAcceptable use policy"),
+        (4, "IT_Policies", "IT_Policies.txt", "5.3 Passwords must be rotated every ninety days."),
+        (5, "Finance_Policies", "Finance_Policies.txt", "5.3 Expense claims must be filed within thirty days."),
+    ]
+    return BM25Index(
+        [r[0] for r in rows],
+        [r[1] for r in rows],
+        [r[2] for r in rows],
+        [r[3] for r in rows],
+        1,
+    )
+
+
+def test_tokenize_keeps_compounds_and_section_numbers():
+    tokens = tokenize("What is the carry-forward in section 5.3 of AN-HR-OPG-001?")
+    assert "carry-forward" in tokens and "carry" in tokens and "forward" in tokens
+    assert "5.3" in tokens
+    assert "an-hr-opg-001" in tokens
+    assert "the" not in tokens
+
+
+def test_reference_terms_ignore_hyphenated_words():
+    assert reference_terms("how long is the carry-forward of leave") == set()
+    assert reference_terms("what is AN-HR-OPG-001") == {"an-hr-opg-001"}
+    assert reference_terms("section 5.3") == {"5.3"}
+
+
+def test_named_departments_needs_capitals_for_stopword_names():
+    departments = ["HR_Policies", "IT_Policies"]
+    assert named_departments("is it section 5.3", departments) == set()
+    assert named_departments("section 5.3 of the IT policy", departments) == {"it"}
+    assert named_departments("section 5.3 in hr", departments) == {"hr"}
+
+
+def test_hyphenated_keyword_is_not_decisive():
+    # Only one chunk says "carry-forward", but that is keyword overlap, not a reference.
+    index = _index()
+    query = "how long is the carry-forward of leave"
+    results = index.search(query, 5)
+    assert results[0]["id"] == 2
+    assert not index.is_decisive(query, results)
+
+
+def test_document_id_is_decisive():
+    index = _index()
+    query = "what is AN-HR-OPG-001"
+    results = index.search(query, 5)
+    assert results[0]["id"] == 1
+    assert index.is_decisive(query, results)
+
+
+def test_section_number_needs_one_named_department():
+    index = _index()
+    for query in ("what is section 5.3", "is it section 5.3", "section 5.3 in HR or IT"):
+        assert not index.is_decisive(query, index.search(query, 5)), query
+
+    query = "section 5.3 of the IT password rules"
+    results = index.search(query, 5)
+    assert results[0]["department"] == "IT_Policies"
+    assert index.is_decisive(query, results)
+
+
+def test_lexical_coverage_is_calibrated():
+    index = _index()
+    full = index.search("passwords rotated", 1)[0]
+    assert full["lexical_coverage"] == 1.0
+    partial = index.search("passwords quantum teleportation", 1)[0]
+    assert 0.0 < partial["lexical_coverage"] < 0.5
+
+
+def test_department_filter_and_unknown_department():
+    index = _index()
+    assert {r["department"] for r in index.search("5.3", 5, department="HR")} == {"HR_Policies"}
+    assert index.search("5.3", 5, department="Legal") == []
@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip("langchain_mistralai")
+
+import RAG.result_cache as result_cache  # noqa: E402
+from RAG.result_cache import ResultCache, result_key  # noqa: E402
+
+RESULTS = [{"id": 1, "chunk_text": "Annual leave accrues monthly.", "score": 0.9}]
+
+
+def test_result_key_normalizes_query_and_department():
+    assert result_key("  Annual   LEAVE ", 5, "HR_Policies", "vector", 3) == result_key("annual leave", 5, "hr", "vector", 3)
+    assert result_key("annual leave", 5, "HR", "vector", 3) != result_key("annual leave", 5, "HR", "vector", 4)
+    assert result_key("annual leave", 5, None, "vector", 3) != result_key("annual leave", 3, None, "vector", 3)
+
+
+def test_get_returns_copies():
+    cache = ResultCache(4, 60)
+    cache.put("k", RESULTS)
+    hit = cache.get("k")
+    assert hit == RESULTS
+    hit[0]["score"] = 0.0
+    assert cache.get("k")[0]["score"] == 0.9
+
+
+def test_empty_results_are_cached():
+    cache = ResultCache(4, 60)
+    cache.put("k", [])
+    assert cache.get("k") == []
+    assert cache.get("missing") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(2, 60)
+    cache.put("a", RESULTS)
+    cache.put("b", RESULTS)
+    cache.get("a")
+    cache.put("c", RESULTS)
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: now[0])
+    cache = ResultCache(4, 10)
+    cache.put("k", RESULTS)
+    now[0] += 11
+    assert "k" not in cache
+    assert cache.get("k") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ResultCache(0, 60)
+    cache.put("k", RESULTS)
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,54 @@
+from RAG.sections import parse_section_ref, split_sections
+
+POLICY = """Anvil Corp
+Document ID: AN-HR-OPG-001
+Leave Policy
+
+1. Purpose
+This policy sets out how leave is requested.
+
+2. Policy Statements
+2.1 Annual leave accrues monthly.
+2.2 Unused leave may be carried forward.
+2.2.1 At most ten days carry forward.
+3. Leave is unpaid during probation.
+"""
+
+
+def test_split_sections_by_clause():
+    chunks = split_sections(POLICY)
+    assert chunks[0]["section_id"] is None
+    assert [c["section_id"] for c in chunks[1:]] == ["1", "2.1", "2.2", "2.2.1"]
+
+    clause = next(c for c in chunks if c["section_id"] == "2.2")
+    assert clause["text"].startswith("2. Policy Statements\n2.2 Unused leave")
+    assert clause["heading_path"] == "Leave Policy > 2. Policy Statements"
+
+
+def test_numbered_sentence_is_not_a_heading():
+    chunks = split_sections(POLICY)
+    last = chunks[-1]
+    # "3. Leave is unpaid ..." ends in a period: it stays in the 2.2.1 chunk.
+    assert last["section_id"] == "2.2.1"
+    assert last["text"].endswith("3. Leave is unpaid during probation.")
+    assert all(not c["text"].startswith("3.") for c in chunks)
+
+
+def test_long_clause_is_split_on_line_boundaries():
+    body = "\n".join(f"Line {i} of the clause text." for i in range(40))
+    chunks = split_sections(f"1. Scope\n1.1 Intro\n{body}\n", chunk_size=200)
+    parts = [c for c in chunks if c["section_id"] == "1.1"]
+    assert len(parts) > 1
+    assert all(len(c["text"]) <= 200 for c in parts)
+    assert all(c["text"].startswith("1. Scope\n") for c in parts)
+
+
+def test_text_without_headings_is_left_to_the_caller():
+    assert split_sections("Just a paragraph.\nAnd another one.") == []
+
+
+def test_parse_section_ref():
+    assert parse_section_ref("what does section 5.3 say") == "5.3"
+    assert parse_section_ref("see clause 7.2.1") == "7.2.1"
+    assert parse_section_ref("§ 6.1 please") == "6.1"
+    assert parse_section_ref("what is the leave policy") is None
@@ -0,0 +1,101 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain")
+pytest.importorskip("langgraph")
+pytest.importorskip("langchain_mistralai")
+
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+
+import Middleware.cache as cache  # noqa: E402
+from Middleware.semantic_index import SemanticIndex  # noqa: E402
+
+QUERY = "How many days of annual leave do I get?"
+VECTOR = np.array([1.0, 0.0, 0.0, 0.0])
+
+
+class _Cursor:
+    def __init__(self, row):
+        self.row = row
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(" ".join(sql.split()))
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+
+class _Connection:
+    def __init__(self, row):
+        self.cur = _Cursor(row)
+
+    def cursor(self):
+        return self.cur
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def semantic(monkeypatch):
+    """wrap_semantic_cache with one near-identical stored row and no database."""
+    index = SemanticIndex()
+    index.add("stored-id", VECTOR, key="old-hash")
+    writes = []
+    state = SimpleNamespace(index=index, writes=writes, row=None)
+
+    monkeypatch.setattr(cache, "start_cache_pruner", lambda: None)
+    monkeypatch.setattr(cache, "_exact_hit", lambda key: None)
+    monkeypatch.setattr(cache, "get_semantic_index", lambda: index)
+    monkeypatch.setattr(cache, "_exact_best", lambda cur, vector, ids: ("stored-id", 0.99))
+    monkeypatch.setattr(cache, "get_embeddings", lambda: SimpleNamespace(embed_query=lambda q: VECTOR.tolist()))
+    monkeypatch.setattr(cache, "get_connection", lambda: _Connection(state.row))
+    monkeypatch.setattr(cache, "get_config", lambda: {})
+    monkeypatch.setattr(cache, "queue_write", lambda sql, row, **kw: writes.append((sql, row, kw)))
+    return state
+
+
+def _call():
+    request = SimpleNamespace(messages=[HumanMessage(content=QUERY)], model=SimpleNamespace(model_name="test"))
+    return cache.wrap_semantic_cache.wrap_model_call(request, lambda r: AIMessage(content="Twenty days."))
+
+
+def test_expired_best_match_is_replaced_not_refreshed(semantic):
+    # The hit UPDATE finds no live row: the entry expired or was pruned.
+    semantic.row = None
+    assert _call().content == "Twenty days."
+
+    assert len(semantic.writes) == 1
+    sql, row, kw = semantic.writes[0]
+    assert sql == cache._SEMANTIC_INSERT
+    assert row[0] != "stored-id"
+    assert "stored-id" not in semantic.index
+    assert row[0] in semantic.index
+
+    # The insert failing afterwards takes the new id back out of the index.
+    kw["on_failure"]()
+    assert row[0] not in semantic.index
+
+
+def test_live_row_without_an_answer_is_refreshed(semantic):
+    semantic.row = (None,)
+    _call()
+
+    assert [w[0] for w in semantic.writes] == [cache._SEMANTIC_REFRESH]
+    assert semantic.writes[0][1][0] == "stored-id"
+    assert semantic.index.find_key(cache.query_hash(QUERY)) == "stored-id"
+
+
+def test_hit_returns_the_cached_answer(semantic):
+    semantic.row = ("Twenty five days.",)
+    assert _call().content == "Twenty five days."
+    assert semantic.writes == []
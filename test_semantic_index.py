@@ -0,0 +1,68 @@
+import numpy as np
+
+from Middleware.semantic_index import SemanticIndex
+
+
+def _vectors(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def test_exact_scan_finds_nearest_rows():
+    index = SemanticIndex(min_rows=1000)
+    vectors = _vectors(20)
+    for i, vec in enumerate(vectors):
+        index.add(i, vec)
+    assert len(index) == 20
+    hits = index.search(vectors[7] * 3.0, 3)
+    assert hits[0][0] == 7
+    assert abs(hits[0][1] - 1.0) < 1e-5
+    assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+
+
+def test_unusable_vectors_are_rejected():
+    index = SemanticIndex()
+    assert not index.add("zero", np.zeros(4))
+    assert index.add("a", np.ones(4))
+    assert not index.add("short", np.ones(3))
+    assert index.search(np.ones(3), 1) == []
+    assert index.search(np.zeros(4), 1) == []
+    assert len(index) == 1
+
+
+def test_keys_and_removal():
+    index = SemanticIndex()
+    index.add("a", np.array([1.0, 0.0]), key="hash-a")
+    index.add("b", np.array([0.0, 1.0]), key="hash-b")
+    assert index.find_key("hash-a") == "a"
+
+    index.remove("a")
+    assert "a" not in index
+    assert index.find_key("hash-a") is None
+    assert [row_id for row_id, _ in index.search(np.array([1.0, 0.0]), 2)] == ["b"]
+    index.remove("missing")
+    assert len(index) == 1
+
+
+def test_re_adding_a_row_replaces_it():
+    index = SemanticIndex()
+    index.add("a", np.array([1.0, 0.0]), key="old")
+    index.add("a", np.array([0.0, 1.0]), key="new")
+    assert len(index) == 1
+    assert index.find_key("new") == "a"
+    assert index.search(np.array([0.0, 1.0]), 1)[0][0] == "a"
+
+
+def test_ivf_lookup_after_training():
+    index = SemanticIndex(min_rows=64, nprobe=4)
+    vectors = _vectors(400, seed=1)
+    for i, vec in enumerate(vectors):
+        index.add(i, vec)
+    assert index._centroids is not None
+    for i in (0, 123, 399):
+        assert index.search(vectors[i], 1)[0][0] == i
+
+    for i in range(0, 400, 2):
+        index.remove(i)
+    assert len(index) == 200
+    assert all(row_id % 2 == 1 for row_id, _ in index.search(vectors[1], 10))
@@ -0,0 +1,92 @@
+import os
+import shutil
+
+import numpy as np
+
+import RAG.snapshot as snapshot
+from Config.rag import RAG_INDEX_DTYPE, RAG_INDEX_SNAPSHOT_DIR
+from RAG.index import VectorIndex
+from RAG.snapshot import MappedTexts, load_snapshot, write_snapshot
+
+ROWS = [
+    (1, "HR_Policies", "HR_Policies.txt", "Annual leave accrues monthly.", [1.0, 0.0, 0.0]),
+    (2, "IT_Policies", "IT_Policies.txt", "Mots de passe: rotation tous les 90 jours.", [0.0, 1.0, 0.0]),
+    (3, "HR_Policies", "HR_Policies.txt", "", [0.6, 0.0, 0.8]),
+]
+
+
+def _index(version):
+    return VectorIndex.from_rows(ROWS, version, dtype=RAG_INDEX_DTYPE)
+
+
+def test_round_trip_is_memory_mapped(tmp_path):
+    index = _index(4)
+    write_snapshot(index, str(tmp_path))
+    loaded = load_snapshot(4, root=str(tmp_path))
+
+    assert loaded is not None
+    assert isinstance(loaded.chunk_texts, MappedTexts)
+    assert isinstance(loaded.codes, np.memmap) or isinstance(loaded.codes.base, np.memmap)
+    assert loaded.ids == index.ids
+    assert loaded.departments == index.departments
+    assert list(loaded.chunk_texts) == list(index.chunk_texts)
+    query = np.array([1.0, 0.0, 0.0])
+    assert loaded.search(query, 3) == index.search(query, 3)
+
+
+def test_other_version_or_missing_snapshot_is_not_loaded(tmp_path):
+    assert load_snapshot(1, root=str(tmp_path)) is None
+    write_snapshot(_index(1), str(tmp_path))
+    assert load_snapshot(2, root=str(tmp_path)) is None
+    assert load_snapshot(1, root="") is None
+
+
+def test_new_snapshot_replaces_older_versions(tmp_path):
+    write_snapshot(_index(1), str(tmp_path))
+    write_snapshot(_index(2), str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ["CURRENT", "v2"]
+
+
+def test_failed_removal_is_retried_later(tmp_path, monkeypatch):
+    # On Windows a directory another worker still maps cannot be deleted.
+    rmtree = shutil.rmtree
+
+    def locked(path, *args, **kwargs):
+        if os.path.basename(path) == "v1":
+            raise PermissionError("file in use")
+        return rmtree(path, *args, **kwargs)
+
+    write_snapshot(_index(1), str(tmp_path))
+    monkeypatch.setattr(snapshot.shutil, "rmtree", locked)
+    write_snapshot(_index(2), str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ["CURRENT", "v1", "v2"]
+    assert load_snapshot(2, root=str(tmp_path)) is not None
+
+    monkeypatch.setattr(snapshot.shutil, "rmtree", rmtree)
+    write_snapshot(_index(3), str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ["CURRENT", "v3"]
+
+
+def test_same_version_still_mapped_is_written_alongside(tmp_path, monkeypatch):
+    rmtree = shutil.rmtree
+
+    def locked(path, *args, **kwargs):
+        if os.path.basename(path) == "v1":
+            raise PermissionError("file in use")
+        return rmtree(path, *args, **kwargs)
+
+    write_snapshot(_index(1), str(tmp_path))
+    monkeypatch.setattr(snapshot.shutil, "rmtree", locked)
+    written = write_snapshot(_index(1), str(tmp_path))
+    assert os.path.basename(written) != "v1"
+    assert load_snapshot(1, root=str(tmp_path)) is not None
+
+
+def test_lexical_index_shares_mapped_texts(tmp_path):
+    write_snapshot(_index(1), str(tmp_path))
+    loaded = load_snapshot(1, root=str(tmp_path))
+    assert loaded.lexical().chunk_texts is loaded.chunk_texts
+
+
+def test_default_directory_does_not_depend_on_the_working_directory():
+    assert not RAG_INDEX_SNAPSHOT_DIR or os.path.isabs(RAG_INDEX_SNAPSHOT_DIR)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from Database.vector_codec import (
+    HEADER_SIZE,
+    check_dtype,
+    decode_vector,
+    dequantize_rows,
+    pack_vector,
+    quantize_rows,
+    unpack_vector,
+)
+
+
+def test_float32_round_trip_is_exact_and_zero_copy():
+    vec = np.array([0.25, -1.5, 3.0], dtype=np.float32)
+    packed = pack_vector(vec)
+    assert len(packed) == HEADER_SIZE + vec.nbytes
+    decoded = decode_vector(packed)
+    np.testing.assert_array_equal(decoded, vec)
+    assert not decoded.flags.owndata
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("float16", 1e-3), ("int8", 2e-2)])
+def test_compact_round_trip_is_close(dtype, tolerance):
+    vec = np.random.default_rng(0).normal(size=64).astype(np.float32)
+    vec /= np.linalg.norm(vec)
+    codes, scale, name = unpack_vector(pack_vector(vec, dtype))
+    assert name == dtype
+    assert codes.dtype.itemsize < 4
+    np.testing.assert_allclose(decode_vector(pack_vector(vec, dtype)), vec, atol=tolerance)
+
+
+def test_int8_rows_use_per_row_scales():
+    rows = np.array([[1.0, -0.5], [0.02, 0.01], [0.0, 0.0]], dtype=np.float32)
+    codes, scales = quantize_rows(rows, "int8")
+    assert codes.dtype == np.int8
+    assert np.abs(codes[:2]).max(axis=1).tolist() == [127, 127]
+    assert scales[2] == 1.0
+    np.testing.assert_allclose(dequantize_rows(codes, scales), rows, atol=5e-3)
+
+
+def test_invalid_input_is_rejected():
+    with pytest.raises(ValueError):
+        check_dtype("bfloat16")
+    with pytest.raises(ValueError):
+        unpack_vector(b"XX" + bytes(HEADER_SIZE))
+    assert check_dtype(" INT8 ") == "int8"
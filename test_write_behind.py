@@ -0,0 +1,149 @@
+import pytest
+
+import Middleware.write_behind as write_behind
+from Middleware.write_behind import WriteBehind, _apply, _statements
+
+UPSERT = "INSERT INTO llm_cache (cache_key, output) VALUES %s ON CONFLICT (cache_key) DO UPDATE SET output = EXCLUDED.output"
+INSERT = "INSERT INTO semantic_cache (id, ai_response) VALUES %s"
+
+
+class _Cursor:
+    def __init__(self, log, failing):
+        self.log = log
+        self.failing = failing
+
+    def execute(self, sql, params=None):
+        self.log.append(sql)
+
+    def close(self):
+        pass
+
+
+class _Connection:
+    def __init__(self, log, failing):
+        self.log = log
+        self.failing = failing
+
+    def cursor(self):
+        return _Cursor(self.log, self.failing)
+
+    def commit(self):
+        self.log.append("COMMIT")
+
+    def rollback(self):
+        self.log.append("ROLLBACK")
+
+    def close(self):
+        pass
+
+
+def _database(monkeypatch, failing=()):
+    """Record statements; execute_values raises for statements in failing."""
+    log = []
+
+    def execute_values(cur, sql, rows, template=None, page_size=None):
+        if sql in failing:
+            raise RuntimeError("relation does not exist")
+        log.append((sql, list(rows)))
+
+    monkeypatch.setattr(write_behind, "get_connection", lambda: _Connection(log, failing))
+    monkeypatch.setattr(write_behind, "execute_values", execute_values)
+    return log
+
+
+def test_statements_group_by_sql_and_keep_the_last_row_per_key():
+    batch = [
+        (UPSERT, None, "k1", ("k1", "first"), None),
+        (INSERT, None, None, ("id-1", "a"), None),
+        (UPSERT, None, "k2", ("k2", "x"), None),
+        (UPSERT, None, "k1", ("k1", "second"), None),
+        (INSERT, None, None, ("id-2", "b"), None),
+    ]
+    assert _statements(batch) == [
+        (UPSERT, None, [("k2", "x"), ("k1", "second")], []),
+        (INSERT, None, [("id-1", "a"), ("id-2", "b")], []),
+    ]
+
+
+def test_statements_keep_templates_apart_and_collect_callbacks():
+    undo = []
+    batch = [
+        (INSERT, None, None, ("id-1", "a"), lambda: undo.append("id-1")),
+        (INSERT, "(%s::uuid, %s)", None, ("id-2", "b"), None),
+        (INSERT, None, None, ("id-3", "c"), lambda: undo.append("id-3")),
+    ]
+    statements = _statements(batch)
+    assert [(s[1], len(s[2]), len(s[3])) for s in statements] == [(None, 2, 2), ("(%s::uuid, %s)", 1, 0)]
+
+
+def test_apply_isolates_a_failing_statement(monkeypatch):
+    log = _database(monkeypatch, failing={INSERT})
+    undo = []
+    failed = _apply([
+        (UPSERT, None, "k1", ("k1", "v"), lambda: undo.append("k1")),
+        (INSERT, None, None, ("id-1", "a"), lambda: undo.append("id-1")),
+    ])
+    assert failed == 1
+    assert undo == ["id-1"]
+    assert (UPSERT, [("k1", "v")]) in log
+    assert "ROLLBACK TO SAVEPOINT write_behind" in log
+    assert log[-1] == "COMMIT"
+
+
+def test_apply_runs_callbacks_when_the_database_is_unreachable(monkeypatch):
+    def unreachable():
+        raise RuntimeError("could not connect to server")
+
+    monkeypatch.setattr(write_behind, "get_connection", unreachable)
+    undo = []
+    with pytest.raises(RuntimeError):
+        _apply([
+            (UPSERT, None, "k1", ("k1", "v"), lambda: undo.append("k1")),
+            (INSERT, None, None, ("id-1", "a"), lambda: undo.append("id-1")),
+        ])
+    assert sorted(undo) == ["id-1", "k1"]
+
+
+def test_failed_flush_runs_callbacks(monkeypatch):
+    def unreachable():
+        raise RuntimeError("could not connect to server")
+
+    monkeypatch.setattr(write_behind, "get_connection", unreachable)
+    undo = []
+    writer = WriteBehind(max_pending=10, batch_size=10, flush_seconds=60)
+    writer.submit(INSERT, ("id-1", "a"), on_failure=lambda: undo.append("id-1"))
+    assert writer.flush() == 1
+    assert undo == ["id-1"]
+    writer.drain(timeout=1)
+
+
+def test_flush_writes_everything_queued(monkeypatch):
+    log = _database(monkeypatch)
+    writer = WriteBehind(max_pending=10, batch_size=10, flush_seconds=60)
+    writer.submit(UPSERT, ("k1", "v1"), key="k1")
+    writer.submit(UPSERT, ("k1", "v2"), key="k1")
+    assert len(writer) == 2
+    assert writer.flush() == 2
+    assert len(writer) == 0
+    assert (UPSERT, [("k1", "v2")]) in log
+    writer.drain(timeout=1)
+
+
+def test_full_queue_drops_and_reports(monkeypatch):
+    _database(monkeypatch)
+    undo = []
+    writer = WriteBehind(max_pending=1, batch_size=10, flush_seconds=60)
+    assert writer.submit(INSERT, ("id-1", "a"))
+    assert not writer.submit(INSERT, ("id-2", "b"), on_failure=lambda: undo.append("id-2"))
+    assert writer.dropped == 1
+    assert undo == ["id-2"]
+    writer.drain(timeout=1)
+
+
+def test_writes_after_drain_go_straight_to_the_database(monkeypatch):
+    log = _database(monkeypatch)
+    writer = WriteBehind(max_pending=10, batch_size=10, flush_seconds=60)
+    writer.drain(timeout=1)
+    assert writer.submit(INSERT, ("id-1", "a"))
+    assert (INSERT, [("id-1", "a")]) in log
+    assert len(writer) == 0